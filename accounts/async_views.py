@@ -0,0 +1,44 @@
+"""
+Async versions of the dashboard and the monthly report, routed in place of
+the ones in accounts.views when settings.ASYNC_VIEWS is on (the ASGI
+deployment, see expense_tracker/asgi.py). Pages, caching and conditional
+GET are the same; the independent queries of a page run concurrently.
+"""
+import asyncio
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import render
+
+from . import reports
+from .views import monthly_report_max_age, render_monthly_report, report_filters
+from transactions import summary
+from transactions.async_queries import run_query
+from transactions.cache import aget_or_compute, user_cache_key
+from transactions.conditional import user_data_condition
+
+
+@login_required
+@user_data_condition
+async def dashboard(request):
+    """Totals and the last 5 transactions, queried concurrently and cached like accounts.views.dashboard."""
+    key = await sync_to_async(user_cache_key)("dashboard", request.user.pk)
+    context = await aget_or_compute(key, partial(reports.adashboard_context, request.user))
+    return render(request, "dashboard.html", context)
+
+
+@login_required
+@user_data_condition(max_age=monthly_report_max_age)
+async def monthly_report(request):
+    """
+    accounts.views.monthly_report with the totals, the category breakdown
+    and the month selector's options queried concurrently.
+    """
+    params, filters = await sync_to_async(report_filters)(request)
+    key = await sync_to_async(user_cache_key)("monthly-report", request.user.pk, filters.query_string())
+    report, month_options = await asyncio.gather(
+        aget_or_compute(key, partial(reports.amonthly_report_context, request.user, filters)),
+        run_query(summary.month_options, request.user, filters.selected_month),
+    )
+    return render_monthly_report(request, params, filters, report, month_options)
@@ -0,0 +1,77 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+UserModel = get_user_model()
+
+
+def cached_user_key(user_id):
+    return f"auth:user:{user_id}"
+
+
+def forget_cached_user(user_id):
+    cache.delete(cached_user_key(user_id))
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    ModelBackend that loads the session's user together with its profile,
+    which templates read (currency) on every page. The default without a
+    shared cache (settings.SHARED_CACHE).
+    """
+
+    def user_queryset(self):
+        return UserModel._default_manager.select_related("profile")
+
+    def get_user(self, user_id):
+        try:
+            user = self.user_queryset().get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        try:
+            user = await self.user_queryset().aget(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
+
+
+class CachedModelBackend(ProfileModelBackend):
+    """
+    ProfileModelBackend that keeps the session's user object, with its
+    profile, in the cache, so an authenticated request doesn't SELECT from
+    auth_user or accounts_profile. Needs a cache shared by all workers,
+    otherwise the invalidation below only reaches one of them.
+
+    Entries are dropped whenever the user is saved (password change,
+    deactivation, ...), logs out or edits their profile (see
+    accounts.signals). Django still compares the session's password hash
+    against the cached user, so a password change logs out other sessions
+    as before. Changes made with queryset.update() bypass the signals and
+    show up after AUTH_USER_CACHE_TIMEOUT.
+    """
+
+    def get_user(self, user_id):
+        key = cached_user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = self.user_queryset().get(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        key = cached_user_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            try:
+                user = await self.user_queryset().aget(pk=user_id)
+            except UserModel.DoesNotExist:
+                return None
+            await cache.aset(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user if self.user_can_authenticate(user) else None
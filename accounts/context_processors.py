@@ -0,0 +1,13 @@
+from transactions.rates import DEFAULT_CURRENCY, user_currency
+
+
+def currency(request):
+    """
+    The logged-in user's currency for every template. The profile is
+    loaded (and cached) with the user (accounts.backends), so this doesn't
+    query; users without a profile get the default currency.
+    """
+    user = getattr(request, "user", None)
+    if user is None or not user.is_authenticated:
+        return {"currency": DEFAULT_CURRENCY}
+    return {"currency": user_currency(user)}
@@ -0,0 +1,189 @@
+"""
+Queries behind the dashboard and the monthly report.
+
+Kept separate from the views so the results can be cached
+(transactions.cache) and reused by other entry points. The a*() variants
+are for the async views: they run the independent queries concurrently
+(transactions.async_queries). Amounts are summed in the user's currency,
+converted in the aggregate queries (transactions.rates).
+"""
+from decimal import Decimal
+
+from django.db.models import F, Q, Sum
+
+from transactions import rates, summary
+from transactions.async_queries import gather_queries
+from transactions.models import MonthlySummary, Transaction
+from transactions.utils import shift_month
+
+DEFAULT_TREND_MONTHS = 12
+MAX_TREND_MONTHS = 60
+
+
+def dashboard_totals(user):
+    # conditional aggregation over the monthly rollup (one row per month/category/type)
+    totals = summary.user_totals(user, rates.user_currency(user))
+
+    # avoiding none results from SUM by defaulting to decimal (0.0)
+    total_income = totals.get("total_income") or Decimal("0.00")
+    total_expense = totals.get("total_expense") or Decimal("0.00")
+    return {
+        "total_income": total_income,
+        "total_expense": total_expense,
+        "net_savings": total_income - total_expense,
+    }
+
+
+def recent_transactions(user, limit=5):
+    # Last `limit` transactions (newest first), evaluated so the list can be cached
+    return list(
+        Transaction.objects.filter(user=user)
+        .select_related("category")
+        .order_by("-date", "-id")[:limit]
+    )
+
+
+def dashboard_context(user):
+    return {
+        **dashboard_totals(user),
+        "recent_transactions": recent_transactions(user),
+    }
+
+
+async def adashboard_context(user):
+    totals, recent = await gather_queries((dashboard_totals, user), (recent_transactions, user))
+    return {**totals, "recent_transactions": recent}
+
+
+# filters the MonthlySummary rollup can answer; any other filter (date
+# range, amount range, search) needs the transactions themselves
+ROLLUP_FILTERS = {"month", "category", "type"}
+
+
+def report_rows(user, filters):
+    """
+    (queryset, amount expression in the user's currency) to aggregate for
+    the report on `filters` (a TransactionFilterForm with at least a month
+    or a date range). Whole months read the rollup; anything finer
+    aggregates the matching transactions, which the list's indexes serve
+    the same way.
+    """
+    currency = rates.user_currency(user)
+    if filters.spec.keys() <= ROLLUP_FILTERS:
+        rows = filters.apply(MonthlySummary.objects.filter(user=user), date_field="month")
+        return rows, rates.converted("total", "month", currency)
+    rows = filters.apply(Transaction.objects.filter(user=user), user=user)
+    return rows, rates.converted("amount", "date", currency)
+
+
+def month_totals(rows, amount="total"):
+    totals = rows.aggregate(
+        total_income=Sum(amount, filter=Q(type='IN')),
+        total_expense=Sum(amount, filter=Q(type='EX')),
+    )
+    total_income = totals.get('total_income') or Decimal('0.00')
+    total_expense = totals.get('total_expense') or Decimal('0.00')
+    return {
+        "total_income": total_income,
+        "total_expense": total_expense,
+        "net": total_income - total_expense,
+    }
+
+
+def month_breakdown(rows, amount="total"):
+    """
+    Category-wise income/expense of the report rows, largest expense first.
+    expense_share_pct is filled in by add_expense_shares().
+    """
+    # use safe alias names to avoid conflicts with model fields
+    cat_qs = (
+        rows
+        .values(cat_id=F('category__id'), cat_name=F('category__name'))
+        .annotate(
+            cat_income=Sum(amount, filter=Q(type='IN')),
+            cat_expense=Sum(amount, filter=Q(type='EX'))
+        )
+        .order_by('-cat_expense')
+    )
+
+    # Normalize None to Decimal('0.00')
+    breakdown = []
+    for row in cat_qs:
+        breakdown.append({
+            "category_id": row.get('cat_id'),
+            "category_name": row.get('cat_name') or "Uncategorized",
+            "income": row.get('cat_income') or Decimal('0.00'),
+            "expense": row.get('cat_expense') or Decimal('0.00'),
+        })
+    return breakdown
+
+
+def add_expense_shares(breakdown, total_expense):
+    for row in breakdown:
+        if total_expense and total_expense != 0:
+            share = (row["expense"] / total_expense) * 100
+        else:
+            share = Decimal('0.00')
+        row["expense_share_pct"] = round(share, 2)
+    return breakdown
+
+
+def report_context(totals, breakdown):
+    add_expense_shares(breakdown, totals["total_expense"])
+    return {**totals, "breakdown": breakdown}
+
+
+def monthly_report_context(user, filters):
+    rows, amount = report_rows(user, filters)
+    return report_context(month_totals(rows, amount), month_breakdown(rows, amount))
+
+
+async def amonthly_report_context(user, filters):
+    # `filters` must be validated already (filters.spec), which may query
+    rows, amount = report_rows(user, filters)
+    totals, breakdown = await gather_queries((month_totals, rows, amount), (month_breakdown, rows, amount))
+    return report_context(totals, breakdown)
+
+
+def trend(user, last_month, months):
+    """
+    Income, expense and net per month, plus income/expense per category,
+    over the `months` months ending with `last_month` (a first-of-month
+    date). One rollup query; every series has one value per month, oldest
+    first, and categories come largest expense first. Amounts are in the
+    user's currency; buckets without an exchange rate are left out.
+    """
+    window = [shift_month(last_month, offset) for offset in range(1 - months, 1)]
+    position = {month: index for index, month in enumerate(window)}
+
+    def series():
+        return [Decimal("0.00")] * len(window)
+
+    income, expense = series(), series()
+    categories = {}
+    for row in summary.trend_rows(user, window[0], window[-1], rates.user_currency(user)):
+        if row["amount"] is None:
+            continue
+        index = position[row["month"]]
+        category = categories.get(row["category_id"])
+        if category is None:
+            category = categories[row["category_id"]] = {
+                "id": row["category_id"],
+                "name": row["category__name"] or "Uncategorized",
+                "income": series(),
+                "expense": series(),
+            }
+        if row["type"] == Transaction.INCOME:
+            income[index] += row["amount"]
+            category["income"][index] += row["amount"]
+        else:
+            expense[index] += row["amount"]
+            category["expense"][index] += row["amount"]
+
+    return {
+        "months": [f"{month:%Y-%m}" for month in window],
+        "income": income,
+        "expense": expense,
+        "net": [i - e for i, e in zip(income, expense)],
+        "categories": sorted(categories.values(), key=lambda category: -sum(category["expense"])),
+    }
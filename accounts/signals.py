@@ -1,6 +1,9 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
+from django.contrib.auth.signals import user_logged_out
+from transactions.cache import bump_data_version
+from .backends import forget_cached_user
 from .models import Profile
 
 @receiver(post_save, sender=User)
@@ -9,6 +12,19 @@ def create_profile(sender, instance, created, **kwargs):
         Profile.objects.create(user=instance)
 
 @receiver(post_save, sender=User)
-def save_profile(sender, instance, **kwargs):
-    instance.profile.save()
-    
\ No newline at end of file
+@receiver(post_delete, sender=User)
+def forget_user(sender, instance, **kwargs):
+    forget_cached_user(instance.pk)
+
+@receiver(user_logged_out)
+def forget_user_on_logout(sender, request, user, **kwargs):
+    if user is not None:
+        forget_cached_user(user.pk)
+
+# the cached user carries its profile, so profile edits drop it too; pages
+# show the profile's currency, so they change the user's data version as well
+@receiver(post_save, sender=Profile)
+@receiver(post_delete, sender=Profile)
+def forget_profile_user(sender, instance, **kwargs):
+    forget_cached_user(instance.user_id)
+    bump_data_version(instance.user_id)
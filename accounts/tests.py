@@ -1,3 +1,399 @@
-from django.test import TestCase
+import re
+from datetime import date
+from decimal import Decimal
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.urls import path, reverse
+
+import expense_tracker.urls
+from categories.models import Category
+from transactions.models import MonthlySummary, Transaction
+from transactions.rates import load_rates
+from transactions.testing import QueryBudgetMixin, with_shared_cache
+from . import async_views
+from .backends import cached_user_key
+
+# URLs of AsyncViewTests: the project's, plus the async views next to the sync ones
+urlpatterns = [
+    path("async/", async_views.dashboard, name="async_dashboard"),
+    path("async/reports/month/", async_views.monthly_report, name="async_monthly_report"),
+    *expense_tracker.urls.urlpatterns,
+]
+
+
+@with_shared_cache
+class ReportQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def test_dashboard(self):
+        self.assertQueryBudget(reverse("dashboard"), 4)
+
+    def test_dashboard_cached(self):
+        self.seeded_client(20)
+        self.client.get(reverse("dashboard"))
+        # session, user and result all come from the cache
+        with self.assertMaxQueries(0):
+            self.client.get(reverse("dashboard"))
+
+    # monthly report: session, user, totals, breakdown, months with data
+    def test_monthly_report(self):
+        self.assertQueryBudget(reverse("accounts:monthly_report") + "?month=2025-06", 5)
+
+    # trend: session, user, one rollup query, months with data
+    def test_trend_report(self):
+        self.assertQueryBudget(reverse("accounts:trend_report") + "?end=2025-12&months=24", 4)
+
+
+@with_shared_cache
+class CachedSessionUserTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("alice", password="old-password-1")
+        self.client.login(username="alice", password="old-password-1")
+
+    def test_warm_request_skips_session_and_user_queries(self):
+        self.client.get(reverse("dashboard"))
+        with self.assertMaxQueries(0):
+            response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.context["user"], self.user)
+
+    def test_cold_cache_falls_back_to_database(self):
+        cache.clear()
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["user"], self.user)
+
+    def test_password_change_logs_out_other_sessions(self):
+        self.client.get(reverse("dashboard"))
+        self.assertIsNotNone(cache.get(cached_user_key(self.user.pk)))
+
+        self.user.set_password("new-password-2")
+        self.user.save()
+        self.assertIsNone(cache.get(cached_user_key(self.user.pk)))
+
+        response = self.client.get(reverse("dashboard"))
+        self.assertRedirects(response, reverse("accounts:login") + "?next=/",
+                             fetch_redirect_response=False)
+
+    def test_logout_forgets_cached_user(self):
+        other = Client()
+        other.login(username="alice", password="old-password-1")
+        other.get(reverse("dashboard"))
+
+        self.client.get(reverse("accounts:logout"))
+        self.assertIsNone(cache.get(cached_user_key(self.user.pk)))
+        # the other session reloads the user from the database
+        self.assertEqual(other.get(reverse("dashboard")).status_code, 200)
+
+
+class ProfileTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("bob", password="secret-pass-9")
+        self.user.profile.currency = "EUR"
+        self.user.profile.save()
+
+    def test_login_does_not_touch_profile(self):
+        with self.assertMaxQueries(10) as queries:
+            self.client.post(reverse("accounts:login"),
+                             {"username": "bob", "password": "secret-pass-9"})
+        self.assertFalse([q for q in queries.captured_queries if "accounts_profile" in q["sql"]])
+
+    def test_currency_loaded_with_user(self):
+        self.client.force_login(self.user)
+        cache.clear()
+        with self.assertMaxQueries(5) as queries:
+            response = self.client.get(reverse("accounts:monthly_report") + "?month=2025-06")
+        self.assertEqual(response.context["currency"], "EUR")
+        profile_queries = [q["sql"] for q in queries.captured_queries if "accounts_profile" in q["sql"]]
+        self.assertEqual(len(profile_queries), 1)
+        self.assertIn("auth_user", profile_queries[0])
+
+    def test_profile_change_refreshes_cached_user(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse("dashboard"))
+        self.user.profile.currency = "USD"
+        self.user.profile.save()
+        self.assertContains(self.client.get(reverse("dashboard")), "Total Income (USD)")
+
+    def test_user_without_profile(self):
+        self.user.profile.delete()
+        self.user.save()
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context["currency"], "INR")
+
+
+@with_shared_cache
+class TrendReportTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("carol")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        for day, amount, type, category in [
+            (date(2025, 4, 3), "100.00", "EX", self.food),
+            (date(2025, 4, 9), "25.50", "EX", None),
+            (date(2025, 6, 1), "1000.00", "IN", None),
+            (date(2025, 6, 2), "40.00", "EX", self.food),
+        ]:
+            Transaction.objects.create(user=self.user, amount=Decimal(amount), type=type,
+                                       date=day, category=category)
+        self.client.force_login(self.user)
+
+    def test_json_series_per_month(self):
+        response = self.client.get(reverse("accounts:trend_data"), {"end": "2025-06", "months": 3})
+        data = response.json()
+        self.assertEqual(data["months"], ["2025-04", "2025-05", "2025-06"])
+        self.assertEqual(data["income"], ["0.00", "0.00", "1000.00"])
+        self.assertEqual(data["expense"], ["125.50", "0.00", "40.00"])
+        self.assertEqual(data["net"], ["-125.50", "0.00", "960.00"])
+        self.assertEqual([(c["name"], c["expense"]) for c in data["categories"]],
+                         [("Food", ["100.00", "0.00", "40.00"]), ("Uncategorized", ["25.50", "0.00", "0.00"])])
+
+    def test_window_stays_within_representable_dates(self):
+        response = self.client.get(reverse("accounts:trend_report"), {"end": "0001-03", "months": 60})
+        self.assertEqual(len(response.context["trend"]["months"]), 3)
+        response = self.client.get(reverse("accounts:trend_data"), {"end": "9999-11", "months": 2})
+        self.assertEqual(response.json()["months"], ["9999-10", "9999-11"])
+
+    def test_http_caching(self):
+        url = reverse("accounts:trend_data")
+        past = self.client.get(url, {"end": "2025-06"})
+        self.assertIn("max-age=", past["Cache-Control"])
+        self.assertEqual(self.client.get(url, {"end": "2025-06"}, HTTP_IF_NONE_MATCH=past["ETag"]).status_code, 304)
+
+        current = self.client.get(url)
+        self.assertIn("no-cache", current["Cache-Control"])
+
+        # new data, new ETag
+        Transaction.objects.create(user=self.user, amount=Decimal("1.00"), type="EX", date=date(2025, 5, 1))
+        response = self.client.get(url, {"end": "2025-06"}, HTTP_IF_NONE_MATCH=past["ETag"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["expense"][-2], "1.00")
+
+    def test_month_selectors_list_months_with_data(self):
+        response = self.client.get(reverse("transactions:list"))
+        self.assertEqual([value for value, _label in response.context["month_options"]], ["2025-06", "2025-04"])
+        response = self.client.get(reverse("accounts:monthly_report"), {"month": "2025-05"})
+        self.assertEqual([value for value, _label in response.context["month_options"]],
+                         ["2025-06", "2025-05", "2025-04"])
+
+    @override_settings(SHARED_CACHE=False)
+    def test_month_selectors_not_cached_without_shared_cache(self):
+        self.client.get(reverse("transactions:list"))
+        # written without signals, as by another worker whose locmem bump we don't see
+        MonthlySummary.objects.filter(month=date(2025, 4, 1)).update(month=date(2025, 3, 1))
+        response = self.client.get(reverse("transactions:list"))
+        self.assertEqual([value for value, _label in response.context["month_options"]], ["2025-06", "2025-03"])
+
+
+class CurrencyReportTests(QueryBudgetMixin, TestCase):
+    # EUR-based rates: 1 EUR = 1.25 USD / 100 INR in May, 1.20 USD / 90 INR in June
+
+    def setUp(self):
+        super().setUp()
+        load_rates({
+            ("EUR", date(2025, 5, 1)): Decimal("1"), ("EUR", date(2025, 6, 1)): Decimal("1"),
+            ("USD", date(2025, 5, 1)): Decimal("1.25"), ("USD", date(2025, 6, 1)): Decimal("1.20"),
+            ("INR", date(2025, 5, 1)): Decimal("100"), ("INR", date(2025, 6, 1)): Decimal("90"),
+        })
+        self.user = User.objects.create_user("dora")
+        food = Category.objects.create(user=self.user, name="Food")
+        for day, amount, currency, type, category in [
+            # before the first rates: converted at May's
+            (date(2025, 4, 20), "25.00", "USD", "EX", None),
+            (date(2025, 5, 10), "500.00", "INR", "EX", food),
+            (date(2025, 5, 12), "10.00", "USD", "EX", food),
+            (date(2025, 6, 2), "12.00", "USD", "EX", None),
+            (date(2025, 6, 3), "1000.00", "INR", "IN", None),
+            (date(2025, 6, 4), "5.00", "EUR", "EX", None),
+        ]:
+            Transaction.objects.create(user=self.user, amount=Decimal(amount), currency=currency,
+                                       type=type, date=day, category=category)
+        self.client.force_login(self.user)
+
+    def test_dashboard_totals_in_profile_currency(self):
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.context["total_income"], Decimal("1000.00"))
+        self.assertEqual(response.context["total_expense"], Decimal("4650.00"))
+
+    def test_rollup_and_transactions_convert_alike(self):
+        url = reverse("accounts:monthly_report")
+        for params in [{"month": "2025-06"}, {"start": "2025-06-01", "end": "2025-06-30"}]:
+            with self.subTest(params=params):
+                response = self.client.get(url, params)
+                self.assertEqual((response.context["total_income"], response.context["total_expense"]),
+                                 (Decimal("1000.00"), Decimal("1350.00")))
+                self.assertEqual([(row["category_name"], row["expense"]) for row in response.context["breakdown"]],
+                                 [("Uncategorized", Decimal("1350.00"))])
+
+    def test_trend_converts_every_month(self):
+        data = self.client.get(reverse("accounts:trend_data"), {"end": "2025-06", "months": 3}).json()
+        self.assertEqual(data["expense"], ["2000.00", "1300.00", "1350.00"])
+
+    def test_profile_currency_change(self):
+        self.user.profile.currency = "USD"
+        self.user.profile.save()
+        response = self.client.get(reverse("accounts:monthly_report"), {"month": "2025-06"})
+        self.assertEqual(response.context["currency"], "USD")
+        self.assertEqual((response.context["total_income"], response.context["total_expense"]),
+                         (Decimal("13.33"), Decimal("18.00")))
+
+    def test_reloading_rates_invalidates_cached_totals(self):
+        self.assertEqual(self.client.get(reverse("dashboard")).context["total_expense"], Decimal("4650.00"))
+        load_rates({("EUR", date(2025, 5, 1)): Decimal("1"), ("USD", date(2025, 5, 1)): Decimal("1"),
+                    ("INR", date(2025, 5, 1)): Decimal("100")})
+        # every USD and EUR amount is now worth 100 INR
+        response = self.client.get(reverse("dashboard"))
+        self.assertEqual(response.context["total_expense"], Decimal("5700.00"))
+
+
+@with_shared_cache
+class ConditionalGetTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.seeded_client(30, prefix="conditional")
+
+    def test_unchanged_data_is_answered_with_304_without_queries(self):
+        for url in [reverse("dashboard"), reverse("accounts:monthly_report") + "?month=2025-06",
+                    reverse("transactions:list") + "?month=2025-06", reverse("transactions:export_csv")]:
+            with self.subTest(url=url):
+                # the first response sets the CSRF cookie, which is part of the ETag
+                self.client.get(url)
+                first = self.client.get(url)
+                self.assertEqual(first.status_code, 200)
+                self.assertIn("private", first["Cache-Control"])
+                with self.assertMaxQueries(0):
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+                self.assertEqual(response.status_code, 304)
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+                self.assertEqual(response.status_code, 304)
+
+    def test_changes_invalidate(self):
+        url = reverse("dashboard")
+        etag = self.client.get(url)["ETag"]
+        Transaction.objects.create(user=self.user, amount=Decimal("1.00"), type="EX", date=date(2025, 6, 1))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)["ETag"]
+        Category.objects.create(user=self.user, name="New")
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get(url)["ETag"]
+        self.user.profile.currency = "USD"
+        self.user.profile.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        # another user's changes do not matter
+        etag = self.client.get(url)["ETag"]
+        other = User.objects.create_user("someone-else")
+        Transaction.objects.create(user=other, amount=Decimal("1.00"), type="EX", date=date(2025, 6, 1))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_past_months_are_long_lived(self):
+        past = self.client.get(reverse("accounts:monthly_report"), {"month": "2025-06"})
+        self.assertIn("max-age=86400", past["Cache-Control"])
+        # a 304 keeps the lifetime
+        response = self.client.get(reverse("accounts:monthly_report"), {"month": "2025-06"},
+                                   HTTP_IF_NONE_MATCH=past["ETag"])
+        self.assertIn("max-age=86400", response["Cache-Control"])
+
+        current = self.client.get(reverse("accounts:monthly_report"))
+        self.assertIn("no-cache", current["Cache-Control"])
+
+    @override_settings(SHARED_CACHE=False)
+    def test_no_validators_without_shared_cache(self):
+        # another worker's locmem cache would not see a change
+        for url in [reverse("dashboard"), reverse("transactions:export_csv")]:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertFalse(response.has_header("ETag"))
+                self.assertFalse(response.has_header("Last-Modified"))
+                self.assertIn("no-store", response["Cache-Control"])
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+                self.assertEqual(response.status_code, 200)
+        past = self.client.get(reverse("accounts:monthly_report"), {"month": "2025-06"})
+        self.assertIn("max-age=86400", past["Cache-Control"])
+
+    def test_pages_with_flash_messages_are_not_reused(self):
+        self.client.post(reverse("transactions:bulk"), {"action": "delete"})
+        response = self.client.get(reverse("transactions:list"))
+        self.assertFalse(response.has_header("ETag"))
+        self.assertTrue(self.client.get(reverse("transactions:list")).has_header("ETag"))
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncViewTests(QueryBudgetMixin, TransactionTestCase):
+    """
+    The async views (settings.ASYNC_VIEWS) render what the sync ones do.
+    They query from pool threads with their own connections, which only
+    see committed data, hence TransactionTestCase.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.seeded_client(40, prefix="async")
+
+    async def get_both(self, sync_url, async_url):
+        """(sync response, async response), both computed from an empty result cache."""
+        await cache.aclear()
+        sync_response = await sync_to_async(self.client.get)(sync_url)
+        await cache.aclear()
+        await self.async_client.aforce_login(self.user)
+        return sync_response, await self.async_client.get(async_url)
+
+    async def test_dashboard(self):
+        sync_response, response = await self.get_both(reverse("dashboard"), reverse("async_dashboard"))
+        self.assertEqual(response.status_code, 200)
+        for key in ("total_income", "total_expense", "net_savings", "recent_transactions"):
+            self.assertEqual(response.context[key], sync_response.context[key])
+        # queries on the pool threads count towards the request
+        queries = int(re.search(r'desc="(\d+) queries"', response["Server-Timing"]).group(1))
+        self.assertGreaterEqual(queries, 2)
+
+    async def test_monthly_report(self):
+        query = "?month=2025-06&type=EX"
+        sync_response, response = await self.get_both(
+            reverse("accounts:monthly_report") + query, reverse("async_monthly_report") + query)
+        self.assertEqual(response.status_code, 200)
+        for key in ("total_income", "total_expense", "net", "breakdown", "month_options", "selected_month"):
+            self.assertEqual(response.context[key], sync_response.context[key])
+
+    @with_shared_cache
+    async def test_conditional_get(self):
+        await self.async_client.aforce_login(self.user)
+        url = reverse("async_monthly_report") + "?month=2025-06"
+        # the first response sets the CSRF cookie, which is part of the ETag
+        await self.async_client.get(url)
+        first = await self.async_client.get(url)
+        self.assertIn("max-age=86400", first["Cache-Control"])
+        response = await self.async_client.get(url, headers={"If-None-Match": first["ETag"]})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_login_required(self):
+        response = await self.async_client.get(reverse("async_dashboard"))
+        self.assertEqual(response.status_code, 302)
+
+
+class MetricsAccessTests(TestCase):
+
+    def test_only_staff_token_and_listed_addresses(self):
+        url = reverse("metrics")
+        # e.g. a reverse proxy on the same host
+        self.assertEqual(self.client.get(url, REMOTE_ADDR="127.0.0.1").status_code, 403)
+        with self.settings(METRICS_TOKEN="s3cret"):
+            self.assertEqual(self.client.get(url, headers={"Authorization": "Bearer s3cret"}).status_code, 200)
+            self.assertEqual(self.client.get(url, headers={"Authorization": "Bearer wrong"}).status_code, 403)
+        # no token configured: an empty bearer does not match
+        self.assertEqual(self.client.get(url, headers={"Authorization": "Bearer "}).status_code, 403)
+        with self.settings(METRICS_ALLOWED_IPS=["10.0.0.5"]):
+            self.assertEqual(self.client.get(url, REMOTE_ADDR="10.0.0.5").status_code, 200)
+        self.client.force_login(User.objects.create_user("ops", is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.urls import path
-from .views import signup_view, login_view, logout_view, monthly_report
+from . import async_views, views
+from .views import signup_view, login_view, logout_view, trend_data, trend_report
 
 app_name = "accounts"
 
@@ -7,5 +9,8 @@ urlpatterns = [
     path("signup/", signup_view, name="signup"),
     path("login/", login_view, name="login"),
     path("logout/", logout_view, name="logout"),
-    path("reports/month/", monthly_report, name="monthly_report"),
+    path("reports/month/", async_views.monthly_report if settings.ASYNC_VIEWS else views.monthly_report,
+         name="monthly_report"),
+    path("reports/trend/", trend_report, name="trend_report"),
+    path("reports/trend.json", trend_data, name="trend_data"),
 ]
@@ -1,17 +1,24 @@
+from datetime import date
+
+from django.conf import settings
+from django.http import JsonResponse
 from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.contrib.auth import login, authenticate, logout
 from django.contrib.auth.decorators import login_required
-from django.db.models import Sum, Q, F
 from django.utils import timezone
-from datetime import datetime
-from decimal import Decimal
 from .forms import UserSignupForm
-from transactions.models import Transaction
-from decimal import Decimal
+from . import reports
+from transactions import summary
+from transactions.cache import get_or_compute, user_cache_key
+from transactions.conditional import user_data_condition
+from transactions.filters import TransactionFilterForm
+from transactions.utils import parse_month, shift_month
 
 # Create your views here.
 
+TREND_MONTHS_CHOICES = [6, 12, 24, 36]
+
 
 def signup_view(request):
     if request.method == "POST":
@@ -47,128 +54,140 @@ def logout_view(request):
     return redirect('accounts:login')
 
 
-@login_required
-def dashboard(request):
-
-    # conditional aggregration
-    totals = (
-        Transaction.objects.filter(user=request.user).aggregate(
-            total_income=Sum("amount", filter=Q(type="IN")),
-            total_expense=Sum("amount", filter=Q(type="EX")),
-        )
-    )
+def past_period_max_age(end):
+    """
+    REPORT_PAST_MAX_AGE when a report period ending before `end` (exclusive)
+    lies entirely in past months, which effectively never change.
+    """
+    if end and end <= timezone.localdate().replace(day=1):
+        return settings.REPORT_PAST_MAX_AGE
+    return None
 
-    # avoiding none results from SUM by defaulting to decimal (0.0)
 
-    total_income = totals.get("total_income") or Decimal("0.00")
-    total_expense = totals.get("total_expense") or Decimal("0.00")
-    net_savings = total_income - total_expense
+def monthly_report_max_age(request):
+    # no month and no range means the current month
+    return past_period_max_age(TransactionFilterForm(request.GET).date_range()[1])
 
-    # Last 5 transactions(newest first)
 
-    recent_transactions = (
-        Transaction.objects.filter(
-            user=request.user).order_by("-date", "-id")[:5]
-    )
+def trend_max_age(request):
+    last_month, _months = trend_window(request)
+    return past_period_max_age(shift_month(last_month, 1))
 
-    context = {
-        "total_income": total_income,
-        "total_expense": total_expense,
-        "net_savings": net_savings,
-        "recent_transactions": recent_transactions,
-    }
 
+@login_required
+@user_data_condition
+def dashboard(request):
+    """
+    Totals + last 5 transactions, cached per user until their data changes.
+    """
+    context = get_or_compute(
+        user_cache_key("dashboard", request.user.pk),
+        lambda: reports.dashboard_context(request.user),
+    )
     return render(request, "dashboard.html", context)
 
 
 @login_required
+@user_data_condition(max_age=monthly_report_max_age)
 def monthly_report(request):
     """
     Monthly summary:
-    - ?month=YYYY-MM (defaults to current month)
+    - ?month=YYYY-MM (defaults to current month), or a ?start=/?end= range
+    - the other filters of the transaction list (transactions.filters)
     - total_income, total_expense, net
     - category-wise breakdown
+    Results are cached per user and filter until the user's data changes.
     """
-    month_param = request.GET.get("month", "").strip()
-    if month_param:
-        try:
-            parsed = datetime.strptime(month_param, "%Y-%m")
-            year = parsed.year
-            month = parsed.month
-            selected_month = f"{year:04d}-{month:02d}"
-        except ValueError:
-            today = timezone.localdate()
-            year, month = today.year, today.month
-            selected_month = f"{year:04d}-{month:02d}"
-    else:
-        today = timezone.localdate()
-        year, month = today.year, today.month
-        selected_month = f"{year:04d}-{month:02d}"
-
-    # Base queryset for the user in the requested month
-    qs = Transaction.objects.filter(
-        user=request.user, date__year=year, date__month=month)
-
-    # Totals
-    totals = qs.aggregate(
-        total_income=Sum('amount', filter=Q(type='IN')),
-        total_expense=Sum('amount', filter=Q(type='EX')),
-    )
-    total_income = totals.get('total_income') or Decimal('0.00')
-    total_expense = totals.get('total_expense') or Decimal('0.00')
-    net = total_income - total_expense
-
-    # Category-wise breakdown (use safe alias names to avoid conflicts with model fields)
-    cat_qs = (
-        qs
-        .values(cat_id=F('category__id'), cat_name=F('category__name'))
-        .annotate(
-            cat_income=Sum('amount', filter=Q(type='IN')),
-            cat_expense=Sum('amount', filter=Q(type='EX'))
-        )
-        .order_by('-cat_expense')
+    params, filters = report_filters(request)
+    report = get_or_compute(
+        user_cache_key("monthly-report", request.user.pk, filters.query_string()),
+        lambda: reports.monthly_report_context(request.user, filters),
     )
+    # months that have data, from the rollup
+    month_options = summary.month_options(request.user, filters.selected_month)
+    return render_monthly_report(request, params, filters, report, month_options)
 
-    # Normalize None to Decimal('0.00') and compute expense share
-    breakdown = []
-    for row in cat_qs:
-        cat_id = row.get('cat_id')
-        name = row.get('cat_name') or "Uncategorized"
-        c_income = row.get('cat_income') or Decimal('0.00')
-        c_expense = row.get('cat_expense') or Decimal('0.00')
-        if total_expense and total_expense != 0:
-            share = (c_expense / total_expense) * 100
-        else:
-            share = Decimal('0.00')
-        breakdown.append({
-            "category_id": cat_id,
-            "category_name": name,
-            "income": c_income,
-            "expense": c_expense,
-            "expense_share_pct": round(share, 2),
-        })
-
-    # Month options (last 24 months) for selector
-    months = []
-    today = timezone.localdate()
-    y = today.year
-    m = today.month
-    for i in range(0, 24):
-        mi = m - i
-        yi = y
-        if mi <= 0:
-            mi += 12
-            yi -= 1
-        key = f"{yi:04d}-{mi:02d}"
-        label = f"{yi}-{mi:02d}"
-        months.append((key, label))
 
+def report_filters(request):
+    """(query parameters, validated TransactionFilterForm) of a monthly report request."""
+    params = request.GET.copy()
+    if not parse_month(params.get("month")) and not (params.get("start") or params.get("end")):
+        # missing or invalid ?month= falls back to the current month
+        params["month"] = f"{timezone.localdate():%Y-%m}"
+    filters = TransactionFilterForm(params, user=request.user)
+    filters.spec  # validating ?category= may load the user's categories
+    return params, filters
+
+
+def render_monthly_report(request, params, filters, report, month_options):
     context = {
-        "selected_month": selected_month,
-        "month_options": months,
-        "total_income": total_income,
-        "total_expense": total_expense,
-        "net": net,
-        "breakdown": breakdown,
+        "selected_month": filters.selected_month,
+        "month_options": month_options,
+        "filters": filters,
+        "filter_query": filters.query_string(),
+        # filters besides the month, carried along when another month is picked
+        "extra_filters": [
+            (name, value) for name, values in params.lists()
+            if name != "month" and name in filters.spec for value in values
+        ],
+        **report,
     }
     return render(request, "accounts/monthly_report.html", context)
+
+
+def trend_window(request):
+    """
+    (last month, number of months) of a trend request: ?end=YYYY-MM
+    (default: the current month) and ?months= (1..MAX_TREND_MONTHS).
+    Both are clamped so the window and the month after it are valid dates.
+    """
+    parsed = parse_month(request.GET.get("end"))
+    if parsed:
+        last_month = min(date(*parsed, 1), shift_month(date.max, -1))
+    else:
+        last_month = timezone.localdate().replace(day=1)
+    try:
+        months = int(request.GET.get("months", reports.DEFAULT_TREND_MONTHS))
+    except ValueError:
+        months = reports.DEFAULT_TREND_MONTHS
+    # months from January of year 1 up to and including last_month
+    available = (last_month.year - date.min.year) * 12 + last_month.month
+    return last_month, max(1, min(months, reports.MAX_TREND_MONTHS, available))
+
+
+def cached_trend(user, last_month, months):
+    return get_or_compute(
+        user_cache_key("trend", user.pk, f"{last_month:%Y-%m}", months),
+        lambda: reports.trend(user, last_month, months),
+    )
+
+
+@login_required
+@user_data_condition(max_age=trend_max_age)
+def trend_report(request):
+    """
+    Income / expense / net per month over several months (?months=, ?end=),
+    with the per-category expense behind it.
+    """
+    last_month, months = trend_window(request)
+    trend = cached_trend(request.user, last_month, months)
+    context = {
+        "trend": trend,
+        "rows": list(zip(trend["months"], trend["income"], trend["expense"], trend["net"])),
+        "selected_end": f"{last_month:%Y-%m}",
+        "selected_months": months,
+        "month_options": summary.month_options(request.user, f"{last_month:%Y-%m}"),
+        "months_choices": TREND_MONTHS_CHOICES,
+    }
+    return render(request, "accounts/trend_report.html", context)
+
+
+@login_required
+@user_data_condition(max_age=trend_max_age)
+def trend_data(request):
+    """
+    The trend report as compact JSON for client-side charts. Amounts are
+    decimal strings; every series has one value per entry of "months".
+    """
+    last_month, months = trend_window(request)
+    return JsonResponse(cached_trend(request.user, last_month, months))
@@ -3,6 +3,13 @@ from django.conf import settings
 
 # Create your models here.
 
+class CategoryQuerySet(models.QuerySet):
+
+    def visible_to(self, user):
+        """Categories owned by `user` plus the global ones (user is NULL)."""
+        return self.filter(models.Q(user=user) | models.Q(user__isnull=True))
+
+
 class Category(models.Model):
     INCOME = "IN"
     EXPENSE = "EX"
@@ -23,6 +30,7 @@ class Category(models.Model):
     kind = models.CharField(max_length=2, choices=KIND_CHOICES, default=EXPENSE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = CategoryQuerySet.as_manager()
 
     class Meta:
         unique_together = ("user", "name")
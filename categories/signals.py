@@ -0,0 +1,13 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from transactions.cache import CATEGORIES, bump_data_version
+from .models import Category
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_cached_results(sender, instance, **kwargs):
+    # user=None is a global category: bumps every user's version
+    bump_data_version(instance.user_id)
+    bump_data_version(instance.user_id, scope=CATEGORIES)
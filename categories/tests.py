@@ -1,3 +1,11 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from transactions.testing import QueryBudgetMixin
+
+
+class CategoryQueryBudgetTests(QueryBudgetMixin, TestCase):
+
+    def test_list(self):
+        # session, user, COUNT for the paginator, page
+        self.assertQueryBudget(reverse("categories:list"), 4)
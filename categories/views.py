@@ -4,7 +4,6 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.urls import reverse_lazy
 from django.shortcuts import redirect
-from django.db.models import Q
 from .models import Category
 from .forms import CategoryForm
 from transactions.models import Transaction
@@ -20,7 +19,7 @@ class CategoryListView(LoginRequiredMixin, ListView):
         Show categories that belong to the user OR global categories (user is NULL).
         Order user categories first, then global ones (optional).
         """
-        qs = Category.objects.filter(Q(user=self.request.user) | Q(user__isnull=True)).order_by("-created_at")
+        qs = Category.objects.visible_to(self.request.user).order_by("-created_at")
         return qs
 
 
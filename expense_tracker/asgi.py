@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "expense_tracker.settings")
+# serve the async views (settings.ASYNC_VIEWS) unless configured otherwise
+os.environ.setdefault("ASYNC_VIEWS", "True")
 
 application = get_asgi_application()
@@ -0,0 +1,57 @@
+"""
+Database connection tuning.
+
+``database_settings`` turns the parsed ``DATABASE_URL`` into the final
+``DATABASES["default"]`` entry: persistent connections with health checks,
+or a psycopg connection pool on PostgreSQL, and busy timeout / transaction
+mode on SQLite. The SQLite pragmas themselves (``settings.SQLITE_PRAGMAS``)
+are applied to every new connection by ``apply_sqlite_pragmas``.
+"""
+
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+SQLITE_ENGINE = "django.db.backends.sqlite3"
+POSTGRES_ENGINES = ("django.db.backends.postgresql", "django.contrib.gis.db.backends.postgis")
+
+
+def database_settings(db, conn_max_age=0, health_checks=False, pool=None,
+                      sqlite_timeout=None, sqlite_transaction_mode=None):
+    """
+    Return a copy of the ``db`` settings dict with connection tuning applied.
+
+    ``pool`` is a dict of psycopg_pool options (``min_size``, ``max_size``,
+    ``timeout``) and only applies to PostgreSQL; pooled connections are
+    returned to the pool at the end of each request, so ``CONN_MAX_AGE`` is
+    forced to 0 there as Django requires.
+    """
+    db = {**db, "OPTIONS": dict(db.get("OPTIONS", {}))}
+    db["CONN_MAX_AGE"] = conn_max_age
+    db["CONN_HEALTH_CHECKS"] = health_checks
+
+    if db["ENGINE"] in POSTGRES_ENGINES and pool:
+        db["OPTIONS"]["pool"] = pool
+        db["CONN_MAX_AGE"] = 0
+    elif db["ENGINE"] == SQLITE_ENGINE:
+        if sqlite_timeout is not None:
+            # seconds a writer waits on a locked database before failing
+            db["OPTIONS"]["timeout"] = sqlite_timeout
+        if sqlite_transaction_mode:
+            # IMMEDIATE takes the write lock at BEGIN, so two writers never
+            # deadlock upgrading read locks (which the timeout can't resolve)
+            db["OPTIONS"]["transaction_mode"] = sqlite_transaction_mode
+    return db
+
+
+def sqlite_pragma_statements(pragmas):
+    return [f"PRAGMA {name} = {value}" for name, value in pragmas.items() if value not in (None, "")]
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for statement in sqlite_pragma_statements(getattr(settings, "SQLITE_PRAGMAS", {})):
+            cursor.execute(statement)
@@ -0,0 +1,113 @@
+"""
+In-process request metrics, rendered in the Prometheus text format.
+
+Every worker process keeps its own registry; scrape each worker (or run a
+single worker per host) to get complete numbers.
+"""
+import bisect
+import hmac
+import threading
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+# seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        # one slot per bucket plus +Inf; cumulated when rendering
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    HISTOGRAMS = {
+        "http_request_duration_seconds": ("Total request time.", DURATION_BUCKETS),
+        "http_request_db_duration_seconds": ("Time spent in database queries.", DURATION_BUCKETS),
+        "http_request_template_duration_seconds": ("Time spent rendering templates.", DURATION_BUCKETS),
+        "http_request_db_queries": ("Database queries per request.", QUERY_COUNT_BUCKETS),
+    }
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {name: {} for name in self.HISTOGRAMS}
+        self._responses = {}
+
+    def observe(self, view, status, total, db_time, queries, template_time):
+        values = {
+            "http_request_duration_seconds": total,
+            "http_request_db_duration_seconds": db_time,
+            "http_request_template_duration_seconds": template_time,
+            "http_request_db_queries": queries,
+        }
+        with self._lock:
+            for name, value in values.items():
+                per_view = self._histograms[name]
+                if view not in per_view:
+                    per_view[view] = Histogram(self.HISTOGRAMS[name][1])
+                per_view[view].observe(value)
+            key = (view, status)
+            self._responses[key] = self._responses.get(key, 0) + 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            lines.append("# HELP http_responses_total Responses by view and status code.")
+            lines.append("# TYPE http_responses_total counter")
+            for (view, status), count in sorted(self._responses.items()):
+                lines.append(f'http_responses_total{{view="{_escape(view)}",status="{status}"}} {count}')
+
+            for name, (help_text, buckets) in self.HISTOGRAMS.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for view, histogram in sorted(self._histograms[name].items()):
+                    label = f'view="{_escape(view)}"'
+                    cumulative = 0
+                    for bound, count in zip(buckets + ("+Inf",), histogram.counts):
+                        cumulative += count
+                        lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+                    lines.append(f"{name}_sum{{{label}}} {histogram.sum:.6f}")
+                    lines.append(f"{name}_count{{{label}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {name: {} for name in self.HISTOGRAMS}
+            self._responses = {}
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+def _has_token(request):
+    token = settings.METRICS_TOKEN
+    header = request.headers.get("Authorization", "")
+    return bool(token) and hmac.compare_digest(header.encode(), f"Bearer {token}".encode())
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Only staff users, scrapers sending
+    "Authorization: Bearer <METRICS_TOKEN>" and the addresses in
+    METRICS_ALLOWED_IPS (none by default: behind a reverse proxy on the
+    same host every request comes from localhost) may read it.
+    """
+    user = getattr(request, "user", None)
+    is_staff = user is not None and user.is_authenticated and user.is_staff
+    if not (is_staff or _has_token(request) or request.META.get("REMOTE_ADDR") in settings.METRICS_ALLOWED_IPS):
+        return HttpResponseForbidden("Forbidden")
+    return HttpResponse(registry.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,143 @@
+import contextvars
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.base import Template
+
+from .metrics import registry
+
+# stats of the request being handled in this thread/task (None outside a request)
+_current_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+        self.template_time = 0.0
+        self.template_depth = 0
+        # async views run queries on several threads at once
+        self._lock = threading.Lock()
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.db_time += elapsed
+                self.queries += 1
+
+
+def _record_query(execute, sql, params, many, context):
+    # installed on every connection; the contextvar follows the request
+    # into the threads sync_to_async() runs its queries on
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.db_wrapper(execute, sql, params, many, context)
+
+
+def _instrument(connection, **kwargs):
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_record_query)
+
+
+_original_template_render = Template.render
+
+
+def _timed_template_render(self, context):
+    stats = _current_stats.get()
+    if stats is None:
+        return _original_template_render(self, context)
+    # {% include %} renders templates inside templates; only time the outermost one
+    stats.template_depth += 1
+    start = time.perf_counter()
+    try:
+        return _original_template_render(self, context)
+    finally:
+        stats.template_depth -= 1
+        if stats.template_depth == 0:
+            stats.template_time += time.perf_counter() - start
+
+
+def install_template_timing():
+    """
+    Replace django.template.base.Template.render, for the whole process, with
+    a wrapper that times renders inside a measured request; Django has no
+    hook around template rendering outside tests. Outside requests the
+    wrapper only adds a context variable lookup. Idempotent, and it leaves
+    alone a render method somebody else has replaced in the meantime.
+    """
+    if Template.render is _original_template_render:
+        Template.render = _timed_template_render
+
+
+class PerformanceMiddleware:
+    """
+    Per-request timing: total time, database time and query count, and
+    template render time. Emitted as a Server-Timing header and recorded
+    per URL name in the /metrics histograms (expense_tracker.metrics).
+
+    For streaming responses only the time until the response starts is measured.
+    Works under WSGI and ASGI; queries count wherever they run, including
+    the worker threads of the async views (transactions.async_queries).
+    Disable with PERFORMANCE_METRICS_ENABLED=False; constructing the
+    middleware patches Template.render (see install_template_timing()).
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.PERFORMANCE_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        install_template_timing()
+        # connections are per thread: wrap the ones opened from now on, and
+        # those of the current thread, which may predate this middleware
+        connection_created.connect(_instrument, dispatch_uid="performance-middleware")
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        for connection in connections.all(initialized_only=True):
+            _instrument(connection)
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = _current_stats.set(stats)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - start)
+
+    def finish(self, request, response, stats, total):
+        response["Server-Timing"] = ", ".join([
+            f"total;dur={total * 1000:.1f}",
+            f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries"',
+            f"tpl;dur={stats.template_time * 1000:.1f}",
+        ])
+
+        match = request.resolver_match
+        view = match.view_name if match else "<unresolved>"
+        registry.observe(view, response.status_code, total, stats.db_time, stats.queries, stats.template_time)
+        return response
@@ -11,10 +11,12 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
 from pathlib import Path
-from decouple import config
+from decouple import config, Csv
 import dj_database_url
 import os
 
+from expense_tracker.db import database_settings
+
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -52,6 +54,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "expense_tracker.middleware.PerformanceMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -60,6 +63,14 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Server-Timing header + /metrics histograms (expense_tracker.middleware)
+PERFORMANCE_METRICS_ENABLED = config("PERFORMANCE_METRICS_ENABLED", default=True, cast=bool)
+# besides staff users, scrapers sending "Authorization: Bearer <METRICS_TOKEN>"
+# and these addresses may read /metrics. Behind a reverse proxy every request
+# comes from the proxy's address, so don't list it (or localhost) there.
+METRICS_TOKEN = config("METRICS_TOKEN", default="")
+METRICS_ALLOWED_IPS = config("METRICS_ALLOWED_IPS", default="", cast=Csv())
+
 LOGIN_URL = "/accounts/login/"
 LOGIN_REDIRECT_URL = "/"
 
@@ -75,6 +86,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "accounts.context_processors.currency",
             ],
         },
     },
@@ -82,17 +94,124 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "expense_tracker.wsgi.application"
 
+# Route the dashboard, monthly report and CSV export to their async versions
+# (accounts.async_views, transactions.async_views), which run independent
+# queries concurrently. expense_tracker/asgi.py turns this on by default.
+ASYNC_VIEWS = config("ASYNC_VIEWS", default=False, cast=bool)
+
 
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Connection tuning lives in expense_tracker.db. Connections are kept open
+# for DB_CONN_MAX_AGE seconds (0 = one per request, None = forever) and
+# health-checked before reuse; DB_POOL=True uses a psycopg connection pool
+# instead on PostgreSQL (needs the "psycopg[pool]" package).
+
+DB_CONN_MAX_AGE = config("DB_CONN_MAX_AGE", default=60, cast=lambda v: None if v == "None" else int(v))
+DB_CONN_HEALTH_CHECKS = config("DB_CONN_HEALTH_CHECKS", default=True, cast=bool)
+DB_POOL = config("DB_POOL", default=False, cast=bool)
+DB_POOL_OPTIONS = {
+    "min_size": config("DB_POOL_MIN_SIZE", default=2, cast=int),
+    "max_size": config("DB_POOL_MAX_SIZE", default=10, cast=int),
+    "timeout": config("DB_POOL_TIMEOUT", default=10, cast=int),
+}
+
+# Applied to every new SQLite connection; an empty value skips that pragma.
+# WAL lets readers run alongside the (single) writer, and synchronous=NORMAL
+# is durable in WAL mode except for the last commits on power loss.
+SQLITE_PRAGMAS = {
+    "journal_mode": config("SQLITE_JOURNAL_MODE", default="WAL"),
+    "synchronous": config("SQLITE_SYNCHRONOUS", default="NORMAL"),
+    "cache_size": config("SQLITE_CACHE_SIZE", default=-20000),  # negative = KiB
+    "mmap_size": config("SQLITE_MMAP_SIZE", default=134217728),
+    "temp_store": config("SQLITE_TEMP_STORE", default="MEMORY"),
+}
+
 DATABASES = {
-    "default": dj_database_url.config(
-        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"
+    "default": database_settings(
+        dj_database_url.config(default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}"),
+        conn_max_age=DB_CONN_MAX_AGE,
+        health_checks=DB_CONN_HEALTH_CHECKS,
+        pool=DB_POOL_OPTIONS if DB_POOL else None,
+        sqlite_timeout=config("SQLITE_BUSY_TIMEOUT", default=20, cast=int),
+        sqlite_transaction_mode=config("SQLITE_TRANSACTION_MODE", default="IMMEDIATE"),
     )
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# CACHE_BACKEND takes a short alias or a full backend path; use a shared
+# backend (redis/memcached/db) when running several gunicorn workers/hosts.
+
+CACHE_BACKEND_ALIASES = {
+    "locmem": "django.core.cache.backends.locmem.LocMemCache",
+    "file": "django.core.cache.backends.filebased.FileBasedCache",
+    "db": "django.core.cache.backends.db.DatabaseCache",
+    "redis": "django.core.cache.backends.redis.RedisCache",
+    "memcached": "django.core.cache.backends.memcached.PyMemcacheCache",
+    "dummy": "django.core.cache.backends.dummy.DummyCache",
+}
+CACHE_BACKEND = config("CACHE_BACKEND", default="locmem")
+
+CACHES = {
+    "default": {
+        "BACKEND": CACHE_BACKEND_ALIASES.get(CACHE_BACKEND, CACHE_BACKEND),
+        "LOCATION": config("CACHE_LOCATION", default="expense-tracker"),
+        "TIMEOUT": config("CACHE_TIMEOUT", default=300, cast=int),
+    }
+}
+if CACHE_BACKEND in ("locmem", "file", "db"):
+    # eviction settings only apply to Django's built-in local backends
+    CACHES["default"]["OPTIONS"] = {
+        "MAX_ENTRIES": config("CACHE_MAX_ENTRIES", default=5000, cast=int),
+        "CULL_FREQUENCY": config("CACHE_CULL_FREQUENCY", default=3, cast=int),
+    }
+
+# Whether every web worker (and management command) sees the same cache:
+# true for redis, memcached and db, false for the per-process locmem and
+# the per-host file backends. Cache-based invalidation of sessions, users
+# and HTTP validators only works across workers with a shared cache.
+LOCAL_CACHE_BACKENDS = {CACHE_BACKEND_ALIASES[alias] for alias in ("locmem", "file", "dummy")}
+SHARED_CACHE = config("SHARED_CACHE", default=CACHES["default"]["BACKEND"] not in LOCAL_CACHE_BACKENDS,
+                      cast=bool)
+
+# Sessions and the logged-in user are served from the cache so that an
+# authenticated request doesn't need the django_session and auth_user
+# lookups. That is only safe with a shared cache: with a per-process one, a
+# logout or password change would only reach the worker that handled it,
+# so sessions then default to the database and users are loaded per request.
+# cached_db falls back to the database on a cache miss (cold or evicted
+# entry); "signed_cookies" keeps the session client-side instead.
+SESSION_ENGINE_ALIASES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+SESSION_BACKEND = config("SESSION_BACKEND", default="cached_db" if SHARED_CACHE else "db")
+SESSION_ENGINE = SESSION_ENGINE_ALIASES.get(SESSION_BACKEND, SESSION_BACKEND)
+
+AUTHENTICATION_BACKENDS = [
+    "accounts.backends.CachedModelBackend" if SHARED_CACHE else "accounts.backends.ProfileModelBackend",
+]
+# cached users are also dropped on save/logout (accounts.signals)
+AUTH_USER_CACHE_TIMEOUT = config("AUTH_USER_CACHE_TIMEOUT", default=300, cast=int)
+
+# Dashboard / monthly report result cache (transactions.cache)
+REPORT_CACHE_TIMEOUT = config("REPORT_CACHE_TIMEOUT", default=600, cast=int)
+# How long one request may hold the "computing" lock for a key before
+# others stop waiting for it and compute the value themselves.
+REPORT_CACHE_LOCK_TIMEOUT = config("REPORT_CACHE_LOCK_TIMEOUT", default=10, cast=int)
+# Browser cache lifetime (max-age) of reports that only cover past months;
+# other pages carry validators and are revalidated on every request
+REPORT_PAST_MAX_AGE = config("REPORT_PAST_MAX_AGE", default=86400, cast=int)
+# Longest time a process uses its copy of the exchange rates
+# (transactions.rates) before re-reading them from the database
+EXCHANGE_RATES_MAX_AGE = config("EXCHANGE_RATES_MAX_AGE", default=60, cast=int)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -137,6 +256,22 @@ MIDDLEWARE.insert(
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 
 
+# JSON API (transactions.api): most create/update/delete operations per batch request
+TRANSACTIONS_API_MAX_BATCH = config("TRANSACTIONS_API_MAX_BATCH", default=1000, cast=int)
+
+
+# Background export jobs (transactions.ExportJob, manage.py run_export_worker)
+
+EXPORT_ROOT = config("EXPORT_ROOT", default=str(BASE_DIR / "exports"))
+# finished export files (and their jobs) are removed after this many hours
+EXPORT_RETENTION_HOURS = config("EXPORT_RETENTION_HOURS", default=24, cast=int)
+# a job still running after this many minutes is presumed lost with its
+# worker (crash, OOM kill, deploy) and handed to another worker, at most
+# EXPORT_MAX_ATTEMPTS times in all; then it fails
+EXPORT_JOB_TIMEOUT_MINUTES = config("EXPORT_JOB_TIMEOUT_MINUTES", default=60, cast=int)
+EXPORT_MAX_ATTEMPTS = config("EXPORT_MAX_ATTEMPTS", default=3, cast=int)
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
@@ -15,14 +15,18 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
-from accounts.views import dashboard
+from accounts import async_views as accounts_async_views, views as accounts_views
+from .metrics import metrics_view
 
 urlpatterns = [
-    path("", dashboard, name="dashboard"),
+    path("", accounts_async_views.dashboard if settings.ASYNC_VIEWS else accounts_views.dashboard,
+         name="dashboard"),
     path("admin/", admin.site.urls),
     path("accounts/", include("accounts.urls")),
     path("categories/", include("categories.urls")),
     path("transactions/", include("transactions.urls")),
+    path("metrics", metrics_view, name="metrics"),
 ]
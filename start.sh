@@ -1,2 +1,7 @@
 #!/usr/bin/env bash
-gunicorn expense_tracker.wsgi:application
\ No newline at end of file
+# SERVER=asgi runs the async views (ASYNC_VIEWS) under uvicorn workers;
+# gunicorn still manages the processes (WEB_CONCURRENCY, GUNICORN_CMD_ARGS).
+if [ "${SERVER:-wsgi}" = "asgi" ]; then
+    exec gunicorn expense_tracker.asgi:application -k uvicorn_worker.UvicornWorker
+fi
+exec gunicorn expense_tracker.wsgi:application
@@ -0,0 +1,246 @@
+"""
+JSON API for transactions.
+
+GET  api/transactions/        cursor-paginated list (same scoping and
+                              filters as the HTML list)
+POST api/transactions/batch/  creates, updates and deletes in one request
+
+A batch looks like
+
+    {"operations": [
+        {"op": "create", "data": {"amount": "12.50", "type": "EX", "date": "2025-06-01",
+                                  "category": 3, "description": "Lunch", "currency": "EUR"}},
+        {"op": "update", "id": 41, "data": {"amount": "13.00"}},
+        {"op": "delete", "id": 42}
+    ]}
+
+and is validated as a whole: if any operation is invalid nothing is written
+and the response (400) lists the errors per operation. "currency" is
+optional on create (default: the user's currency) and must be one of the
+currencies with exchange rates or the user's own. Otherwise all of it
+is applied with bulk queries in one database transaction (transactions.services).
+Requests are authenticated by the session, so POSTs need the CSRF token
+(X-CSRFToken header).
+"""
+import json
+from functools import wraps
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.http import JsonResponse
+from django.views.decorators.http import require_GET, require_POST
+
+from .filters import TransactionFilterForm
+from . import rates
+from .models import Transaction
+from .pagination import CursorPaginator
+from .services import bulk_create_transactions, bulk_delete_transactions, bulk_update_transactions
+from .views import user_transactions
+from categories.models import Category
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+FIELDS = ("amount", "type", "category", "description", "date", "currency")
+REQUIRED_ON_CREATE = ("amount", "type", "date")
+# JSON types accepted per field (besides null), checked before the model
+# field's clean(), which expects form-like strings
+JSON_TYPES = {"amount": (str, int, float), "type": (str,), "description": (str,), "date": (str,), "currency": (str,)}
+JSON_TYPE_ERRORS = {"amount": "Expected a number or a string.", "date": 'Expected a "YYYY-MM-DD" string.'}
+
+
+def is_id(value):
+    """Whether a JSON value is a possible primary key (bools are ints to Python)."""
+    return type(value) is int and 0 < value < 2**63
+
+
+def api_login_required(view):
+    """Like login_required, but answers 401 instead of redirecting to the login page."""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({"error": "Authentication required."}, status=401)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+def serialize(tx):
+    return {
+        "id": tx.pk,
+        "date": tx.date,
+        "amount": tx.amount,
+        "currency": tx.currency,
+        "type": tx.type,
+        "category": tx.category_id,
+        "category_name": tx.category.name if tx.category_id else None,
+        "description": tx.description,
+    }
+
+
+@require_GET
+@api_login_required
+def transaction_list(request):
+    """
+    The list's filters (transactions.filters), ?cursor= (from next/previous)
+    and ?page_size= (max MAX_PAGE_SIZE). Results are always newest first.
+    """
+    try:
+        page_size = int(request.GET.get("page_size", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        page_size = DEFAULT_PAGE_SIZE
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+
+    qs = user_transactions(request.user, TransactionFilterForm(request.GET, user=request.user))
+    page = CursorPaginator(qs, page_size).page(request.GET.get("cursor", "").strip())
+    return JsonResponse({
+        "results": [serialize(tx) for tx in page],
+        "next": page.next_cursor or None,
+        "previous": page.previous_cursor or None,
+    })
+
+
+class BatchValidator:
+    """
+    Validate the operations of one batch for `user`. Field values are
+    checked with the model fields' own clean(), categories against the
+    ids the user may use, currencies against the ones with rates
+    (transactions.rates) and updated/deleted ids against the user's rows.
+    Category and row ids come from the database (one query each), inside
+    the batch's transaction: a cached list could still hold a category
+    another worker has just deleted.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._fields = {name: Transaction._meta.get_field(name) for name in FIELDS if name != "category"}
+        self._category_ids = set(Category.objects.visible_to(user).values_list("pk", flat=True))
+        self._currencies = set(rates.currencies(user))
+        self._currency = rates.user_currency(user)
+
+    def clean_data(self, data, creating):
+        """Return ({attname: value}, {field: [messages]}) for one operation's data."""
+        if not isinstance(data, dict):
+            return {}, {"data": ["Expected an object."]}
+        values, errors = {}, {}
+        for name in data.keys() - set(FIELDS):
+            errors[name] = ["Unknown field."]
+        if creating:
+            for name in REQUIRED_ON_CREATE:
+                if name not in data:
+                    errors[name] = ["This field is required."]
+
+        for name, raw in data.items():
+            if name == "category":
+                if raw is None or (is_id(raw) and raw in self._category_ids):
+                    values["category_id"] = raw
+                else:
+                    errors[name] = ["Select a valid category."]
+            elif name in self._fields:
+                if raw is not None and (type(raw) is bool or not isinstance(raw, JSON_TYPES[name])):
+                    errors[name] = [JSON_TYPE_ERRORS.get(name, "Expected a string.")]
+                    continue
+                if name == "amount" and isinstance(raw, float):
+                    # floats are not exact; take the number as written
+                    raw = str(raw)
+                try:
+                    values[name] = self._fields[name].clean(raw, None)
+                except ValidationError as exc:
+                    errors[name] = exc.messages
+        if values.get("currency", self._currency) not in self._currencies:
+            errors["currency"] = ["Unknown currency."]
+        elif creating:
+            values.setdefault("currency", self._currency)
+        return values, errors
+
+    def validate(self, operations):
+        """
+        Return (results, creates, updates, deletes). `results` has one dict
+        per operation; creates/updates are unsaved/modified Transaction
+        instances and deletes a list of ids, all empty if anything failed.
+        """
+        ids = [
+            op.get("id") for op in operations
+            if isinstance(op, dict) and op.get("op") in ("update", "delete") and is_id(op.get("id"))
+        ]
+        existing = Transaction.objects.select_for_update().filter(user=self.user).in_bulk(ids)
+
+        results, creates, updates, deletes = [], [], [], []
+        seen = set()
+        for index, op in enumerate(operations):
+            kind = op.get("op") if isinstance(op, dict) else None
+            result = {"index": index, "op": kind}
+            errors = {}
+
+            if kind == "create":
+                values, errors = self.clean_data(op.get("data"), creating=True)
+                if not errors:
+                    creates.append((result, Transaction(user=self.user, **values)))
+            elif kind in ("update", "delete"):
+                pk = result["id"] = op.get("id")
+                if not is_id(pk) or pk not in existing:
+                    errors["id"] = ["No such transaction."]
+                elif pk in seen:
+                    errors["id"] = ["Transaction appears more than once in the batch."]
+                else:
+                    seen.add(pk)
+                    if kind == "update":
+                        values, errors = self.clean_data(op.get("data"), creating=False)
+                        if not errors:
+                            tx = existing[pk]
+                            for attname, value in values.items():
+                                setattr(tx, attname, value)
+                            updates.append(tx)
+                    else:
+                        deletes.append(pk)
+            else:
+                errors["op"] = ['Expected "create", "update" or "delete".']
+
+            if errors:
+                result["status"] = "error"
+                result["errors"] = errors
+            results.append(result)
+
+        if any(result.get("errors") for result in results):
+            for result in results:
+                result.setdefault("status", "skipped")
+            return results, [], [], []
+        return results, creates, updates, deletes
+
+
+@require_POST
+@api_login_required
+def transaction_batch(request):
+    try:
+        payload = json.loads(request.body)
+        operations = payload["operations"]
+        if not isinstance(operations, list):
+            raise TypeError
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"error": 'Expected a JSON object with an "operations" list.'}, status=400)
+
+    max_batch = settings.TRANSACTIONS_API_MAX_BATCH
+    if len(operations) > max_batch:
+        return JsonResponse(
+            {"error": f"At most {max_batch} operations per batch ({len(operations)} given)."}, status=400)
+
+    with transaction.atomic():
+        results, creates, updates, deletes = BatchValidator(request.user).validate(operations)
+        if any(result.get("status") == "error" for result in results):
+            return JsonResponse({"applied": False, "results": results}, status=400)
+
+        created = bulk_create_transactions([tx for _result, tx in creates])
+        for (result, _tx), tx in zip(creates, created):
+            result["id"] = tx.pk
+            result["status"] = "created"
+        if updates:
+            bulk_update_transactions(updates, FIELDS)
+        if deletes:
+            bulk_delete_transactions(Transaction.objects.filter(user=request.user, pk__in=deletes))
+        for result in results:
+            if result["op"] == "update":
+                result["status"] = "updated"
+            elif result["op"] == "delete":
+                result["status"] = "deleted"
+
+    return JsonResponse({"applied": True, "results": results})
@@ -0,0 +1,39 @@
+"""
+Running independent queries of an async view at the same time.
+
+Django's async ORM methods (aget(), acount(), ...) and sync_to_async() with
+its defaults run on one thread per request, so queries started together
+with asyncio.gather() still execute one after the other. run_query() hands
+its function to the shared thread pool instead (thread_sensitive=False):
+every pool thread has its own database connection, so the queries really
+overlap.
+
+Only use it for read-only work that does not need the request's transaction
+or its connection state.
+"""
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+
+def _run_in_pool(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # pool threads outlive requests, so request_finished never closes
+        # their connections: apply CONN_MAX_AGE and drop broken ones here
+        close_old_connections()
+
+
+async def run_query(func, *args, **kwargs):
+    """Await `func(*args, **kwargs)` run on a pool thread with its own connection."""
+    return await sync_to_async(_run_in_pool, thread_sensitive=False)(func, args, kwargs)
+
+
+async def gather_queries(*calls):
+    """
+    Run several (func, *args) calls concurrently with run_query() and
+    return their results in order.
+    """
+    return await asyncio.gather(*(run_query(func, *args) for func, *args in calls))
@@ -0,0 +1,32 @@
+"""
+Async views routed in place of the ones in transactions.views when
+settings.ASYNC_VIEWS is on (the ASGI deployment, see expense_tracker/asgi.py).
+"""
+from asgiref.sync import sync_to_async
+from django.contrib.auth.decorators import login_required
+
+from .conditional import user_data_condition
+from .exports import async_chunks, export_format, export_queryset
+from .filters import TransactionFilterForm
+from .views import export_response, unknown_export_format
+
+
+def _export_queryset(request):
+    filters = TransactionFilterForm(request.GET, user=request.user)
+    return export_queryset(request.user, filters)
+
+
+@login_required
+@user_data_condition(variant=export_format)
+async def export_transactions_csv(request):
+    """
+    transactions.views.export_transactions_csv with an async iterator as
+    the response body: under ASGI, Django reads a sync iterator to the end
+    before sending any of it, so the file would be buffered in memory.
+    """
+    name = export_format(request)
+    if name is None:
+        return unknown_export_format(request)
+    # validating ?category= may load the user's categories
+    qs, filename_suffix = await sync_to_async(_export_queryset)(request)
+    return export_response(name, qs, filename_suffix, wrap=async_chunks)
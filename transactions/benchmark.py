@@ -0,0 +1,270 @@
+"""
+Deterministic data seeding, view timing, filter cases and scratch databases
+used by the benchmark commands (seed_benchmark_data, benchmark_views,
+benchmark_filters, benchmark_db_writes, benchmark_asgi) and the query-budget
+tests.
+"""
+import functools
+import math
+import os
+import random
+import re
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from categories.models import Category
+from . import rates
+from .cache import CATEGORIES, bump_data_version
+from .models import Transaction
+from .services import bulk_create_transactions
+
+BENCH_PASSWORD = "bench-password"
+
+# transactions are spread over this many days ending at SEED_END
+SEED_DAYS = 730
+SEED_END = date(2025, 12, 31)
+
+# rows handed to bulk_create at a time while seeding
+SEED_BATCH_SIZE = 5000
+
+# first word of every seeded description, so full-text search has something to find
+SEED_WORDS = ["Coffee", "Groceries", "Rent", "Fuel", "Cinema", "Salary", "Pharmacy", "Books",
+              "Taxi", "Electricity", "Internet", "Gym", "Restaurant", "Insurance", "Gift"]
+
+# with seed(currencies=...), this share of the transactions is in one of them
+SEED_FOREIGN_SHARE = 0.2
+
+
+@functools.cache
+def _password_hash():
+    # hashing is deliberately slow; every seeded user shares one hash
+    return make_password(BENCH_PASSWORD)
+
+
+def seed(users=1, transactions=100, categories=5, seed=0, prefix="bench", currencies=()):
+    """
+    Create `users` users with `categories` categories and `transactions`
+    transactions each. The same arguments always produce the same data.
+    Users are named f"{prefix}-user-{n}" and log in with BENCH_PASSWORD.
+    With `currencies`, SEED_FOREIGN_SHARE of the transactions are in one of
+    those instead of the default currency (see seed_rates()).
+    Returns the created users.
+    """
+    rng = random.Random(seed)
+    password = _password_hash()
+    User = get_user_model()
+
+    created = []
+    for n in range(users):
+        user = User(username=f"{prefix}-user-{n}", password=password)
+        user.save()
+        created.append(user)
+
+        cats = Category.objects.bulk_create([
+            Category(
+                user=user,
+                name=f"Category {k}",
+                kind=Category.INCOME if k % 4 == 0 else Category.EXPENSE,
+            )
+            for k in range(categories)
+        ])
+        # bulk_create skips categories.signals
+        bump_data_version(user.pk)
+        bump_data_version(user.pk, scope=CATEGORIES)
+
+        batch = []
+        for i in range(transactions):
+            category = rng.choice(cats) if cats and rng.random() > 0.05 else None
+            currency = rates.DEFAULT_CURRENCY
+            if currencies and rng.random() < SEED_FOREIGN_SHARE:
+                currency = rng.choice(currencies)
+            batch.append(Transaction(
+                currency=currency,
+                user=user,
+                category=category,
+                type=category.kind if category else rng.choice([Transaction.INCOME, Transaction.EXPENSE]),
+                amount=Decimal(rng.randint(100, 500000)) / 100,
+                description=f"{rng.choice(SEED_WORDS)} seeded transaction {i}",
+                date=SEED_END - timedelta(days=rng.randrange(SEED_DAYS)),
+            ))
+            if len(batch) >= SEED_BATCH_SIZE:
+                bulk_create_transactions(batch)
+                batch = []
+        if batch:
+            bulk_create_transactions(batch)
+    return created
+
+
+def seed_rates(currencies, seed=0, base="EUR"):
+    """
+    Load made-up monthly exchange rates for `currencies` and the default
+    currency over the seeded months (a random walk per currency).
+    """
+    rng = random.Random(seed)
+    months = []
+    month = (SEED_END - timedelta(days=SEED_DAYS - 1)).replace(day=1)
+    while month <= SEED_END:
+        months.append(month)
+        month = (month + timedelta(days=32)).replace(day=1)
+    table = {}
+    for currency in sorted({*currencies, rates.DEFAULT_CURRENCY} - {base}):
+        rate = Decimal(rng.randint(50, 10000)) / 100
+        for month in months:
+            rate = (rate * Decimal(1 + rng.uniform(-0.03, 0.03))).quantize(Decimal("0.0001"))
+            table[currency, month] = rate
+    for month in months:
+        table[base, month] = Decimal(1)
+    return rates.load_rates(table)
+
+
+def view_urls():
+    """(name, url) of every view covered by the benchmarks and query budgets."""
+    month = f"{SEED_END:%Y-%m}"
+    return [
+        ("dashboard", reverse("dashboard")),
+        ("transactions:list", reverse("transactions:list")),
+        ("transactions:list (month)", reverse("transactions:list") + f"?month={month}"),
+        ("transactions:list (search)", reverse("transactions:list") + "?q=coffee"),
+        ("accounts:monthly_report", reverse("accounts:monthly_report") + f"?month={month}"),
+        ("accounts:trend_report", reverse("accounts:trend_report") + f"?end={month}&months=24"),
+        ("categories:list", reverse("categories:list")),
+        ("transactions:export_csv", reverse("transactions:export_csv")),
+    ]
+
+
+def fetch(client, url):
+    """GET `url` and consume the body (streaming responses included)."""
+    response = client.get(url)
+    if response.streaming:
+        for _chunk in response.streaming_content:
+            pass
+    else:
+        response.content
+    return response
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a non-empty list."""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def measure(client, url, repeat=20, before_each=None):
+    """
+    Time `repeat` requests to `url` and return latency percentiles (ms),
+    the query count and the peak traced memory (KiB) of one request.
+    `before_each` (e.g. cache.clear) runs before every request.
+    """
+    timings = []
+    for _ in range(repeat):
+        if before_each:
+            before_each()
+        start = time.perf_counter()
+        response = fetch(client, url)
+        timings.append((time.perf_counter() - start) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+
+    # queries and memory from one extra request, so tracing does not skew timings
+    if before_each:
+        before_each()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            fetch(client, url)
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "mean_ms": round(sum(timings) / len(timings), 3),
+        "queries": len(queries),
+        "peak_memory_kib": round(peak / 1024, 1),
+    }
+
+
+def filter_cases(user):
+    """
+    (name, filter params) of the filter combinations covered by
+    benchmark_filters and the index tests, for a user created by seed().
+    """
+    categories = list(
+        Category.objects.filter(user=user, kind=Category.EXPENSE).order_by("pk").values_list("pk", flat=True)[:2])
+    month = f"{SEED_END:%Y-%m}"
+    quarter = {"start": "2025-07-01", "end": "2025-09-30"}
+    return [
+        ("month", {"month": month}),
+        ("date range", quarter),
+        ("type + month", {"type": Transaction.EXPENSE, "month": month}),
+        ("category + date range", {"category": categories[:1], **quarter}),
+        ("category + type + min amount + date range",
+         {"category": categories[:1], "type": Transaction.EXPENSE, "min_amount": "500", **quarter}),
+        ("categories + uncategorized", {"category": categories + ["none"]}),
+        ("amount range", {"min_amount": "100", "max_amount": "500"}),
+        ("search + month", {"q": "coffee", "month": month}),
+        # every seeded description has this word: ranking cost grows with the matches
+        ("broad search", {"q": "seeded"}),
+    ]
+
+
+# a plan line reading the whole transactions table instead of an index range
+_FULL_SCAN = {
+    "sqlite": re.compile(r"\bSCAN transactions_transaction\b(?! USING)"),
+    "postgresql": re.compile(r"\bSeq Scan on transactions_transaction\b"),
+}
+
+
+def full_table_scan(plan, vendor):
+    """True if the EXPLAIN output `plan` scans the whole transactions table."""
+    pattern = _FULL_SCAN.get(vendor)
+    return bool(pattern and pattern.search(plan))
+
+
+class ScratchDatabase:
+    """
+    Point the default alias at a fresh, migrated database configured as
+    ``db`` for the duration of the block: a temporary file for SQLite (so
+    that concurrent writers actually contend for it), otherwise the usual
+    test database.
+    """
+
+    def __init__(self, db):
+        self.db = db
+
+    def __enter__(self):
+        connections.close_all()
+        self.original = dict(connection.settings_dict)
+        connection.settings_dict.update(self.db)
+        if connection.vendor == "sqlite":
+            fd, self.path = tempfile.mkstemp(suffix=".sqlite3")
+            os.close(fd)
+            connection.settings_dict["NAME"] = self.path
+            call_command("migrate", verbosity=0, interactive=False)
+        else:
+            self.path = None
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        return self
+
+    def __exit__(self, *exc_info):
+        connections.close_all()
+        if self.path:
+            for suffix in ("", "-wal", "-shm"):
+                if os.path.exists(self.path + suffix):
+                    os.remove(self.path + suffix)
+        else:
+            connection.creation.destroy_test_db(self.original["NAME"], verbosity=0)
+        connection.settings_dict.clear()
+        connection.settings_dict.update(self.original)
@@ -0,0 +1,204 @@
+"""
+Versioned per-user result cache.
+
+Every user has a data version that is bumped whenever one of their
+transactions or categories changes (see transactions.signals and
+categories.signals). Cached results embed that version in their key, so a
+change makes the old entries unreachable instead of having to find and
+delete them; they simply age out of the cache.
+
+That only works if every worker sees the bumps, i.e. with a shared cache
+(settings.SHARED_CACHE). With a per-process one (locmem, the default), a
+change handled by one worker would leave another serving its stale copy
+until it expired, so get_or_compute() computes every time instead.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+# Version scopes: DATA covers everything a user's reports depend on,
+# CATEGORIES only their category list (so adding a transaction does not
+# invalidate cached category choices). RATES only has a global version,
+# for the in-process copies of the exchange rates (transactions.rates).
+DATA = "data"
+CATEGORIES = "categories"
+RATES = "rates"
+
+USER_VERSION_KEY = "{scope}-version:user:{user_id}"
+# bumped when a global category (user=NULL) changes; it is part of everyone's version
+GLOBAL_VERSION_KEY = "{scope}-version:global"
+# unix time of the last bump of the version key they are appended to
+MODIFIED_SUFFIX = ":modified"
+
+# seconds between cache polls while another request computes the same key
+LOCK_POLL_INTERVAL = 0.05
+
+_MISSING = object()
+
+
+def _initial_version():
+    # Millisecond timestamp: if a version key is evicted, the re-created
+    # version is still newer than anything cached under the old one.
+    return int(time.time() * 1000)
+
+
+def _incr(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # key missing (never set, or evicted)
+        cache.set(key, _initial_version(), timeout=None)
+    cache.set(key + MODIFIED_SUFFIX, time.time(), timeout=None)
+
+
+def data_version(user_id, scope=DATA):
+    """Current data version of a user, as a string usable in cache keys."""
+    user_key = USER_VERSION_KEY.format(scope=scope, user_id=user_id)
+    global_key = GLOBAL_VERSION_KEY.format(scope=scope)
+    found = cache.get_many([user_key, global_key])
+    versions = []
+    for key in (user_key, global_key):
+        version = found.get(key)
+        if version is None:
+            cache.add(key, _initial_version(), timeout=None)
+            version = cache.get(key, 0)
+        versions.append(str(version))
+    return ".".join(versions)
+
+
+def global_version(scope):
+    """Current global version of `scope` (no user part)."""
+    key = GLOBAL_VERSION_KEY.format(scope=scope)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), timeout=None)
+        version = cache.get(key, 0)
+    return version
+
+
+def data_validators(user_id, scope=DATA):
+    """
+    (data_version(), unix time of the last change) of a user's data, for
+    ETag / Last-Modified headers, in one cache round trip. Missing entries
+    (never bumped, or evicted) are created; an unknown time counts from now.
+    """
+    version_keys = [USER_VERSION_KEY.format(scope=scope, user_id=user_id),
+                    GLOBAL_VERSION_KEY.format(scope=scope)]
+    modified_keys = [key + MODIFIED_SUFFIX for key in version_keys]
+    found = cache.get_many(version_keys + modified_keys)
+    if len(found) < 4:
+        for key in version_keys:
+            if key not in found:
+                cache.add(key, _initial_version(), timeout=None)
+        for key in modified_keys:
+            if key not in found:
+                cache.add(key, time.time(), timeout=None)
+        found = cache.get_many(version_keys + modified_keys)
+    version = ".".join(str(found.get(key, 0)) for key in version_keys)
+    return version, max(found.get(key, time.time()) for key in modified_keys)
+
+
+def bump_data_version(user_id=None, scope=DATA):
+    """
+    Invalidate the cached results of one user, or of everybody when
+    `user_id` is None (global data changed).
+
+    Bumps now and again once the surrounding database transaction commits,
+    so a concurrent reader cannot cache pre-commit data under the new version.
+    """
+    if user_id is None:
+        key = GLOBAL_VERSION_KEY.format(scope=scope)
+    else:
+        key = USER_VERSION_KEY.format(scope=scope, user_id=user_id)
+    _incr(key)
+    transaction.on_commit(lambda: _incr(key))
+
+
+def user_cache_key(prefix, user_id, *parts, scope=DATA):
+    """Cache key for a per-user result, tied to the user's current version of `scope`."""
+    return ":".join([prefix, str(user_id), data_version(user_id, scope), *map(str, parts)])
+
+
+def get_or_compute(key, compute, timeout=None):
+    """
+    Return the cached value for `key`, computing and storing it on a miss.
+
+    Stampede protection: only the request that wins cache.add() on the lock
+    key runs `compute`; concurrent misses for the same key wait for its result
+    (up to REPORT_CACHE_LOCK_TIMEOUT seconds) instead of all hitting the database.
+
+    Without a shared cache (settings.SHARED_CACHE) nothing is cached.
+    """
+    if not settings.SHARED_CACHE:
+        return compute()
+
+    value = cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    if timeout is None:
+        timeout = settings.REPORT_CACHE_TIMEOUT
+    lock_timeout = settings.REPORT_CACHE_LOCK_TIMEOUT
+    lock_key = f"{key}:lock"
+
+    if cache.add(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = compute()
+            cache.set(key, value, timeout=timeout)
+            return value
+        finally:
+            cache.delete(lock_key)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        value = cache.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if cache.get(lock_key) is None:
+            # the other request finished (or failed) without storing a value
+            break
+
+    # waiting did not help; compute without caching rather than fail the request
+    return compute()
+
+
+async def aget_or_compute(key, compute, timeout=None):
+    """
+    get_or_compute() for async views: `compute` is a coroutine function,
+    the cache is used through its async API and waiting for another
+    request's result does not block the event loop.
+    """
+    if not settings.SHARED_CACHE:
+        return await compute()
+
+    value = await cache.aget(key, _MISSING)
+    if value is not _MISSING:
+        return value
+
+    if timeout is None:
+        timeout = settings.REPORT_CACHE_TIMEOUT
+    lock_timeout = settings.REPORT_CACHE_LOCK_TIMEOUT
+    lock_key = f"{key}:lock"
+
+    if await cache.aadd(lock_key, 1, timeout=lock_timeout):
+        try:
+            value = await compute()
+            await cache.aset(key, value, timeout=timeout)
+            return value
+        finally:
+            await cache.adelete(lock_key)
+
+    deadline = time.monotonic() + lock_timeout
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        value = await cache.aget(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if await cache.aget(lock_key) is None:
+            break
+
+    return await compute()
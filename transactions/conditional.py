@@ -0,0 +1,137 @@
+"""
+Conditional GET for per-user pages.
+
+user_data_condition() gives a view an ETag derived from the user's data
+version (transactions.cache) and a Last-Modified from the time of the last
+change, both bumped on every transaction and category change. A client
+revalidating an unchanged page gets a 304 after one cache lookup: the view,
+its queries and its template never run.
+
+Responses are per user, so they are marked private: browsers keep and
+revalidate them, shared caches must not serve them to anyone else.
+
+The versions live in the cache, so validators are only trustworthy when all
+workers share it (settings.SHARED_CACHE). With a per-process cache another
+worker would not see a change and answer 304 with stale data, so pages are
+then sent without validators and with "no-store".
+"""
+import hashlib
+from datetime import datetime, timezone as dt_timezone
+from functools import partial, wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .cache import data_validators
+
+
+def _validators(request):
+    # etag_func and last_modified_func both need them; look them up once
+    if not hasattr(request, "_data_validators"):
+        request._data_validators = data_validators(request.user.pk)
+    return request._data_validators
+
+
+def _cacheable(request):
+    # flash messages are shown once, so a page carrying them is not reusable
+    return request.user.is_authenticated and not len(messages.get_messages(request))
+
+
+def user_data_etag(request, *args, **kwargs):
+    if not _cacheable(request):
+        return None
+    version, _modified = _validators(request)
+    parts = [
+        str(request.user.pk),
+        version,
+        request.get_full_path(),
+        # defaults like "the current month" change without the data changing
+        f"{timezone.localdate():%Y-%m}",
+        # forms embed the CSRF token, which changes with the session's secret
+        request.META.get("CSRF_COOKIE", ""),
+        # representation picked from request headers (user_data_condition's variant)
+        getattr(request, "_data_variant", ""),
+    ]
+    return hashlib.md5("\n".join(parts).encode(), usedforsecurity=False).hexdigest()
+
+
+def user_data_last_modified(request, *args, **kwargs):
+    if not _cacheable(request):
+        return None
+    _version, modified = _validators(request)
+    return datetime.fromtimestamp(modified, tz=dt_timezone.utc)
+
+
+def _with_variant(conditional, variant):
+    if iscoroutinefunction(conditional):
+        async def async_wrapper(request, *args, **kwargs):
+            request._data_variant = str(variant(request))
+            return await conditional(request, *args, **kwargs)
+        return async_wrapper
+
+    def wrapper(request, *args, **kwargs):
+        request._data_variant = str(variant(request))
+        return conditional(request, *args, **kwargs)
+    return wrapper
+
+
+def user_data_condition(view=None, *, max_age=None, variant=None):
+    """
+    Add the ETag / Last-Modified validators to `view` and answer matching
+    conditional requests with 304. Responses (304s included) are marked
+    "private, no-cache", i.e. revalidate every time, unless
+    `max_age(request)` returns a number of seconds the browser may reuse
+    them without asking, for data that effectively never changes.
+
+    `variant(request)` names the representation a view negotiates from
+    the Accept header (e.g. an export format); it goes into the ETag and
+    the responses get "Vary: Accept".
+
+    Without a shared cache (settings.SHARED_CACHE) the view runs
+    unconditionally and responses are "private, no-store" (or keep the
+    `max_age` lifetime).
+
+    Works on async views too; there the user and the validators are looked
+    up before condition() reads them, so it does not block the event loop.
+    """
+    if view is None:
+        return partial(user_data_condition, max_age=max_age, variant=variant)
+
+    conditional = condition(etag_func=user_data_etag, last_modified_func=user_data_last_modified)(view)
+    if variant is not None:
+        conditional = _with_variant(conditional, variant)
+
+    def set_cache_control(request, response, validated=True):
+        seconds = max_age(request) if max_age else None
+        if seconds:
+            patch_cache_control(response, private=True, max_age=seconds)
+        elif validated:
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, private=True, no_store=True)
+        if variant is not None:
+            patch_vary_headers(response, ["Accept"])
+        return response
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            # request.user is lazy and would load synchronously
+            request.user = await request.auser()
+            if not settings.SHARED_CACHE:
+                return set_cache_control(request, await view(request, *args, **kwargs), validated=False)
+            if request.user.is_authenticated:
+                request._data_validators = await sync_to_async(data_validators)(request.user.pk)
+            return set_cache_control(request, await conditional(request, *args, **kwargs))
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not settings.SHARED_CACHE:
+            return set_cache_control(request, view(request, *args, **kwargs), validated=False)
+        return set_cache_control(request, conditional(request, *args, **kwargs))
+    return wrapper
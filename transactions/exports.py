@@ -0,0 +1,362 @@
+"""
+Row formatting shared by the streamed download (export_transactions_csv,
+sync and async; CSV, gzipped CSV, JSON Lines or Parquet) and the background
+export jobs (ExportJob / run_export_worker).
+"""
+import csv
+import gzip
+import importlib.util
+import os
+import re
+import zlib
+from datetime import timedelta
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .filters import TransactionFilterForm
+from .models import ExportJob, Transaction
+
+# Rows are pulled from the database in chunks of this size and flushed to the
+# client in batches of the same size, so memory stays flat regardless of how
+# many transactions a user has.
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_HEADER = ["date", "category", "amount", "description", "type", "currency"]
+EXPORT_FIELDS = ["date", "category__name", "amount", "description", "type", "currency"]
+
+# Parquet is written (and flushed to the client) one row group at a time;
+# larger groups compress better, smaller ones keep less in memory.
+PARQUET_ROW_GROUP_SIZE = 10 * EXPORT_CHUNK_SIZE
+
+
+class Echo:
+    """
+    Pseudo-buffer for csv.writer: write() returns the formatted line instead
+    of storing it, so rows can be yielded straight into a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_queryset(user, filters):
+    """
+    Transactions to export, newest first, plus the filename suffix.
+    `filters` is a TransactionFilterForm, applied the same way as on the list.
+    Passing user=None exports every user's transactions (staff export jobs).
+    """
+    qs = Transaction.objects.all()
+    if user is not None:
+        qs = qs.filter(user=user)
+    qs = filters.apply(qs, user=user)
+    return qs.order_by("-date", "-id"), filters.filename_suffix()
+
+
+def export_rows(qs, with_username=False):
+    """
+    Yield one list per transaction in the export column order.
+    Uses plain tuples with the category name joined in (no model instances,
+    no per-row category lookup) and iterates with a server-side cursor where
+    the database supports it. `with_username` prepends the owner's username
+    (for exports spanning several users).
+    """
+    fields = list(EXPORT_FIELDS)
+    if with_username:
+        fields.append("user__username")
+    rows = qs.values_list(*fields)
+    for date, category, amount, description, ttype, currency, *owner in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield owner + [
+            date.isoformat(),  # ISO date (YYYY-MM-DD)
+            category or "",
+            amount if amount is not None else "",
+            description or "",
+            ttype or "",
+            currency,
+        ]
+
+
+def stream_csv(rows, header=EXPORT_HEADER):
+    """
+    Yield the CSV document in text chunks: UTF-8 BOM (so Excel recognizes
+    UTF-8), header row, then the data rows batched EXPORT_CHUNK_SIZE at a time.
+    """
+    writer = csv.writer(Echo())
+    yield "\ufeff" + writer.writerow(header)
+
+    batch = []
+    for row in rows:
+        batch.append(writer.writerow(row))
+        if len(batch) >= EXPORT_CHUNK_SIZE:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def stream_gzip(chunks):
+    """
+    Gzip a stream of text chunks such as stream_csv() on the fly, yielding
+    the compressed bytes as the compressor produces them.
+    """
+    compressor = zlib.compressobj(wbits=31)  # 16 + 15: gzip header and trailer
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_jsonl(rows, header=EXPORT_HEADER):
+    """
+    Yield JSON Lines (one object per row, keyed by the CSV header) in
+    batches of EXPORT_CHUNK_SIZE lines. Amounts are decimal strings.
+    """
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    batch = []
+    for row in rows:
+        batch.append(encoder.encode(dict(zip(header, row))) + "\n")
+        if len(batch) >= EXPORT_CHUNK_SIZE:
+            yield "".join(batch)
+            batch = []
+    if batch:
+        yield "".join(batch)
+
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+class ChunkSink:
+    """
+    Write-only file object for pyarrow's ParquetWriter: keeps what was
+    written until take() hands it over, so a file can be streamed as it
+    is being written.
+    """
+
+    closed = False
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def take(self):
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def stream_parquet(qs):
+    """
+    Yield a Parquet file of the transactions (typed columns: date, decimal
+    amount) one row group of PARQUET_ROW_GROUP_SIZE rows at a time, read
+    from the same chunked cursor as the CSV. Requires pyarrow.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    amount = Transaction._meta.get_field("amount")
+    schema = pa.schema([
+        ("date", pa.date32()),
+        ("category", pa.string()),
+        ("amount", pa.decimal128(amount.max_digits, amount.decimal_places)),
+        ("description", pa.string()),
+        ("type", pa.string()),
+        ("currency", pa.string()),
+    ])
+    rows = qs.values_list(*EXPORT_FIELDS).iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    sink = ChunkSink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        while batch := list(islice(rows, PARQUET_ROW_GROUP_SIZE)):
+            columns = [pa.array(values, type=field.type) for values, field in zip(zip(*batch), schema)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            yield sink.take()
+    yield sink.take()
+
+
+def _csv(qs):
+    return stream_csv(export_rows(qs))
+
+
+def _csv_gz(qs):
+    return stream_gzip(stream_csv(export_rows(qs)))
+
+
+def _jsonl(qs):
+    return stream_jsonl(export_rows(qs))
+
+
+# ?format= name -> (media type for Accept negotiation, Content-Type,
+# file extension, queryset -> chunks); csv comes first, it is the default
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "text/csv; charset=utf-8", "csv", _csv),
+    "csv.gz": ("application/gzip", "application/gzip", "csv.gz", _csv_gz),
+    "jsonl": ("application/x-ndjson", "application/x-ndjson; charset=utf-8", "jsonl", _jsonl),
+    "parquet": ("application/vnd.apache.parquet", "application/vnd.apache.parquet", "parquet", stream_parquet),
+}
+
+
+def available_formats():
+    """The EXPORT_FORMATS names this installation can produce."""
+    return [name for name in EXPORT_FORMATS if name != "parquet" or parquet_available()]
+
+
+def export_format(request):
+    """
+    The export format a request asks for: ?format= if given (None when it
+    names an unknown or unavailable format), else the best match for the
+    Accept header, else csv.
+    """
+    formats = available_formats()
+    if "format" in request.GET:
+        name = request.GET["format"]
+        return name if name in formats else None
+    media_types = {EXPORT_FORMATS[name][0]: name for name in formats}
+    preferred = request.get_preferred_type(list(media_types))
+    return media_types.get(preferred, "csv")
+
+
+async def async_chunks(chunks):
+    """
+    Async iterator over a sync one such as stream_csv(), for async views.
+    Every chunk is produced on the request's sync thread, which keeps the
+    database cursor on one connection and the event loop free while rows
+    are fetched and formatted.
+    """
+    chunks = iter(chunks)
+    done = object()
+    while (chunk := await sync_to_async(next)(chunks, done)) is not done:
+        yield chunk
+
+
+class CountingRows:
+    """Wraps a row iterator and counts the rows that went through it."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+def run_export_job(job):
+    """
+    Write the file for a claimed (RUNNING) job to EXPORT_ROOT, chunk by chunk.
+    The file is written under a temporary name and renamed when complete, so
+    a download never sees a partial file.
+
+    A worker that was too slow may have had its job reclaimed by another one
+    (claim_next_job()). Both file names include the attempt, and the result
+    is only recorded if the job is still on this attempt; otherwise the file
+    is removed. Returns whether the result was recorded.
+    """
+    user = None if job.all_users else job.user
+    qs, filename_suffix = export_queryset(user, TransactionFilterForm({"month": job.month}))
+
+    header = (["username"] if job.all_users else []) + EXPORT_HEADER
+    rows = CountingRows(export_rows(qs, with_username=job.all_users))
+
+    filename = f"transactions-{filename_suffix}-{job.pk}-{job.attempts}.csv" + (".gz" if job.compress else "")
+    os.makedirs(settings.EXPORT_ROOT, exist_ok=True)
+    path = os.path.join(settings.EXPORT_ROOT, filename)
+    tmp_path = path + ".part"
+
+    opener = gzip.open if job.compress else open
+    with opener(tmp_path, "wt", encoding="utf-8", newline="") as f:
+        for chunk in stream_csv(rows, header=header):
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+    recorded = _current_attempt(job).update(
+        status=ExportJob.DONE, file_name=filename, row_count=rows.count, finished_at=timezone.now())
+    if not recorded:
+        os.remove(path)
+    return bool(recorded)
+
+
+def _current_attempt(job):
+    """`job` as a queryset, if it is still RUNNING the attempt `job` was claimed for."""
+    return ExportJob.objects.filter(pk=job.pk, status=ExportJob.RUNNING, attempts=job.attempts)
+
+
+def _partial_files(job, attempts=None):
+    """Paths of the temporary files of `job` (of one attempt, or of all of them)."""
+    attempt = str(attempts) if attempts is not None else r"\d+"
+    pattern = re.compile(rf"-{job.pk}-{attempt}\.csv(\.gz)?\.part$")
+    names = os.listdir(settings.EXPORT_ROOT) if os.path.isdir(settings.EXPORT_ROOT) else []
+    return [os.path.join(settings.EXPORT_ROOT, name) for name in names if pattern.search(name)]
+
+
+def claim_next_job():
+    """
+    Take the oldest pending job off the queue, or return None.
+    The conditional UPDATE only succeeds for one worker, so several workers
+    can poll the same table without an external broker or row locks.
+
+    Jobs left RUNNING for EXPORT_JOB_TIMEOUT_MINUTES by a worker that died
+    are claimed again while they have attempts left, and failed after that.
+    """
+    stale = timezone.now() - timedelta(minutes=settings.EXPORT_JOB_TIMEOUT_MINUTES)
+    abandoned = Q(status=ExportJob.RUNNING, started_at__lt=stale)
+    for job in ExportJob.objects.filter(abandoned, attempts__gte=settings.EXPORT_MAX_ATTEMPTS):
+        fail_export_job(job, TimeoutError(f"Gave up after {job.attempts} attempts"))
+
+    claimable = Q(status=ExportJob.PENDING) | (abandoned & Q(attempts__lt=settings.EXPORT_MAX_ATTEMPTS))
+    while True:
+        job = ExportJob.objects.filter(claimable).order_by("created_at", "id").first()
+        if job is None:
+            return None
+        claimed = ExportJob.objects.filter(claimable, pk=job.pk, attempts=job.attempts).update(
+            status=ExportJob.RUNNING, started_at=timezone.now(), attempts=F("attempts") + 1)
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def fail_export_job(job, exc):
+    """
+    Mark a job as failed, unless it has been reclaimed since (see
+    run_export_job()), and remove its partial file. Returns whether the
+    failure was recorded.
+    """
+    recorded = _current_attempt(job).update(
+        status=ExportJob.FAILED, error=str(exc) or exc.__class__.__name__, finished_at=timezone.now())
+    # once failed, no attempt can record its result: drop the files of earlier ones too
+    for path in _partial_files(job, None if recorded else job.attempts):
+        os.remove(path)
+    return bool(recorded)
+
+
+def purge_expired_jobs():
+    """
+    Delete jobs (and their files) that finished more than
+    EXPORT_RETENTION_HOURS ago. Returns the number of jobs removed.
+    """
+    cutoff = timezone.now() - timedelta(hours=settings.EXPORT_RETENTION_HOURS)
+    expired = list(ExportJob.objects.filter(finished_at__lt=cutoff))
+    for job in expired:
+        if job.file_path and os.path.exists(job.file_path):
+            os.remove(job.file_path)
+    ExportJob.objects.filter(pk__in=[job.pk for job in expired]).delete()
+    return len(expired)
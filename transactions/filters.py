@@ -0,0 +1,154 @@
+"""
+The filter spec shared by the transaction list, the CSV export, the JSON
+API, the bulk actions and the monthly report. All of them take the same
+query parameters:
+
+    ?month=YYYY-MM
+    ?start=YYYY-MM-DD  ?end=YYYY-MM-DD   (inclusive; intersected with month)
+    ?category=<id>                       (repeatable; "none" = uncategorized)
+    ?type=IN|EX
+    ?min_amount=  ?max_amount=           (inclusive)
+    ?q=                                  (full-text search, transactions.search)
+
+Invalid values are ignored, the way an invalid ?month= always was.
+
+Every combination narrows the rows with a range on the (user, date, id),
+(user, type, date) or (user, category, date) index; amounts are checked on
+the rows that range yields. manage.py benchmark_filters prints the plan of
+the common combinations.
+"""
+from datetime import date, timedelta
+from functools import cached_property
+from urllib.parse import urlencode
+
+from django import forms
+from django.db.models import Q
+from django.db.models.fields import BLANK_CHOICE_DASH
+
+from .forms import category_choices
+from .models import Transaction
+from .search import search_terms
+from .utils import month_bounds, parse_month
+
+
+class TransactionFilterForm(forms.Form):
+    UNCATEGORIZED = "none"
+
+    month = forms.CharField(required=False)
+    start = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    end = forms.DateField(required=False, widget=forms.DateInput(attrs={"type": "date"}))
+    category = forms.MultipleChoiceField(required=False)
+    type = forms.ChoiceField(choices=BLANK_CHOICE_DASH + Transaction.TRANSACTION_TYPE_CHOICES,
+                             required=False)
+    min_amount = forms.DecimalField(required=False, max_digits=12, decimal_places=2)
+    max_amount = forms.DecimalField(required=False, max_digits=12, decimal_places=2)
+    q = forms.CharField(required=False)
+
+    def __init__(self, data=None, user=None, **kwargs):
+        super().__init__(data, **kwargs)
+        # loaded on first use (a ?category= to validate, or rendering), from
+        # the per-user cache
+        self.fields["category"].choices = lambda: [(self.UNCATEGORIZED, "Uncategorized")] + (
+            category_choices(user)[1:] if user is not None else [])
+
+    def clean_month(self):
+        month = self.cleaned_data["month"]
+        if month and parse_month(month) is None:
+            raise forms.ValidationError("Use the YYYY-MM format.")
+        return parse_month(month)
+
+    def clean_q(self):
+        q = self.cleaned_data["q"].strip()
+        return q if search_terms(q) else ""
+
+    @cached_property
+    def spec(self):
+        """{name: cleaned value} of the filters that are set and valid."""
+        if not self.is_bound:
+            return {}
+        self.is_valid()
+        return {name: value for name, value in self.cleaned_data.items() if value not in (None, "", [])}
+
+    def date_range(self):
+        """Half-open [start, end) bounds of the month and start/end filters; None where open."""
+        start, end = self.spec.get("start"), self.spec.get("end")
+        if end:
+            # nothing lies after the last representable date
+            end = end + timedelta(days=1) if end < date.max else None
+        if "month" in self.spec:
+            month_start, month_end = month_bounds(*self.spec["month"])
+            start = max(start, month_start) if start else month_start
+            end = min(end, month_end) if end else month_end
+        return start, end
+
+    def apply(self, qs, user=None, date_field="date"):
+        """
+        Narrow `qs` to the filters. Works on Transaction querysets and, for
+        the month/category/type filters, on MonthlySummary ones
+        (date_field="month"). A search adds the `search_rank` annotation;
+        `user` is the owner `qs` is already limited to (see
+        TransactionQuerySet.search).
+        """
+        start, end = self.date_range()
+        if start:
+            qs = qs.filter(**{f"{date_field}__gte": start})
+        if end:
+            qs = qs.filter(**{f"{date_field}__lt": end})
+
+        categories = self.spec.get("category")
+        if categories:
+            ids = [int(value) for value in categories if value != self.UNCATEGORIZED]
+            condition = Q(category_id__in=ids)
+            if self.UNCATEGORIZED in categories:
+                condition |= Q(category__isnull=True)
+            qs = qs.filter(condition)
+
+        if "type" in self.spec:
+            qs = qs.filter(type=self.spec["type"])
+        if "min_amount" in self.spec:
+            qs = qs.filter(amount__gte=self.spec["min_amount"])
+        if "max_amount" in self.spec:
+            qs = qs.filter(amount__lte=self.spec["max_amount"])
+        if "q" in self.spec:
+            qs = qs.search(self.spec["q"], user=user)
+        return qs
+
+    @property
+    def is_search(self):
+        return "q" in self.spec
+
+    @property
+    def is_date_only(self):
+        """True when at most date filters apply, so the rows listed are consecutive in (date, id) order."""
+        return self.spec.keys() <= {"month", "start", "end"}
+
+    @property
+    def selected_month(self):
+        month = self.spec.get("month")
+        return f"{month[0]:04d}-{month[1]:02d}" if month else ""
+
+    def query_string(self):
+        """The valid filters as a query string, for links and forms that keep them."""
+        pairs = []
+        for name in self.fields:
+            if name in self.spec:
+                value = self[name].data
+                pairs.extend((name, item) for item in (value if isinstance(value, list) else [value]))
+        return urlencode(pairs)
+
+    def filename_suffix(self):
+        """
+        "YYYYMM" for a month, "YYYYMMDD-YYYYMMDD" for a date range, "all"
+        without either; "-filtered" is appended when other filters apply.
+        """
+        if "start" in self.spec or "end" in self.spec:
+            start, end = self.date_range()
+            suffix = f"{start:%Y%m%d}-" if start else "-"
+            suffix += f"{end - timedelta(days=1):%Y%m%d}" if end else ""
+        elif "month" in self.spec:
+            suffix = self.selected_month.replace("-", "")
+        else:
+            suffix = "all"
+        if self.spec.keys() - {"month", "start", "end"}:
+            suffix += "-filtered"
+        return suffix
@@ -1,13 +1,139 @@
 from django import forms
-from .models import Transaction
+from django.db.models.fields import BLANK_CHOICE_DASH
+from . import rates
+from .cache import CATEGORIES, get_or_compute, user_cache_key
+from .models import ExportJob, Transaction
+from .utils import parse_month
 from categories.models import Category
 
 
+def category_choices(user):
+    """
+    (id, label) choices for the user's own and the global categories,
+    cached until one of those categories changes (with a shared cache only,
+    see transactions.cache).
+    """
+    def load():
+        return [("", BLANK_CHOICE_DASH[0][1])] + [
+            (category.pk, str(category)) for category in Category.objects.visible_to(user)
+        ]
+    return get_or_compute(user_cache_key("category-choices", user.pk, scope=CATEGORIES), load)
+
+
+def currency_choices(user, current=None):
+    """
+    (code, code) choices for a transaction's currency: the currencies with
+    exchange rates (read from the in-process copy) and the user's own, plus
+    `current`, e.g. the currency of the transaction being edited.
+    """
+    codes = set(rates.currencies(user))
+    if current:
+        codes.add(current)
+    return [(code, code) for code in sorted(codes)]
+
+
 class TransactionForm(forms.ModelForm):
+    # left out: the transaction's current currency, or the user's for a new one
+    currency = forms.ChoiceField(required=False)
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if user is not None:
+            category = self.fields["category"]
+            # validation looks up the submitted id within this queryset only
+            category.queryset = Category.objects.visible_to(user)
+            # rendering uses the cached list instead of evaluating the queryset
+            category.choices = category_choices(user)
+        if self.instance.pk:
+            self.default_currency = self.instance.currency
+        else:
+            self.default_currency = rates.user_currency(user) if user is not None else rates.DEFAULT_CURRENCY
+            self.initial.setdefault("currency", self.default_currency)
+        self.fields["currency"].choices = currency_choices(user, self.default_currency)
+
+    def clean_currency(self):
+        return self.cleaned_data["currency"] or self.default_currency
+
     class Meta:
         model = Transaction
-        fields = ["amount", "type", "category", "description", "date"]
+        fields = ["amount", "currency", "type", "category", "description", "date"]
         widgets = {
             "date": forms.DateInput(attrs={"type": "date"}),
             "description": forms.Textarea(attrs={"row": 3})
         }
+
+
+class IdListField(forms.Field):
+    """A list of integer ids, posted as repeated fields (checkboxes)."""
+    widget = forms.MultipleHiddenInput
+
+    def to_python(self, value):
+        try:
+            return [int(v) for v in value or []]
+        except (TypeError, ValueError):
+            raise forms.ValidationError("Invalid selection.")
+
+
+class TransactionBulkActionForm(forms.Form):
+    DELETE = "delete"
+    SET_CATEGORY = "set_category"
+    SET_TYPE = "set_type"
+    ACTION_CHOICES = [
+        (DELETE, "Delete"),
+        (SET_CATEGORY, "Change category"),
+        (SET_TYPE, "Change type"),
+    ]
+
+    action = forms.ChoiceField(choices=ACTION_CHOICES)
+    ids = IdListField(required=False)
+    # apply to every transaction matching the list filter, not just the ticked rows
+    select_all = forms.BooleanField(required=False)
+    # the list's filter query string (transactions.filters)
+    filters = forms.CharField(required=False)
+    category = forms.ModelChoiceField(queryset=Category.objects.none(), required=False,
+                                      empty_label="Uncategorized")
+    type = forms.ChoiceField(choices=BLANK_CHOICE_DASH + Transaction.TRANSACTION_TYPE_CHOICES,
+                             required=False)
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        category = self.fields["category"]
+        category.queryset = Category.objects.visible_to(user)
+        category.choices = [("", "Uncategorized")] + category_choices(user)[1:]
+
+    def clean(self):
+        cleaned = super().clean()
+        if not cleaned.get("select_all") and not cleaned.get("ids"):
+            raise forms.ValidationError("Select at least one transaction.")
+        if cleaned.get("action") == self.SET_TYPE and not cleaned.get("type"):
+            self.add_error("type", "Choose the new type.")
+        return cleaned
+
+
+class TransactionImportForm(forms.Form):
+    file = forms.FileField(
+        help_text="CSV with the columns date, category, amount, description, type "
+                  "(the format of the CSV export).")
+
+
+class ExportJobForm(forms.ModelForm):
+    class Meta:
+        model = ExportJob
+        fields = ["month", "compress", "all_users"]
+        labels = {
+            "month": "Month (YYYY-MM, optional)",
+            "compress": "Compress (gzip)",
+            "all_users": "All users",
+        }
+
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if not (user and user.is_staff):
+            # exporting everyone's data is a staff-only option
+            del self.fields["all_users"]
+
+    def clean_month(self):
+        month = self.cleaned_data["month"].strip()
+        if month and parse_month(month) is None:
+            raise forms.ValidationError("Use the YYYY-MM format.")
+        return month
@@ -0,0 +1,170 @@
+"""
+Bulk CSV import of transactions.
+
+Reads the columns written by export_transactions_csv
+(date, category, amount, description, type, currency) as a stream, so
+files with millions of rows are processed in constant memory. The currency
+column is optional; without it, or where it is empty, amounts are taken to
+be in the user's currency.
+"""
+import csv
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from categories.models import Category
+from . import rates
+from .cache import CATEGORIES, bump_data_version
+from .models import Transaction
+from .services import bulk_create_transactions
+
+IMPORT_COLUMNS = ["date", "category", "amount", "description", "type"]
+
+# rows validated and inserted per database transaction
+IMPORT_BATCH_SIZE = 1000
+
+# per-row errors kept for reporting; later ones are only counted
+MAX_REPORTED_ERRORS = 1000
+
+TYPE_ALIASES = {
+    "in": Transaction.INCOME,
+    "income": Transaction.INCOME,
+    "ex": Transaction.EXPENSE,
+    "expense": Transaction.EXPENSE,
+}
+
+
+class ImportResult:
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.categories_created = 0
+        self.error_count = 0
+        self.errors = []  # (line number, message)
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+
+class TransactionImporter:
+    """
+    Import a CSV stream for one user.
+
+    Category names are resolved through one in-memory lookup of the user's
+    own and the global categories; names that do not exist yet are created
+    in bulk, once per batch. Invalid rows are reported and skipped, they do
+    not abort the rest of the batch.
+    """
+
+    def __init__(self, user, batch_size=IMPORT_BATCH_SIZE):
+        self.user = user
+        self.batch_size = batch_size
+        self.result = ImportResult()
+        self._fields = {name: Transaction._meta.get_field(name) for name in ("date", "amount", "description")}
+        self._category_max_length = Category._meta.get_field("name").max_length
+        self._categories = self._load_categories()
+        self._currency = rates.user_currency(user)
+        self._currencies = set(rates.currencies(user))
+
+    def _load_categories(self):
+        lookup = {}
+        # global categories first, so the user's own category wins on a name clash
+        for name, pk in Category.objects.filter(user__isnull=True).values_list("name", "id"):
+            lookup[name] = pk
+        for name, pk in Category.objects.filter(user=self.user).values_list("name", "id"):
+            lookup[name] = pk
+        return lookup
+
+    def run(self, stream, on_batch=None):
+        """
+        Import every row of `stream` (a text file object). `on_batch` is
+        called with the running ImportResult after each committed batch.
+        """
+        reader = csv.DictReader(stream)
+        missing = [col for col in IMPORT_COLUMNS if col not in (reader.fieldnames or [])]
+        if missing:
+            self.result.add_error(1, f"Missing column(s): {', '.join(missing)}")
+            return self.result
+
+        batch = []
+        # header is line 1
+        for line, row in enumerate(reader, start=2):
+            self.result.rows += 1
+            batch.append((line, row))
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+                if on_batch:
+                    on_batch(self.result)
+        if batch:
+            self._import_batch(batch)
+            if on_batch:
+                on_batch(self.result)
+        return self.result
+
+    def _parse(self, row):
+        """Return (values dict, category name) or raise ValidationError."""
+        ttype = TYPE_ALIASES.get((row.get("type") or "").strip().lower())
+        if ttype is None:
+            raise ValidationError(f"type: invalid value {row.get('type')!r} (expected IN or EX)")
+
+        values = {"type": ttype}
+        for name, field in self._fields.items():
+            raw = (row.get(name) or "").strip()
+            try:
+                values[name] = field.clean(raw, None)
+            except ValidationError as exc:
+                raise ValidationError(f"{name}: {'; '.join(exc.messages)}")
+
+        currency = (row.get("currency") or "").strip().upper() or self._currency
+        if currency not in self._currencies:
+            raise ValidationError(f"currency: no exchange rate for {currency!r}")
+        values["currency"] = currency
+
+        category = (row.get("category") or "").strip()
+        if len(category) > self._category_max_length:
+            raise ValidationError(
+                f"category: name longer than {self._category_max_length} characters")
+        return values, category
+
+    def _import_batch(self, batch):
+        parsed = []
+        for line, row in batch:
+            try:
+                parsed.append(self._parse(row))
+            except ValidationError as exc:
+                self.result.add_error(line, "; ".join(exc.messages))
+
+        with transaction.atomic():
+            self._create_missing_categories(parsed)
+            objs = [
+                Transaction(user=self.user, category_id=self._categories.get(name) if name else None, **values)
+                for values, name in parsed
+            ]
+            bulk_create_transactions(objs)
+        self.result.created += len(objs)
+
+    def _create_missing_categories(self, parsed):
+        new = {}
+        for values, name in parsed:
+            if name and name not in self._categories and name not in new:
+                new[name] = Category(user=self.user, name=name, kind=values["type"])
+        if not new:
+            return
+        # created since _load_categories() (another request, the category
+        # form): use them, and don't count them as created by this import
+        existing = dict(Category.objects.filter(user=self.user, name__in=new).values_list("name", "id"))
+        self._categories.update(existing)
+        new = {name: category for name, category in new.items() if name not in existing}
+        if not new:
+            return
+        Category.objects.bulk_create(new.values(), ignore_conflicts=True)
+        # bulk_create skips categories.signals
+        bump_data_version(self.user.pk, scope=CATEGORIES)
+        # ignore_conflicts does not return ids; fetch them in one query
+        self._categories.update(
+            Category.objects.filter(user=self.user, name__in=new).values_list("name", "id")
+        )
+        self.result.categories_created += len(new)
@@ -0,0 +1,386 @@
+"""
+HTTP load testing against the app served the way it is deployed: start.sh
+(gunicorn, sync or ASGI workers) in a subprocess, driven by client threads
+that log in as seeded users. Used by manage.py loadtest (a mix of user
+actions) and benchmark_asgi (one page at a time).
+
+Only the standard library is used on the client side, so nothing but the
+app's own requirements needs to be installed.
+"""
+import html
+import http.client
+import os
+import random
+import re
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.urls import reverse
+
+from .benchmark import BENCH_PASSWORD, percentile
+
+# seconds to wait for a started server to answer
+SERVER_START_TIMEOUT = 30
+
+CSRF_INPUT_RE = re.compile(r'name="csrfmiddlewaretoken" value="([^"]+)"')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def database_url(db):
+    """DATABASE_URL (dj-database-url) of a DATABASES entry, for the server processes."""
+    if db["ENGINE"] == "django.db.backends.sqlite3":
+        return f"sqlite:///{db['NAME']}"
+    if db["ENGINE"] == "django.db.backends.postgresql":
+        return (f"postgres://{db['USER']}:{db['PASSWORD']}@{db['HOST'] or 'localhost'}:"
+                f"{db['PORT'] or 5432}/{db['NAME']}")
+    raise ValueError(f"Cannot point the server processes at a {db['ENGINE']} database.")
+
+
+def process_tree_rss(pid):
+    """Resident memory in bytes of `pid` and all its descendants (Linux only; None elsewhere)."""
+    if not os.path.isdir("/proc"):
+        return None
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # the command name may contain spaces; fields after it are fixed
+                    parent = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(parent, []).append(int(entry))
+
+    total, pending = 0, [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f"/proc/{current}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+        except OSError:
+            continue
+    return total
+
+
+class Server:
+    """
+    Run start.sh on a free local port for the duration of the block.
+    `mode` is "wsgi" or "asgi" (start.sh's SERVER); `gunicorn_args` are
+    added to the bind address and worker count (e.g. "--threads 4");
+    `env` is added to the environment, on top of DATABASE_URL from `db`.
+    """
+
+    def __init__(self, mode, workers, db, env=None, gunicorn_args=""):
+        self.mode = mode
+        self.workers = workers
+        self.port = free_port()
+        self.env = {
+            **os.environ,
+            # gunicorn and uvicorn from the environment running this code
+            "PATH": os.pathsep.join([os.path.dirname(sys.executable), os.environ.get("PATH", "")]),
+            "SERVER": mode,
+            "DATABASE_URL": database_url(db),
+            "GUNICORN_CMD_ARGS": f"--bind 127.0.0.1:{self.port} --workers {workers} {gunicorn_args}".strip(),
+            **(env or {}),
+        }
+
+    def __enter__(self):
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(
+            ["bash", "start.sh"], cwd=settings.BASE_DIR, env=self.env,
+            stdout=self.log, stderr=subprocess.STDOUT, start_new_session=True,
+        )
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                break
+            session = Session(self.port)
+            try:
+                if session.request("GET", "/accounts/login/")[0] == 200:
+                    return self
+            except OSError:
+                pass
+            finally:
+                session.close()
+            time.sleep(0.2)
+        output = self.output()
+        self.__exit__()
+        raise RuntimeError(f"The {self.mode} server did not start:\n{output}")
+
+    def __exit__(self, *exc_info):
+        if self.process.poll() is None:
+            os.killpg(self.process.pid, signal.SIGTERM)
+            try:
+                self.process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.process.pid, signal.SIGKILL)
+                self.process.wait()
+        self.log.close()
+
+    def output(self):
+        self.log.seek(0)
+        return self.log.read().decode(errors="replace")[-4000:]
+
+    def rss(self):
+        return process_tree_rss(self.process.pid)
+
+
+class Session:
+    """One client's cookies and keep-alive connection (reopened when the server closes it)."""
+
+    def __init__(self, port):
+        self.connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+        self.cookies = SimpleCookie()
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers["Cookie"] = "; ".join(f"{name}={morsel.value}" for name, morsel in self.cookies.items())
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+            # the previous response closed the connection; retry on a new one
+            self.connection.close()
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+        body = response.read()
+        for value in response.headers.get_all("Set-Cookie") or []:
+            self.cookies.load(value)
+        return response.status, response.headers, body
+
+    def close(self):
+        self.connection.close()
+
+    def login(self, username, password=BENCH_PASSWORD):
+        _status, _headers, body = self.request("GET", "/accounts/login/")
+        token = CSRF_INPUT_RE.search(body.decode()).group(1)
+        status, _headers, _body = self.request(
+            "POST", "/accounts/login/",
+            body=urlencode({"username": username, "password": password, "csrfmiddlewaretoken": token}),
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+        if status != 302:
+            raise RuntimeError(f"Logging in {username} failed ({status}).")
+        return self
+
+
+class Recorder:
+    """Latencies (ms) and failed requests per endpoint, collected from any number of client threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def request(self, session, endpoint, method, path, expect=200, **kwargs):
+        """
+        Make a request through `session` and record it under `endpoint`: its
+        latency (including reading the whole body) if the status is `expect`,
+        an error otherwise. Returns the body, or None for an error.
+        """
+        start = time.perf_counter()
+        try:
+            status, _headers, body = session.request(method, path, **kwargs)
+        except OSError:
+            status = body = None
+        elapsed = (time.perf_counter() - start) * 1000
+        with self.lock:
+            if status == expect:
+                self.latencies[endpoint].append(elapsed)
+            else:
+                self.errors[endpoint] += 1
+        return body if status == expect else None
+
+    def summary(self, seconds):
+        """latency_stats() per endpoint, plus "total" over all of them."""
+        endpoints = sorted(self.latencies.keys() | self.errors.keys())
+        results = {name: latency_stats(self.latencies[name], self.errors[name], seconds) for name in endpoints}
+        results["total"] = latency_stats(
+            [latency for name in endpoints for latency in self.latencies[name]],
+            sum(self.errors.values()), seconds,
+        )
+        return results
+
+
+def latency_stats(latencies, errors, seconds):
+    """
+    Request count, errors, error rate, successful requests per second and
+    latency percentiles (ms; None without successful requests).
+    """
+    requests = len(latencies) + errors
+
+    def pct(value):
+        return round(percentile(latencies, value), 3) if latencies else None
+
+    return {
+        "requests": requests,
+        "errors": errors,
+        "error_rate": round(errors / requests, 4) if requests else 0.0,
+        "seconds": round(seconds, 3),
+        "requests_per_second": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p95_ms": pct(95),
+        "p99_ms": pct(99),
+        "max_ms": round(max(latencies), 3) if latencies else None,
+    }
+
+
+def run_clients(sessions, client):
+    """Run `client(index, session)` on one thread per session, all starting together; return the elapsed seconds."""
+    barrier = threading.Barrier(len(sessions))
+
+    def run(index, session):
+        barrier.wait()
+        client(index, session)
+
+    threads = [threading.Thread(target=run, args=(index, session)) for index, session in enumerate(sessions)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start
+
+
+def run_load(sessions, path, requests):
+    """GET `path` `requests` times from one thread per session; latency_stats() of the run."""
+    recorder = Recorder()
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def client(_index, session):
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            recorder.request(session, path, "GET", path)
+
+    stats = recorder.summary(run_clients(sessions, client))["total"]
+    if stats["errors"] == stats["requests"]:
+        raise RuntimeError(f"Every request to {path} failed.")
+    return stats
+
+
+# relative weights of the SyntheticUser actions
+DEFAULT_MIX = {"dashboard": 30, "list": 25, "add": 10, "report": 25, "export": 10}
+
+# pages a "list" action reads, following the Next links
+LIST_PAGES = 3
+
+NEXT_LINK_RE = re.compile(r'href="(\?(?:cursor|page)=[^"]*)">\s*Next')
+CATEGORY_OPTION_RE = re.compile(r'<option value="(\d+)"')
+
+
+def parse_mix(text):
+    """'dashboard=30,list=25,...' -> {action: weight}; unknown actions and bad weights raise ValueError."""
+    mix = {}
+    for part in filter(None, (part.strip() for part in text.split(","))):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown action {name!r}; expected one of {', '.join(DEFAULT_MIX)}.")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid weight for {name}: {weight!r}.") from None
+        if mix[name] < 0:
+            raise ValueError(f"Invalid weight for {name}: {weight!r}.")
+    if not any(mix.values()):
+        raise ValueError("The mix needs at least one action with a positive weight.")
+    return mix
+
+
+class SyntheticUser:
+    """
+    A logged-in client replaying the actions of the traffic mix. Choices
+    (action, month, page depth, new transaction) come from `rng`, so a run
+    with the same seed sends the same sequence of requests.
+    """
+
+    def __init__(self, session, recorder, rng, months):
+        self.session = session
+        self.recorder = recorder
+        self.rng = rng
+        self.months = months
+
+    def get(self, endpoint, path):
+        return self.recorder.request(self.session, endpoint, "GET", path)
+
+    def dashboard(self):
+        self.get("dashboard", reverse("dashboard"))
+
+    def list(self):
+        path = reverse("transactions:list")
+        if self.rng.random() < 0.5:
+            path += f"?month={self.rng.choice(self.months)}"
+        for _page in range(self.rng.randint(1, LIST_PAGES)):
+            body = self.get("list", path)
+            link = NEXT_LINK_RE.search(body.decode()) if body else None
+            if link is None:
+                break
+            path = reverse("transactions:list") + html.unescape(link.group(1))
+
+    def add(self):
+        path = reverse("transactions:add")
+        body = self.get("add_form", path)
+        if body is None:
+            return
+        page = body.decode()
+        token = CSRF_INPUT_RE.search(page).group(1)
+        categories = CATEGORY_OPTION_RE.findall(page)
+        year, month = map(int, self.rng.choice(self.months).split("-"))
+        data = {
+            "csrfmiddlewaretoken": token,
+            "amount": f"{self.rng.uniform(1, 300):.2f}",
+            "type": "IN" if self.rng.random() < 0.2 else "EX",
+            "category": self.rng.choice(categories) if categories else "",
+            "description": "Load test",
+            "date": f"{year:04d}-{month:02d}-{self.rng.randint(1, 28):02d}",
+        }
+        self.recorder.request(
+            self.session, "add", "POST", path, expect=302, body=urlencode(data),
+            headers={"Content-Type": "application/x-www-form-urlencoded"},
+        )
+
+    def report(self):
+        self.get("report", reverse("accounts:monthly_report") + f"?month={self.rng.choice(self.months)}")
+
+    def export(self):
+        self.get("export", reverse("transactions:export_csv") + f"?month={self.rng.choice(self.months)}")
+
+
+def run_mix(sessions, mix, seconds, months, seed=0):
+    """
+    Let one SyntheticUser per session replay `mix` for `seconds`; returns
+    Recorder.summary() of the run.
+    """
+    recorder = Recorder()
+    actions, weights = list(mix), list(mix.values())
+
+    def client(index, session):
+        rng = random.Random(f"{seed}-{index}")
+        user = SyntheticUser(session, recorder, rng, months)
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            getattr(user, rng.choices(actions, weights)[0])()
+
+    return recorder.summary(run_clients(sessions, client))
@@ -0,0 +1,89 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.db import connection, connections
+from django.urls import reverse
+
+from transactions.benchmark import ScratchDatabase, seed
+from transactions.loadtest import Server, Session, run_load
+
+MODES = ("wsgi", "asgi")
+
+
+def load_paths():
+    return [
+        ("dashboard", reverse("dashboard")),
+        ("monthly_report", reverse("accounts:monthly_report") + "?month=2025-06"),
+        ("export_csv", reverse("transactions:export_csv")),
+    ]
+
+
+class Command(BaseCommand):
+    help = ("Load-test the sync (gunicorn WSGI) and the async (SERVER=asgi: uvicorn workers, "
+            "ASYNC_VIEWS) deployments of start.sh with the same number of worker processes: "
+            "seed a scratch database, log in concurrent clients and request the dashboard, "
+            "the monthly report and the CSV export. Prints throughput, latency percentiles, "
+            "errors and the resident memory of each server.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=2,
+                            help="gunicorn worker processes of both servers (default: 2).")
+        parser.add_argument("--asgi-workers", type=int,
+                            help="Worker processes of the ASGI server (default: --workers).")
+        parser.add_argument("--users", type=int, default=8, help="Seeded users the clients log in as.")
+        parser.add_argument("--transactions", type=int, default=5000, help="Transactions per user.")
+        parser.add_argument("--concurrency", type=int, default=16, help="Concurrent clients.")
+        parser.add_argument("--requests", type=int, default=300, help="Requests per view and server.")
+        parser.add_argument("--warm-cache", action="store_true",
+                            help="Keep the report result cache (default: every request queries).")
+        parser.add_argument("--output", help="Also write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        workers = {"wsgi": options["workers"], "asgi": options["asgi_workers"] or options["workers"]}
+        # a zero timeout stores nothing, so every request runs its queries
+        env = {} if options["warm_cache"] else {"REPORT_CACHE_TIMEOUT": "0"}
+
+        results = []
+        with ScratchDatabase(dict(connection.settings_dict)):
+            users = seed(users=options["users"], transactions=options["transactions"], prefix="load")
+            db = dict(connection.settings_dict)
+            connections.close_all()
+            for mode in MODES:
+                with Server(mode, workers[mode], db, env=env) as server:
+                    results.extend(self.load(server, users, options))
+
+        if options["output"]:
+            report = {
+                "meta": {"database": connection.vendor, "workers": workers,
+                         "users": options["users"], "transactions_per_user": options["transactions"],
+                         "concurrency": options["concurrency"], "requests": options["requests"],
+                         "warm_cache": options["warm_cache"]},
+                "results": results,
+            }
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+    def load(self, server, users, options):
+        sessions = [Session(server.port).login(users[i % len(users)].username)
+                    for i in range(options["concurrency"])]
+        results = []
+        try:
+            for name, path in load_paths():
+                # warm up the workers (imports, connections, template loading)
+                run_load(sessions, path, len(sessions))
+                stats = run_load(sessions, path, options["requests"])
+                rss = server.rss()
+                result = {"mode": server.mode, "workers": server.workers, "view": name, **stats,
+                          "rss_mib": round(rss / 2**20, 1) if rss is not None else None}
+                results.append(result)
+                self.stdout.write(
+                    f"{server.mode:<5} {name:<15} req/s={stats['requests_per_second']:>8.1f} "
+                    f"p50={stats['p50_ms']:>8.2f}ms p95={stats['p95_ms']:>8.2f}ms "
+                    f"p99={stats['p99_ms']:>8.2f}ms errors={stats['errors']:<4} "
+                    f"rss={result['rss_mib']}MiB"
+                )
+        finally:
+            for session in sessions:
+                session.close()
+        return results
@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import OperationalError, connection, connections
+from django.test.utils import override_settings
+
+from expense_tracker.db import database_settings
+from transactions.benchmark import ScratchDatabase, percentile
+from transactions.models import Transaction
+
+
+class Command(BaseCommand):
+    help = ("Measure write throughput with several concurrent writers, once with Django's stock "
+            "connection settings and once with the tuned ones from settings.py, on a throwaway "
+            "database. Each write is wrapped in request_started/request_finished, so connection "
+            "reuse (CONN_MAX_AGE) is exercised the same way as under gunicorn.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8, help="Concurrent writer threads.")
+        parser.add_argument("--writes", type=int, default=200, help="Writes per writer.")
+        parser.add_argument("--output", help="Also write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        tuned = dict(connection.settings_dict)
+        stock = database_settings({k: v for k, v in tuned.items() if k != "OPTIONS"} | {
+            "OPTIONS": {k: v for k, v in tuned["OPTIONS"].items()
+                        if k not in ("pool", "timeout", "transaction_mode")},
+        })
+        scenarios = [
+            ("stock", stock, {"journal_mode": "DELETE", "synchronous": "FULL"}),
+            ("tuned", tuned, settings.SQLITE_PRAGMAS),
+        ]
+
+        results = []
+        for name, db, pragmas in scenarios:
+            with override_settings(SQLITE_PRAGMAS=pragmas), ScratchDatabase(db):
+                stats = self.run_writers(options["writers"], options["writes"])
+            results.append({"scenario": name, **stats})
+            self.stdout.write(
+                f"{name:<6} writes/s={stats['writes_per_second']:>9.1f} "
+                f"p50={stats['p50_ms']:>7.2f}ms p95={stats['p95_ms']:>8.2f}ms "
+                f"errors={stats['errors']}"
+            )
+
+        if options["output"]:
+            report = {
+                "meta": {"database": connection.vendor, "writers": options["writers"],
+                         "writes_per_writer": options["writes"]},
+                "results": results,
+            }
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+    def run_writers(self, writers, writes):
+        User = get_user_model()
+        users = [User.objects.create(username=f"writer{i}") for i in range(writers)]
+        connections.close_all()
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+        barrier = threading.Barrier(writers)
+
+        def writer(user):
+            own, failed = [], 0
+            barrier.wait()
+            for i in range(writes):
+                request_started.send(sender=self.__class__)
+                start = time.perf_counter()
+                try:
+                    Transaction.objects.create(
+                        user=user, amount=Decimal("1.00"), type="EX",
+                        date=date(2025, 1 + i % 12, 1 + i % 28), description="bench",
+                    )
+                    own.append((time.perf_counter() - start) * 1000)
+                except OperationalError:
+                    failed += 1
+                finally:
+                    request_finished.send(sender=self.__class__)
+            connection.close()
+            with lock:
+                latencies.extend(own)
+                errors.append(failed)
+
+        threads = [threading.Thread(target=writer, args=(user,)) for user in users]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        latencies.sort()
+        return {
+            "writes": len(latencies),
+            "errors": sum(errors),
+            "seconds": round(elapsed, 3),
+            "writes_per_second": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 50), 3),
+            "p95_ms": round(percentile(latencies, 95), 3),
+        }
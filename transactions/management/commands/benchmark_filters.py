@@ -0,0 +1,91 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from transactions.benchmark import filter_cases, full_table_scan, percentile, seed
+from transactions.filters import TransactionFilterForm
+from transactions.views import user_transactions
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway test database and, for the common filter combinations of the "
+            "transaction list / export / report (transactions.filters), print the query plan "
+            "of the first list page and time the page and a COUNT of the matching rows. "
+            "Fails if any plan scans the whole transactions table.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=5,
+                            help="Seeded users; the first one is queried (default: 5).")
+        parser.add_argument("--transactions", type=int, default=20000,
+                            help="Transactions per user (default: 20000).")
+        parser.add_argument("--categories", type=int, default=10)
+        parser.add_argument("--repeat", type=int, default=20, help="Runs per query.")
+        parser.add_argument("--analyze", action="store_true",
+                            help="Collect planner statistics (ANALYZE) before measuring.")
+        parser.add_argument("--output", help="Also write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            user = seed(users=options["users"], transactions=options["transactions"],
+                        categories=options["categories"], prefix="filters")[0]
+            if options["analyze"]:
+                with connection.cursor() as cursor:
+                    cursor.execute("ANALYZE")
+            results = [self.measure(user, name, params, options["repeat"])
+                       for name, params in filter_cases(user)]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        if options["output"]:
+            report = {
+                "meta": {"database": connection.vendor, "users": options["users"],
+                         "transactions_per_user": options["transactions"],
+                         "analyze": options["analyze"], "repeat": options["repeat"]},
+                "results": results,
+            }
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+        scans = [result["filter"] for result in results if result["full_scan"]]
+        if scans:
+            self.stderr.write(self.style.ERROR(f"Full table scan for: {', '.join(scans)}"))
+            raise SystemExit(1)
+
+    def measure(self, user, name, params, repeat):
+        filters = TransactionFilterForm(params, user=user)
+        qs = user_transactions(user, filters)
+        page = qs[:20]
+        plan = page.explain()
+
+        def timed(run):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                timings.append((time.perf_counter() - start) * 1000)
+            return round(percentile(timings, 50), 3)
+
+        result = {
+            "filter": name,
+            "query": filters.query_string(),
+            "rows": qs.count(),
+            "page_p50_ms": timed(lambda: list(page.all())),
+            "count_p50_ms": timed(qs.count),
+            "full_scan": full_table_scan(plan, connection.vendor),
+            "plan": plan,
+        }
+        self.stdout.write(
+            f"{name:<42} rows={result['rows']:<7} page={result['page_p50_ms']:>8.2f}ms "
+            f"count={result['count_p50_ms']:>8.2f}ms{'  FULL SCAN' if result['full_scan'] else ''}"
+        )
+        for line in plan.splitlines():
+            self.stdout.write(f"    {line}")
+        return result
@@ -0,0 +1,80 @@
+import json
+import platform
+import sys
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.utils import timezone
+
+from transactions.benchmark import measure, seed, seed_rates, view_urls
+
+
+class Command(BaseCommand):
+    help = ("Time every benchmarked view at several data sizes (p50/p95 latency, query count, "
+            "peak memory) against a throwaway test database, and write the results as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="100,1000,10000",
+                            help="Comma-separated transactions-per-user counts (default: 100,1000,10000).")
+        parser.add_argument("--categories", type=int, default=10)
+        parser.add_argument("--currencies", default="",
+                            help="Comma-separated currency codes: load exchange rates for them and "
+                                 "seed part of the transactions in them (default: one currency).")
+        parser.add_argument("--repeat", type=int, default=20, help="Requests per view and size.")
+        parser.add_argument("--warm-cache", action="store_true",
+                            help="Keep the result cache between requests (default: measure cold requests).")
+        parser.add_argument("--output", default="bench_output.json")
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options["sizes"].split(",") if size.strip()]
+
+        setup_test_environment()
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            results = self.run_benchmarks(sizes, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            "meta": {
+                "created_at": timezone.now().isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": connection.vendor,
+                "repeat": options["repeat"],
+                "warm_cache": options["warm_cache"],
+                "argv": sys.argv[1:],
+            },
+            "results": results,
+        }
+        with open(options["output"], "w") as f:
+            json.dump(report, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {len(results)} results to {options['output']}"))
+
+    def run_benchmarks(self, sizes, options):
+        before_each = None if options["warm_cache"] else cache.clear
+        currencies = [code.strip().upper() for code in options["currencies"].split(",") if code.strip()]
+        if currencies:
+            seed_rates(currencies)
+        results = []
+        for size in sizes:
+            user = seed(users=1, transactions=size, categories=options["categories"],
+                        prefix=f"size{size}", currencies=currencies)[0]
+            client = Client()
+            client.force_login(user)
+            for name, url in view_urls():
+                cache.clear()
+                stats = measure(client, url, repeat=options["repeat"], before_each=before_each)
+                results.append({"view": name, "transactions": size, **stats})
+                self.stdout.write(
+                    f"{name:<28} n={size:<8} p50={stats['p50_ms']:>8.2f}ms "
+                    f"p95={stats['p95_ms']:>8.2f}ms queries={stats['queries']:<3} "
+                    f"peak={stats['peak_memory_kib']:.0f}KiB"
+                )
+        return results
@@ -0,0 +1,30 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions import summary
+
+
+class Command(BaseCommand):
+    help = "Verify the MonthlySummary rollup against the transactions table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only check this username (default: all users).")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Unknown user: {options['user']}")
+
+        mismatches = summary.check(user)
+        for (user_id, month, category_id, ttype, currency), want, have in mismatches:
+            self.stdout.write(
+                f"user={user_id} month={month:%Y-%m} category={category_id} type={ttype} currency={currency}: "
+                f"expected {want[0]} ({want[1]}), stored {have[0]} ({have[1]})"
+            )
+        if mismatches:
+            raise CommandError(
+                f"{len(mismatches)} inconsistent bucket(s); run rebuild_monthly_summary to fix.")
+        self.stdout.write(self.style.SUCCESS("Monthly summary is consistent."))
@@ -0,0 +1,50 @@
+import csv
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.importers import IMPORT_BATCH_SIZE, TransactionImporter
+
+
+class Command(BaseCommand):
+    help = ("Bulk-import transactions for a user from a CSV file with the export columns "
+            "(date, category, amount, description, type; currency optional).")
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument("path", help="CSV file to import ('-' reads stdin).")
+        parser.add_argument("--batch-size", type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument("--encoding", default="utf-8-sig")
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options["username"])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"Unknown user: {options['username']}")
+
+        importer = TransactionImporter(user, batch_size=options["batch_size"])
+
+        def progress(result):
+            if options["verbosity"] >= 2:
+                self.stdout.write(f"{result.rows} rows read, {result.created} imported")
+
+        if options["path"] == "-":
+            sys.stdin.reconfigure(encoding=options["encoding"], newline="")
+            result = importer.run(sys.stdin, on_batch=progress)
+        else:
+            try:
+                with open(options["path"], encoding=options["encoding"], newline="") as f:
+                    result = importer.run(f, on_batch=progress)
+            except (OSError, UnicodeDecodeError, csv.Error) as exc:
+                raise CommandError(str(exc))
+
+        for line, message in result.errors:
+            self.stderr.write(f"line {line}: {message}")
+        if result.error_count > len(result.errors):
+            self.stderr.write(f"... {result.error_count - len(result.errors)} more error(s) not shown")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result.created} of {result.rows} rows "
+            f"({result.categories_created} new categories, {result.error_count} errors)."
+        ))
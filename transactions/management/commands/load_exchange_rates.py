@@ -0,0 +1,36 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.rates import load_rates, read_rates
+
+
+class Command(BaseCommand):
+    help = ("Replace the exchange rate table with the rates in a CSV file with the columns "
+            "date (YYYY-MM or YYYY-MM-DD), currency, rate (units of currency per one unit of "
+            "--base). The last rate listed for a month is that month's rate. Reloading "
+            "invalidates cached report totals and every process's copy of the rates.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV file to load ('-' reads stdin).")
+        parser.add_argument("--base", default="EUR",
+                            help="Currency the rates are quoted against (default: EUR).")
+        parser.add_argument("--encoding", default="utf-8-sig")
+
+    def handle(self, *args, **options):
+        base = options["base"].strip().upper()
+        try:
+            if options["path"] == "-":
+                sys.stdin.reconfigure(encoding=options["encoding"], newline="")
+                rates = read_rates(sys.stdin, base)
+            else:
+                with open(options["path"], encoding=options["encoding"], newline="") as f:
+                    rates = read_rates(f, base)
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        count = load_rates(rates)
+        currencies = sorted({currency for currency, _month in rates})
+        self.stdout.write(self.style.SUCCESS(
+            f"Loaded {count} monthly rates for {len(currencies)} currencies ({', '.join(currencies)})."
+        ))
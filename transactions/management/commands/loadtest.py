@@ -0,0 +1,116 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+
+from transactions.benchmark import SEED_DAYS, SEED_END, ScratchDatabase, seed
+from transactions.loadtest import DEFAULT_MIX, Server, Session, parse_mix, run_mix
+from transactions.utils import shift_month
+
+
+def seeded_months():
+    """The "YYYY-MM" months benchmark.seed() spreads transactions over."""
+    first = SEED_END - timedelta(days=SEED_DAYS - 1)
+    months, day = [], first.replace(day=1)
+    while day <= SEED_END:
+        months.append(f"{day:%Y-%m}")
+        day = shift_month(day, 1)
+    return months
+
+
+def format_ms(value):
+    return f"{value:>8.2f}ms" if value is not None else "       -  "
+
+
+def threshold_failures(total, options):
+    """Descriptions of the --max-error-rate / --max-p95-ms / --min-rps limits the run exceeded."""
+    failures = []
+    if options["max_error_rate"] is not None and total["error_rate"] > options["max_error_rate"]:
+        failures.append(f"error rate {total['error_rate']:.2%} > {options['max_error_rate']:.2%}")
+    if options["max_p95_ms"] is not None and (total["p95_ms"] or 0) > options["max_p95_ms"]:
+        failures.append(f"p95 {total['p95_ms']}ms > {options['max_p95_ms']}ms")
+    if options["min_rps"] is not None and total["requests_per_second"] < options["min_rps"]:
+        failures.append(f"throughput {total['requests_per_second']} req/s < {options['min_rps']}")
+    return failures
+
+
+class Command(BaseCommand):
+    help = ("Capacity / regression load test: seed a scratch database, start the app with "
+            "start.sh (gunicorn) on a local port, log in synthetic users and replay a weighted "
+            "mix of dashboard, list paging, add transaction, monthly report and CSV export for "
+            "a fixed time. Reports throughput, error rate and latency percentiles per endpoint; "
+            "the --max-*/--min-* checks make it exit with status 1 when exceeded.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--server", choices=["wsgi", "asgi"], default="wsgi",
+                            help="start.sh SERVER mode (default: wsgi).")
+        parser.add_argument("--workers", type=int, default=2, help="gunicorn worker processes.")
+        parser.add_argument("--gunicorn-args", default="",
+                            help='Extra gunicorn options, e.g. "--threads 4 --worker-class gthread".')
+        parser.add_argument("--users", type=int, default=50, help="Seeded users.")
+        parser.add_argument("--transactions", type=int, default=1000, help="Transactions per user.")
+        parser.add_argument("--categories", type=int, default=8)
+        parser.add_argument("--clients", type=int, default=20,
+                            help="Concurrent clients, each logged in as its own user (cycling).")
+        parser.add_argument("--duration", type=float, default=30, help="Seconds of measured load.")
+        parser.add_argument("--warmup", type=float, default=5, help="Seconds of unmeasured load first.")
+        parser.add_argument("--mix", default=",".join(f"{name}={weight}" for name, weight in DEFAULT_MIX.items()),
+                            help="Relative action weights (default: %(default)s).")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the clients' choices.")
+        parser.add_argument("--max-error-rate", type=float, help="Fail above this overall error rate (0-1).")
+        parser.add_argument("--max-p95-ms", type=float, help="Fail above this overall p95 latency.")
+        parser.add_argument("--min-rps", type=float, help="Fail below this overall throughput.")
+        parser.add_argument("--output", help="Also write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        try:
+            mix = parse_mix(options["mix"])
+        except ValueError as exc:
+            raise CommandError(exc)
+        months = seeded_months()
+
+        with ScratchDatabase(dict(connection.settings_dict)):
+            users = seed(users=options["users"], transactions=options["transactions"],
+                         categories=options["categories"], prefix="load")
+            db = dict(connection.settings_dict)
+            connections.close_all()
+            with Server(options["server"], options["workers"], db,
+                        gunicorn_args=options["gunicorn_args"]) as server:
+                sessions = [Session(server.port).login(users[i % len(users)].username)
+                            for i in range(options["clients"])]
+                try:
+                    if options["warmup"]:
+                        run_mix(sessions, mix, options["warmup"], months, seed=f"warmup-{options['seed']}")
+                    results = run_mix(sessions, mix, options["duration"], months, seed=options["seed"])
+                    rss = server.rss()
+                finally:
+                    for session in sessions:
+                        session.close()
+
+        for name, stats in results.items():
+            self.stdout.write(
+                f"{name:<10} requests={stats['requests']:<6} req/s={stats['requests_per_second']:>7.1f} "
+                f"errors={stats['error_rate']:>6.2%} p50={format_ms(stats['p50_ms'])} "
+                f"p95={format_ms(stats['p95_ms'])} p99={format_ms(stats['p99_ms'])} max={format_ms(stats['max_ms'])}"
+            )
+        if rss is not None:
+            self.stdout.write(f"server memory (RSS, all processes): {rss / 2**20:.1f} MiB")
+
+        if options["output"]:
+            report = {
+                "meta": {"database": connection.vendor, "server": options["server"],
+                         "workers": options["workers"], "gunicorn_args": options["gunicorn_args"],
+                         "users": options["users"], "transactions_per_user": options["transactions"],
+                         "clients": options["clients"], "duration": options["duration"],
+                         "mix": mix, "seed": options["seed"], "rss_bytes": rss},
+                "results": results,
+            }
+            with open(options["output"], "w") as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Wrote results to {options['output']}"))
+
+        failures = threshold_failures(results["total"], options)
+        if failures:
+            self.stderr.write(self.style.ERROR("; ".join(failures)))
+            raise SystemExit(1)
@@ -0,0 +1,22 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions import summary
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or backfill) the MonthlySummary rollup from the transactions table."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", help="Only rebuild this username (default: all users).")
+
+    def handle(self, *args, **options):
+        user = None
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(username=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"Unknown user: {options['user']}")
+
+        written = summary.rebuild(user)
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt monthly summary: {written} buckets."))
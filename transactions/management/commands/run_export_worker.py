@@ -0,0 +1,44 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from transactions.exports import claim_next_job, fail_export_job, purge_expired_jobs, run_export_job
+
+
+class Command(BaseCommand):
+    help = ("Process queued CSV export jobs. The queue is the ExportJob table, "
+            "so several workers can run side by side without a broker.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true",
+                            help="Exit when the queue is empty instead of polling.")
+        parser.add_argument("--poll-interval", type=float, default=2.0,
+                            help="Seconds to sleep when the queue is empty (default: 2).")
+
+    def handle(self, *args, **options):
+        while True:
+            close_old_connections()
+            purged = purge_expired_jobs()
+            if purged and options["verbosity"] >= 2:
+                self.stdout.write(f"Purged {purged} expired export(s).")
+
+            job = claim_next_job()
+            if job is None:
+                if options["once"]:
+                    return
+                time.sleep(options["poll_interval"])
+                continue
+
+            self.stdout.write(f"Running {job} for user {job.user_id}...")
+            try:
+                recorded = run_export_job(job)
+            except Exception as exc:
+                fail_export_job(job, exc)
+                self.stderr.write(f"{job} failed: {exc!r}")
+            else:
+                if not recorded:
+                    self.stderr.write(f"{job} was reclaimed by another worker; result dropped.")
+                    continue
+                job.refresh_from_db()
+                self.stdout.write(self.style.SUCCESS(f"{job}: {job.row_count} rows -> {job.file_name}"))
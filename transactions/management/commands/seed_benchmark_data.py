@@ -0,0 +1,41 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.benchmark import BENCH_PASSWORD, seed, seed_rates
+
+
+class Command(BaseCommand):
+    help = ("Seed deterministic benchmark data: N users x M transactions x K categories. "
+            "Users are named <prefix>-user-<n>.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10)
+        parser.add_argument("--transactions", type=int, default=1000, help="Per user.")
+        parser.add_argument("--categories", type=int, default=10, help="Per user.")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--prefix", default="bench")
+        parser.add_argument("--currencies", default="",
+                            help="Comma-separated currency codes: replace the exchange rates with "
+                                 "made-up ones for them and seed part of the transactions in them.")
+
+    def handle(self, *args, **options):
+        prefix = options["prefix"]
+        if get_user_model().objects.filter(username__startswith=f"{prefix}-user-").exists():
+            raise CommandError(
+                f"Users named '{prefix}-user-*' already exist; use another --prefix or remove them first.")
+
+        currencies = [code.strip().upper() for code in options["currencies"].split(",") if code.strip()]
+        if currencies:
+            seed_rates(currencies, seed=options["seed"])
+        users = seed(
+            users=options["users"],
+            transactions=options["transactions"],
+            categories=options["categories"],
+            seed=options["seed"],
+            prefix=prefix,
+            currencies=currencies,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {len(users)} users with {options['transactions']} transactions and "
+            f"{options['categories']} categories each (password: {BENCH_PASSWORD})."
+        ))
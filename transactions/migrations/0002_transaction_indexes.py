@@ -0,0 +1,24 @@
+# Generated by Django 6.0 on 2026-10-18 17:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0002_alter_category_user"),
+        ("transactions", "0001_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["user", "date", "id"], name="tx_user_date_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["user", "type", "date"], name="tx_user_type_date_idx"),
+        ),
+    ]
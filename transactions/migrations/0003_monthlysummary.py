@@ -0,0 +1,62 @@
+# Generated by Django 6.0 on 2026-10-18 17:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncMonth
+
+
+def backfill_summary(apps, schema_editor):
+    Transaction = apps.get_model("transactions", "Transaction")
+    MonthlySummary = apps.get_model("transactions", "MonthlySummary")
+    rows = (
+        Transaction.objects.order_by()
+        .annotate(bucket_month=TruncMonth("date"))
+        .values("user_id", "bucket_month", "category_id", "type")
+        .annotate(bucket_total=Sum("amount"), bucket_count=Count("id"))
+    )
+    MonthlySummary.objects.bulk_create(
+        (
+            MonthlySummary(
+                user_id=row["user_id"],
+                month=row["bucket_month"],
+                category_id=row["category_id"],
+                type=row["type"],
+                total=row["bucket_total"],
+                count=row["bucket_count"],
+            )
+            for row in rows.iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0002_alter_category_user"),
+        ("transactions", "0002_transaction_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlySummary",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("month", models.DateField()),
+                ("type", models.CharField(choices=[("IN", "Income"), ("EX", "Expense")], max_length=2)),
+                ("total", models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ("count", models.IntegerField(default=0)),
+                ("category", models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name="monthly_summaries", to="categories.category")),
+                ("user", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="monthly_summaries", to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                "verbose_name_plural": "monthly summaries",
+                "ordering": ["-month"],
+                "constraints": [models.UniqueConstraint(fields=("user", "month", "category", "type"), name="summary_bucket_unique"), models.UniqueConstraint(condition=models.Q(("category__isnull", True)), fields=("user", "month", "type"), name="summary_uncategorized_unique")],
+            },
+        ),
+        migrations.RunPython(backfill_summary, migrations.RunPython.noop),
+    ]
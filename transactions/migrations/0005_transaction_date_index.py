@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 18:07
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0002_alter_category_user"),
+        ("transactions", "0004_exportjob"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["date", "id"], name="tx_date_id_idx"),
+        ),
+    ]
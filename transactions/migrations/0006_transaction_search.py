@@ -0,0 +1,89 @@
+# Generated by Django 6.0 on 2026-10-18 18:18
+
+from django.db import migrations
+
+from transactions.search import SQLITE_DOCUMENT, SQLITE_DROP_TRIGGERS, SQLITE_TRIGGERS
+
+# Full-text index over description + category name, keyed by transaction id
+# and maintained by triggers (see transactions.search).
+
+# SQLite also indexes an owner token ("u<user id>") so that a user's search
+# only walks that user's postings. The triggers are shared with
+# search.without_search_triggers(), which later migrations use.
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE transactions_transaction_fts USING fts5("
+    "document, owner, tokenize = 'unicode61 remove_diacritics 2')",
+    "INSERT INTO transactions_transaction_fts (rowid, document, owner) "
+    f"SELECT id, {SQLITE_DOCUMENT.format(tx='transactions_transaction')}, 'u' || user_id "
+    "FROM transactions_transaction",
+    *SQLITE_TRIGGERS,
+]
+
+SQLITE_REVERSE = [
+    *SQLITE_DROP_TRIGGERS,
+    "DROP TABLE IF EXISTS transactions_transaction_fts",
+]
+
+POSTGRESQL_FORWARD = [
+    "CREATE TABLE transactions_transaction_fts ("
+    "rowid bigint PRIMARY KEY REFERENCES transactions_transaction (id) ON DELETE CASCADE, "
+    "document tsvector NOT NULL)",
+    "CREATE INDEX transactions_transaction_fts_gin ON transactions_transaction_fts USING gin (document)",
+    "CREATE FUNCTION transactions_fts_document(description text, category_id bigint) "
+    "RETURNS tsvector LANGUAGE sql STABLE AS $$ SELECT to_tsvector('simple', "
+    "coalesce(description, '') || ' ' || "
+    "coalesce((SELECT name FROM categories_category WHERE id = category_id), '')) $$",
+    "INSERT INTO transactions_transaction_fts (rowid, document) "
+    "SELECT id, transactions_fts_document(description, category_id) FROM transactions_transaction",
+    "CREATE FUNCTION transactions_fts_sync() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    "INSERT INTO transactions_transaction_fts (rowid, document) "
+    "VALUES (NEW.id, transactions_fts_document(NEW.description, NEW.category_id)) "
+    "ON CONFLICT (rowid) DO UPDATE SET document = EXCLUDED.document; "
+    "RETURN NULL; END $$",
+    "CREATE TRIGGER transactions_fts_sync AFTER INSERT OR UPDATE OF description, category_id "
+    "ON transactions_transaction FOR EACH ROW EXECUTE FUNCTION transactions_fts_sync()",
+    "CREATE FUNCTION transactions_fts_category_rename() RETURNS trigger LANGUAGE plpgsql AS $$ BEGIN "
+    "UPDATE transactions_transaction_fts f "
+    "SET document = transactions_fts_document(t.description, t.category_id) "
+    "FROM transactions_transaction t WHERE t.category_id = NEW.id AND f.rowid = t.id; "
+    "RETURN NULL; END $$",
+    "CREATE TRIGGER transactions_fts_category_rename AFTER UPDATE OF name ON categories_category "
+    "FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name) "
+    "EXECUTE FUNCTION transactions_fts_category_rename()",
+]
+
+POSTGRESQL_REVERSE = [
+    "DROP TRIGGER IF EXISTS transactions_fts_category_rename ON categories_category",
+    "DROP TRIGGER IF EXISTS transactions_fts_sync ON transactions_transaction",
+    "DROP FUNCTION IF EXISTS transactions_fts_category_rename()",
+    "DROP FUNCTION IF EXISTS transactions_fts_sync()",
+    "DROP TABLE IF EXISTS transactions_transaction_fts",
+    "DROP FUNCTION IF EXISTS transactions_fts_document(text, bigint)",
+]
+
+STATEMENTS = {
+    "sqlite": (SQLITE_FORWARD, SQLITE_REVERSE),
+    "postgresql": (POSTGRESQL_FORWARD, POSTGRESQL_REVERSE),
+}
+
+
+def run_statements(index):
+    def run(apps, schema_editor):
+        # other backends have no index; Transaction.objects.search() falls back to icontains
+        statements = STATEMENTS.get(schema_editor.connection.vendor)
+        if statements:
+            for sql in statements[index]:
+                schema_editor.execute(sql, params=None)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0002_alter_category_user"),
+        ("transactions", "0005_transaction_date_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(run_statements(0), run_statements(1)),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0 on 2026-10-18 18:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("categories", "0002_alter_category_user"),
+        ("transactions", "0006_transaction_search"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["user", "category", "date"], name="tx_user_category_date_idx"),
+        ),
+    ]
@@ -0,0 +1,84 @@
+# Generated by Django 6.0 on 2026-10-18 19:40
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from transactions.search import without_search_triggers
+
+
+def set_profile_currency(apps, schema_editor):
+    # existing amounts were entered in the owner's profile currency
+    Profile = apps.get_model("accounts", "Profile")
+    default = Profile._meta.get_field("currency").default
+    for model in ("Transaction", "MonthlySummary"):
+        apps.get_model("transactions", model).objects.update(currency=Coalesce(
+            Subquery(Profile.objects.filter(user=OuterRef("user")).values("currency")[:1]),
+            Value(default),
+        ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0001_initial"),
+        ("transactions", "0007_transaction_category_index"),
+    ]
+
+    operations = [
+        # adding a NOT NULL column rebuilds the table on SQLite
+        *without_search_triggers(
+            migrations.AddField(
+                model_name="transaction",
+                name="currency",
+                field=models.CharField(default="INR", max_length=10),
+            ),
+        ),
+        migrations.AlterField(
+            model_name="transaction",
+            name="amount",
+            field=models.DecimalField(
+                decimal_places=2, help_text="Amount in the transaction's currency", max_digits=12),
+        ),
+        migrations.AddField(
+            model_name="monthlysummary",
+            name="currency",
+            field=models.CharField(default="INR", max_length=10),
+            preserve_default=False,
+        ),
+        migrations.RunPython(set_profile_currency, migrations.RunPython.noop),
+        migrations.RemoveConstraint(
+            model_name="monthlysummary",
+            name="summary_bucket_unique",
+        ),
+        migrations.RemoveConstraint(
+            model_name="monthlysummary",
+            name="summary_uncategorized_unique",
+        ),
+        migrations.AddConstraint(
+            model_name="monthlysummary",
+            constraint=models.UniqueConstraint(
+                fields=("user", "month", "category", "type", "currency"), name="summary_bucket_unique"),
+        ),
+        migrations.AddConstraint(
+            model_name="monthlysummary",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("category__isnull", True)),
+                fields=("user", "month", "type", "currency"), name="summary_uncategorized_unique"),
+        ),
+        migrations.CreateModel(
+            name="ExchangeRate",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("currency", models.CharField(max_length=10)),
+                ("month", models.DateField()),
+                ("rate", models.DecimalField(decimal_places=10, max_digits=20)),
+            ],
+            options={
+                "ordering": ["currency", "month"],
+                "constraints": [
+                    models.UniqueConstraint(fields=("currency", "month"), name="exchangerate_currency_month_unique"),
+                ],
+            },
+        ),
+    ]
@@ -1,15 +1,55 @@
-from django.db import models
+import os
+
+from django.db import connections, models, transaction
 from django.conf import settings
 from django.utils import timezone
 
 # Create your models here.
 from categories.models import Category
+from .search import SEARCH_VENDORS, SearchRank, matching_ids, search_terms
+from .utils import month_bounds
+
+
+class TransactionQuerySet(models.QuerySet):
+
+    def in_month(self, year, month):
+        """
+        Restrict to one calendar month using a half-open date range, so the
+        (user, date, id) index can serve it as a range scan.
+        """
+        start, end = month_bounds(year, month)
+        return self.filter(date__gte=start, date__lt=end)
+
+    def search(self, text, user=None):
+        """
+        Restrict to transactions whose description or category name contain
+        every word of `text` (as a prefix), served by the full-text index
+        (transactions.search). Adds a `search_rank` annotation, higher is
+        more relevant. Pass the `user` the queryset is already limited to,
+        so the index only has to look at their transactions. Text without
+        any words leaves the queryset unchanged.
+        """
+        terms = search_terms(text)
+        if not terms:
+            return self
+        vendor = connections[self.db].vendor
+        if vendor not in SEARCH_VENDORS:
+            qs = self
+            for term in terms:
+                qs = qs.filter(models.Q(description__icontains=term) | models.Q(category__name__icontains=term))
+            return qs.annotate(search_rank=models.Value(0.0, output_field=models.FloatField()))
+        user_id = user.pk if user is not None else None
+        return self.filter(id__in=matching_ids(vendor, terms, user_id)).annotate(
+            search_rank=SearchRank("id", terms, user_id))
 
 
 class Transaction(models.Model):
 
     amount = models.DecimalField(
-        max_digits=12, decimal_places=2, help_text="Amount in your currency")
+        max_digits=12, decimal_places=2, help_text="Amount in the transaction's currency")
+
+    # ISO 4217 code; reports convert to the profile's currency (transactions.rates)
+    currency = models.CharField(max_length=10, default="INR")
 
     INCOME = "IN"
     EXPENSE = "EX"
@@ -30,8 +70,162 @@ class Transaction(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL,
                              on_delete=models.CASCADE)
 
+    objects = TransactionQuerySet.as_manager()
+
     class Meta:
         ordering = ["-date", "-id"]
+        indexes = [
+            # list / export / report: user filter + date range + (-date, -id) ordering
+            models.Index(fields=["user", "date", "id"], name="tx_user_date_id_idx"),
+            # per-type totals (income vs expense) over a user's date range
+            models.Index(fields=["user", "type", "date"], name="tx_user_type_date_idx"),
+            # category filter over a user's date range (transactions.filters)
+            models.Index(fields=["user", "category", "date"], name="tx_user_category_date_idx"),
+            # admin changelist across all users: date drill-down and ordering
+            models.Index(fields=["date", "id"], name="tx_date_id_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The MonthlySummary update runs from post_save (transactions.signals);
+        # keep it in the same database transaction as the row itself.
+        with transaction.atomic(using=kwargs.get("using")):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get("using")):
+            return super().delete(*args, **kwargs)
+
+    def __str__(self):
+        # category_id check avoids loading the category just to find there is none
+        return f"{self.get_type_display()}: {self.amount} - {self.category.name if self.category_id else "No Category"} ({self.date})"
+
+
+class MonthlySummary(models.Model):
+    """
+    Rollup of a user's transactions: one row per (month, category, type,
+    currency) holding the summed amount and the number of transactions.
+
+    Kept up to date incrementally by transactions.signals; rebuild or verify
+    it with the rebuild_monthly_summary / check_monthly_summary commands.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE, related_name="monthly_summaries")
+
+    # first day of the month
+    month = models.DateField()
+
+    # NULL bucket = uncategorized transactions
+    category = models.ForeignKey(
+        Category, on_delete=models.CASCADE, null=True, blank=True, related_name="monthly_summaries")
+
+    type = models.CharField(max_length=2, choices=Transaction.TRANSACTION_TYPE_CHOICES)
+
+    currency = models.CharField(max_length=10)
+
+    total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        ordering = ["-month"]
+        verbose_name_plural = "monthly summaries"
+        constraints = [
+            # also serves as the (user, month) lookup index
+            models.UniqueConstraint(
+                fields=["user", "month", "category", "type", "currency"], name="summary_bucket_unique"),
+            # NULLs never collide in the constraint above
+            models.UniqueConstraint(
+                fields=["user", "month", "type", "currency"], condition=models.Q(category__isnull=True),
+                name="summary_uncategorized_unique"),
+        ]
+
+    def __str__(self):
+        return (f"{self.user_id} {self.month:%Y-%m} {self.category_id or '-'} {self.type} "
+                f"{self.currency}: {self.total} ({self.count})")
+
+
+class ExchangeRate(models.Model):
+    """
+    Monthly exchange rates, loaded from a file with
+    manage.py load_exchange_rates (no live rate service).
+
+    `rate` is the price of one unit of the file's base currency in
+    `currency` (the base itself has rate 1). A month without a row uses
+    the currency's latest earlier rate; see transactions.rates.
+    """
+
+    currency = models.CharField(max_length=10)
+
+    # first day of the month
+    month = models.DateField()
+
+    rate = models.DecimalField(max_digits=20, decimal_places=10)
+
+    class Meta:
+        ordering = ["currency", "month"]
+        constraints = [
+            # also serves as the (currency, month) lookup index of the converted aggregates
+            models.UniqueConstraint(fields=["currency", "month"], name="exchangerate_currency_month_unique"),
+        ]
 
     def __str__(self):
-        return f"{self.get_type_display()}: {self.amount} - {self.category.name if self.category.name else "No Category"} ({self.date})"
+        return f"{self.currency} {self.month:%Y-%m}: {self.rate}"
+
+
+class ExportJob(models.Model):
+    """
+    A CSV export written to disk by a background worker
+    (manage.py run_export_worker), for histories too large to stream
+    through a web worker.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (DONE, "Done"),
+        (FAILED, "Failed"),
+    ]
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL,
+                             on_delete=models.CASCADE, related_name="export_jobs")
+
+    # staff only: export every user's transactions instead of just `user`'s
+    all_users = models.BooleanField(default=False)
+
+    # optional YYYY-MM filter, same as ?month= on the CSV export
+    month = models.CharField(max_length=7, blank=True)
+    compress = models.BooleanField(default=False, help_text="gzip the file")
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    file_name = models.CharField(max_length=255, blank=True)
+    row_count = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-created_at", "-id"]
+        indexes = [
+            # the worker's queue poll
+            models.Index(fields=["status", "created_at"], name="exportjob_status_created_idx"),
+        ]
+
+    def __str__(self):
+        return f"Export #{self.pk} ({self.get_status_display()})"
+
+    @property
+    def file_path(self):
+        if not self.file_name:
+            return ""
+        return os.path.join(settings.EXPORT_ROOT, self.file_name)
+
+    @property
+    def is_finished(self):
+        return self.status in (self.DONE, self.FAILED)
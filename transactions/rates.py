@@ -0,0 +1,197 @@
+"""
+Currencies and exchange rates.
+
+Every transaction has a currency; reports show totals in the owner's
+profile currency. Rates come from the ExchangeRate table (one row per
+currency and month, loaded from a file with manage.py load_exchange_rates).
+
+Totals are converted inside the aggregate query: converted() is an SQL
+expression that looks up the rates of a row's month next to the row, so a
+report stays one query per aggregate. Rows already in the target currency
+skip the lookups, which keeps single-currency users as fast as before.
+
+Lookups made in Python (currency choices, the list's running balance) read
+an in-process copy of the table. load_rates() bumps the global RATES
+version, which makes every process sharing the cache reload its copy, and
+the global DATA version, which invalidates everyone's cached reports and
+ETags. load_exchange_rates runs in its own process, which a per-process
+cache never tells, so copies are also reloaded from the database once they
+are EXCHANGE_RATES_MAX_AGE seconds old.
+"""
+import csv
+import threading
+import time
+from bisect import bisect_right
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import models, transaction
+
+from .cache import RATES, bump_data_version, global_version
+from .models import ExchangeRate, Transaction
+from .utils import parse_month
+
+DEFAULT_CURRENCY = Transaction._meta.get_field("currency").default
+
+RATE_COLUMNS = ["date", "currency", "rate"]
+
+_lock = threading.Lock()
+# (RATES version, time.monotonic() of the load, {currency: ([month, ...], [rate, ...])})
+_loaded = (None, None, {})
+
+
+def user_currency(user):
+    """The currency `user`'s totals are shown in (their profile's)."""
+    try:
+        return user.profile.currency
+    except ObjectDoesNotExist:
+        return DEFAULT_CURRENCY
+
+
+class Converted(models.Func):
+    """
+    `amount` (in the row's `currency`) in the `target` currency, at the
+    rates for the month of `day`: the latest rate at or before it, or the
+    currency's first rate for days before that, rounded to cents like
+    convert(). Rows already in `target` skip the rate lookups. Written as SQL rather than Case/Subquery
+    expressions, which take longer to compile than the query takes to run.
+    """
+    output_field = models.DecimalField(max_digits=14, decimal_places=2)
+
+    def __init__(self, amount, currency, day, target):
+        self.target = target
+        super().__init__(amount, currency, day)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        (amount, amount_params), (currency, currency_params), (day, day_params) = (
+            compiler.compile(expression) for expression in self.get_source_expressions())
+        table, rate_column, currency_column, month_column = map(
+            connection.ops.quote_name, [ExchangeRate._meta.db_table, "rate", "currency", "month"])
+
+        def rate(code, code_params):
+            # served by the (currency, month) unique index
+            lookup = f"SELECT {rate_column} FROM {table} WHERE {currency_column} = {code}"
+            sql = (f"COALESCE(({lookup} AND {month_column} <= {day} ORDER BY {month_column} DESC LIMIT 1), "
+                   f"({lookup} ORDER BY {month_column} LIMIT 1))")
+            return sql, [*code_params, *day_params, *code_params]
+
+        target_rate, target_params = rate("%s", [self.target])
+        source_rate, source_params = rate(currency, currency_params)
+        return (
+            f"(CASE WHEN {currency} = %s THEN {amount} "
+            f"ELSE ROUND({amount} * {target_rate} / {source_rate}, 2) END)",
+            [*currency_params, self.target, *amount_params, *amount_params, *target_params, *source_params],
+        )
+
+
+def converted(amount, date_field, target):
+    """
+    Expression for the `amount` field of each row in the `target` currency,
+    at the rates of the month of the row's `date_field` (a date or a
+    first-of-month), e.g. Sum(converted("total", "month", "EUR")).
+    Rows in a currency without any rate are NULL, so sums leave them out.
+    """
+    return Converted(models.F(amount), models.F("currency"), models.F(date_field), target)
+
+
+def exchange_rates():
+    """
+    {currency: ([month, ...], [rate, ...])}, months ascending: this
+    process's copy of the ExchangeRate table, reloaded when the rates
+    change or after EXCHANGE_RATES_MAX_AGE seconds.
+    """
+    global _loaded
+
+    def stale(loaded):
+        return loaded[0] != version or time.monotonic() - loaded[1] > settings.EXCHANGE_RATES_MAX_AGE
+
+    version = global_version(RATES)
+    if stale(_loaded):
+        with _lock:
+            if stale(_loaded):
+                loaded_at = time.monotonic()
+                table = {}
+                for currency, month, rate in ExchangeRate.objects.values_list("currency", "month", "rate"):
+                    months, rates = table.setdefault(currency, ([], []))
+                    months.append(month)
+                    rates.append(rate)
+                _loaded = (version, loaded_at, table)
+    return _loaded[2]
+
+
+def rate_on(currency, day):
+    """The rate of `currency` for the month of `day` (same choice as converted()), or None."""
+    found = exchange_rates().get(currency)
+    if found is None:
+        return None
+    months, rates = found
+    return rates[max(bisect_right(months, day) - 1, 0)]
+
+
+def convert(amount, currency, target, day):
+    """`amount` in `currency` on `day`, in `target` currency; None without rates."""
+    if currency == target:
+        return amount
+    source, dest = rate_on(currency, day), rate_on(target, day)
+    if source is None or dest is None:
+        return None
+    return (amount * dest / source).quantize(Decimal("0.01"))
+
+
+def currencies(user=None):
+    """Currency codes transactions may use: those with rates, plus `user`'s own."""
+    codes = set(exchange_rates())
+    if user is not None:
+        codes.add(user_currency(user))
+    return sorted(codes)
+
+
+def read_rates(stream, base):
+    """
+    Parse a rates file: CSV with the RATE_COLUMNS header, one row per
+    currency and date (YYYY-MM or YYYY-MM-DD), `rate` being the price of
+    one `base` in that currency. Returns {(currency, first of month): rate};
+    the last row of a month wins, e.g. the month-end rate of a daily file.
+    Raises ValueError naming the first bad line.
+    """
+    reader = csv.DictReader(stream)
+    missing = [column for column in RATE_COLUMNS if column not in (reader.fieldnames or [])]
+    if missing:
+        raise ValueError(f"Missing column(s): {', '.join(missing)}")
+
+    rates = {}
+    for line, row in enumerate(reader, start=2):
+        currency = (row["currency"] or "").strip().upper()
+        parsed = parse_month((row["date"] or "").strip()[:7])
+        try:
+            rate = Decimal((row["rate"] or "").strip())
+        except InvalidOperation:
+            rate = None
+        if not currency or len(currency) > 10 or parsed is None or rate is None or not rate > 0:
+            raise ValueError(f"line {line}: expected a date, a currency code and a positive rate")
+        rates[currency, date(*parsed, 1)] = rate
+
+    # the base costs 1 in every month the file covers
+    for month in {month for _currency, month in rates}:
+        rates[base, month] = Decimal(1)
+    return rates
+
+
+def load_rates(rates):
+    """
+    Replace the ExchangeRate table with `rates` ({(currency, month): rate})
+    and invalidate everything computed with the old rates.
+    Returns the number of rows written.
+    """
+    with transaction.atomic():
+        ExchangeRate.objects.all().delete()
+        ExchangeRate.objects.bulk_create(
+            ExchangeRate(currency=currency, month=month, rate=rate)
+            for (currency, month), rate in sorted(rates.items())
+        )
+        bump_data_version(scope=RATES)
+        # cached totals and ETags of every user
+        bump_data_version()
+    return len(rates)
@@ -0,0 +1,167 @@
+"""
+Full-text search over transaction descriptions and category names.
+
+The index is a side table keyed by transaction id, ``transactions_transaction_fts``
+(an FTS5 virtual table on SQLite, a tsvector column with a GIN index on
+PostgreSQL), filled and kept in sync by database triggers created in migration
+0006, so ORM saves, bulk writes, raw deletes and category renames all update it.
+Other backends have no index and Transaction.objects.search() falls back to
+icontains.
+
+Queries filter with ``id IN (SELECT rowid FROM <index> WHERE <match>)``, which
+both backends evaluate once, instead of joining the index: without table
+statistics SQLite may otherwise drive the join from the user/date index and
+re-run the full-text match for every one of the user's rows. On SQLite the
+index also holds a ``u<user id>`` owner token, so a user's search only walks
+that user's postings.
+
+SQLite rebuilds a table for most schema changes (copy, drop, rename), which
+drops the triggers on it and fails on the triggers of the other table that
+name it. Migrations that alter transactions_transaction or
+categories_category wrap their operations in without_search_triggers().
+"""
+import re
+
+from django.db import migrations, models
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "transactions_transaction_fts"
+
+# the indexed text of transaction `tx` (a table name or new/old)
+SQLITE_DOCUMENT = (
+    "{tx}.description || ' ' || "
+    "COALESCE((SELECT name FROM categories_category WHERE id = {tx}.category_id), '')"
+)
+
+SQLITE_TRIGGERS = [
+    "CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions_transaction BEGIN "
+    f"INSERT INTO {FTS_TABLE} (rowid, document, owner) "
+    f"VALUES (new.id, {SQLITE_DOCUMENT.format(tx='new')}, 'u' || new.user_id); END",
+    "CREATE TRIGGER transactions_fts_update AFTER UPDATE OF description, category_id, user_id "
+    "ON transactions_transaction BEGIN "
+    f"UPDATE {FTS_TABLE} SET document = {SQLITE_DOCUMENT.format(tx='new')}, "
+    "owner = 'u' || new.user_id WHERE rowid = new.id; END",
+    "CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions_transaction BEGIN "
+    f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END",
+    "CREATE TRIGGER transactions_fts_category_rename AFTER UPDATE OF name ON categories_category "
+    "WHEN old.name IS NOT new.name BEGIN "
+    f"UPDATE {FTS_TABLE} SET document = ("
+    "SELECT t.description || ' ' || new.name FROM transactions_transaction t "
+    f"WHERE t.id = {FTS_TABLE}.rowid) "
+    "WHERE rowid IN (SELECT id FROM transactions_transaction WHERE category_id = new.id); END",
+]
+
+SQLITE_DROP_TRIGGERS = [
+    "DROP TRIGGER IF EXISTS transactions_fts_category_rename",
+    "DROP TRIGGER IF EXISTS transactions_fts_delete",
+    "DROP TRIGGER IF EXISTS transactions_fts_update",
+    "DROP TRIGGER IF EXISTS transactions_fts_insert",
+]
+
+
+def drop_search_triggers(apps, schema_editor):
+    """RunPython code: remove the SQLite index triggers (other backends keep theirs)."""
+    if schema_editor.connection.vendor == "sqlite":
+        for sql in SQLITE_DROP_TRIGGERS:
+            schema_editor.execute(sql, params=None)
+
+
+def create_search_triggers(apps, schema_editor):
+    """RunPython code: (re)create the SQLite index triggers, once the index exists."""
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if FTS_TABLE not in schema_editor.connection.introspection.table_names(cursor):
+            return
+    for sql in SQLITE_DROP_TRIGGERS + SQLITE_TRIGGERS:
+        schema_editor.execute(sql, params=None)
+
+
+def without_search_triggers(*operations):
+    """
+    Migration operations running `operations` (schema changes that may
+    rebuild transactions_transaction or categories_category on SQLite) with
+    the index triggers removed, and restoring them afterwards, in both
+    directions. The rebuilds keep ids, so the index stays valid; data
+    changes belong in other operations.
+    """
+    return [
+        migrations.RunPython(drop_search_triggers, create_search_triggers),
+        *operations,
+        migrations.RunPython(create_search_triggers, drop_search_triggers),
+    ]
+
+SEARCH_VENDORS = ("sqlite", "postgresql")
+
+# words beyond this are ignored, which keeps a pasted paragraph from
+# turning into a huge query
+MAX_SEARCH_TERMS = 8
+
+# SQLite only scores the most recently added matches: BM25 costs about as
+# much per match as the rest of the query, so a term found in most of a
+# user's transactions would otherwise be several times slower to rank than
+# to find. Older matches follow the ranked ones, newest first.
+MAX_RANKED_MATCHES = 1000
+
+
+def search_terms(text):
+    """Split free text into lower-cased word tokens."""
+    return re.findall(r"\w+", (text or "").lower())[:MAX_SEARCH_TERMS]
+
+
+def sqlite_match_query(terms, user_id=None):
+    # every term must match, each as a word prefix: document: "cof"* AND document: "lat"*
+    parts = [f'document: "{term}"*' for term in terms]
+    if user_id is not None:
+        parts.append(f'owner: "u{user_id}"')
+    return " AND ".join(parts)
+
+
+def postgresql_match_query(terms):
+    return " & ".join(f"{term}:*" for term in terms)
+
+
+def matching_ids(vendor, terms, user_id=None):
+    """Subquery of the ids of transactions matching every term."""
+    if vendor == "sqlite":
+        return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                      [sqlite_match_query(terms, user_id)])
+    return RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE document @@ to_tsquery('simple', %s)",
+                  [postgresql_match_query(terms)])
+
+
+class SearchRank(models.Func):
+    """
+    Relevance of a matched transaction, higher is better: BM25 on SQLite
+    (0 beyond the MAX_RANKED_MATCHES newest matches), ts_rank on PostgreSQL.
+    `expression` is the transaction id.
+    """
+    output_field = models.FloatField()
+
+    def __init__(self, expression, terms, user_id=None):
+        self.terms = terms
+        self.user_id = user_id
+        super().__init__(expression)
+
+    def as_sqlite(self, compiler, connection):
+        pk, params = compiler.compile(self.source_expressions[0])
+        # bm25() is only available inside the MATCH query; materializing it
+        # runs the match once per statement rather than once per row. The
+        # index returns matches in rowid order, so the LIMIT stops the scoring
+        # early instead of sorting every match by score.
+        return (
+            f"COALESCE((WITH ranked AS MATERIALIZED (SELECT rowid AS id, -bm25({FTS_TABLE}) AS rank "
+            f"FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s ORDER BY rowid DESC LIMIT %s) "
+            f"SELECT rank FROM ranked WHERE ranked.id = {pk}), 0)",
+            [sqlite_match_query(self.terms, self.user_id), MAX_RANKED_MATCHES, *params],
+        )
+
+    def as_postgresql(self, compiler, connection):
+        pk, params = compiler.compile(self.source_expressions[0])
+        return (
+            f"(SELECT ts_rank(document, to_tsquery('simple', %s)) FROM {FTS_TABLE} WHERE rowid = {pk})",
+            [postgresql_match_query(self.terms), *params],
+        )
+
+    def as_sql(self, compiler, connection, **extra_context):
+        raise models.NotSupportedError(f"Full-text search is not available on {connection.vendor}.")
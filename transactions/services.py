@@ -0,0 +1,124 @@
+"""
+Set-based write operations on transactions.
+
+Bulk ORM operations skip the model signals that keep MonthlySummary and the
+per-user result cache up to date (transactions.signals), so every bulk write
+path goes through here instead of calling the ORM directly.
+"""
+from django.db import transaction
+
+from . import summary
+from .cache import bump_data_version
+from .models import Transaction
+
+
+# the fields the rollup depends on, i.e. what a bulk write must re-read
+SUMMARY_FIELDS = ("user", "date", "category", "type", "currency", "amount")
+
+def _bump_users(*transaction_lists):
+    for user_id in {tx.user_id for txs in transaction_lists for tx in txs}:
+        bump_data_version(user_id)
+
+
+def bulk_create_transactions(objs, batch_size=None):
+    """
+    bulk_create the given (unsaved) Transaction instances and apply them to
+    the rollup, all in one database transaction. Returns the created objects.
+    """
+    with transaction.atomic():
+        created = Transaction.objects.bulk_create(objs, batch_size=batch_size)
+        summary.add_transactions(created)
+        _bump_users(created)
+    return created
+
+
+def bulk_update_transactions(objs, fields, batch_size=None):
+    """
+    bulk_update `fields` of the given Transaction instances and move them
+    between rollup buckets. The stored rows are re-read (and locked) first,
+    so the rollup sees the values being replaced. Returns the number of
+    rows updated.
+    """
+    with transaction.atomic():
+        previous = list(
+            Transaction.objects.select_for_update()
+            .filter(pk__in=[obj.pk for obj in objs]).only(*SUMMARY_FIELDS)
+        )
+        updated = Transaction.objects.bulk_update(objs, fields, batch_size=batch_size)
+        summary.move_transactions(previous, objs)
+        _bump_users(previous, objs)
+    return updated
+
+
+def _bump_delta_users(deltas):
+    for user_id in {key[0] for key in deltas}:
+        bump_data_version(user_id)
+
+
+# primary keys per statement when operating on locked rows (stays below
+# SQLite's limit on query parameters)
+LOCKED_BATCH_SIZE = 5000
+
+
+def _plain(queryset):
+    # no joins or ORDER BY: a single-table UPDATE/DELETE with the filter as WHERE
+    queryset = queryset.order_by()
+    queryset.query.select_related = False
+    return queryset
+
+
+def _locked_batches(queryset):
+    """
+    Lock the rows of `queryset` (SELECT ... FOR UPDATE of their ids) and
+    yield plain querysets of them by primary key, LOCKED_BATCH_SIZE at a
+    time. Computing the rollup deltas and writing from the same locked ids
+    keeps rows inserted or edited concurrently out of both, which a second
+    evaluation of the filter would not under READ COMMITTED. Must run
+    inside a transaction.
+    """
+    pks = list(queryset.select_for_update().values_list("pk", flat=True))
+    manager = queryset.model._base_manager.db_manager(queryset.db)
+    for start in range(0, len(pks), LOCKED_BATCH_SIZE):
+        yield manager.filter(pk__in=pks[start:start + LOCKED_BATCH_SIZE])
+
+
+def bulk_delete_transactions(queryset):
+    """
+    Delete the transactions in `queryset` with plain DELETE statements and
+    take them out of the rollup. Returns the number of rows deleted.
+
+    QuerySet.delete() would load every row and send post_delete for each,
+    i.e. one rollup UPDATE per row. Nothing references Transaction, so the
+    locked rows are removed with DELETE ... WHERE id IN (...), and the rollup
+    is adjusted from a GROUP BY over the same rows.
+    """
+    queryset = _plain(queryset)
+    deltas, deleted = {}, 0
+    with transaction.atomic(using=queryset.db):
+        for batch in _locked_batches(queryset):
+            summary.queryset_deltas(batch, sign=-1, deltas=deltas)
+            deleted += batch._raw_delete(batch.db)
+        summary.apply_deltas(deltas)
+        _bump_delta_users(deltas)
+    return deleted
+
+
+def update_transactions(queryset, **values):
+    """
+    Set `values` (category_id and/or type, the bucket fields bulk actions
+    change) on every transaction in `queryset` with plain UPDATE statements
+    on the locked rows, moving their totals between rollup buckets. Returns
+    the number of rows updated.
+    """
+    unsupported = set(values) - {"category_id", "type"}
+    if unsupported:
+        raise ValueError(f"update_transactions() cannot set {', '.join(sorted(unsupported))}")
+    queryset = _plain(queryset)
+    deltas, updated = {}, 0
+    with transaction.atomic(using=queryset.db):
+        for batch in _locked_batches(queryset):
+            summary.queryset_deltas(batch, deltas=deltas, **values)
+            updated += batch.update(**values)
+        summary.apply_deltas(deltas)
+        _bump_delta_users(deltas)
+    return updated
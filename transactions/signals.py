@@ -0,0 +1,53 @@
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from categories.models import Category
+from . import summary
+from .cache import RATES, bump_data_version
+from .models import ExchangeRate, Transaction
+
+SUMMARY_FIELDS = ("user_id", "date", "category_id", "type", "currency", "amount")
+
+
+@receiver(pre_save, sender=Transaction)
+def remember_previous_values(sender, instance, raw, **kwargs):
+    # an edit moves the row out of its old bucket, so capture the stored values first
+    instance._summary_previous = None
+    if instance.pk and not raw:
+        instance._summary_previous = (
+            Transaction.objects.filter(pk=instance.pk).values(*SUMMARY_FIELDS).first()
+        )
+
+
+@receiver(post_save, sender=Transaction)
+def update_summary_on_save(sender, instance, raw, **kwargs):
+    if raw:
+        # fixtures: run rebuild_monthly_summary afterwards
+        return
+    previous = getattr(instance, "_summary_previous", None)
+    if previous:
+        summary.add_transaction(previous, sign=-1)
+        if previous["user_id"] != instance.user_id:
+            bump_data_version(previous["user_id"])
+    summary.add_transaction({field: getattr(instance, field) for field in SUMMARY_FIELDS})
+    bump_data_version(instance.user_id)
+
+
+@receiver(post_delete, sender=Transaction)
+def update_summary_on_delete(sender, instance, **kwargs):
+    summary.add_transaction({field: getattr(instance, field) for field in SUMMARY_FIELDS}, sign=-1)
+    bump_data_version(instance.user_id)
+
+
+@receiver(pre_delete, sender=Category)
+def fold_category_summary(sender, instance, **kwargs):
+    # Transaction.category is SET_NULL, so the category's totals become uncategorized
+    summary.fold_category(instance)
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def invalidate_rates(sender, **kwargs):
+    # single edits (admin); load_exchange_rates bumps once for the whole file
+    bump_data_version(scope=RATES)
+    bump_data_version()
@@ -0,0 +1,17 @@
+'use strict';
+{
+    const $ = django.jQuery;
+
+    // Reload the changelist with the picked value of an AutocompleteFilter.
+    $(function() {
+        $('.autocomplete-filter select').on('change', function() {
+            const container = $(this).closest('.autocomplete-filter');
+            let url = container.data('clearUrl');
+            if (this.value) {
+                const separator = url.endsWith('?') ? '' : (url.includes('?') ? '&' : '?');
+                url += separator + encodeURIComponent(container.data('parameter')) + '=' + encodeURIComponent(this.value);
+            }
+            window.location.href = url;
+        });
+    });
+}
@@ -0,0 +1,338 @@
+"""
+Maintenance and reads for the MonthlySummary rollup table.
+
+Every create/edit/delete of a Transaction turns into +/- deltas on the
+(user, month, category, type, currency) buckets it touches, so dashboard
+and report totals cost O(months x categories) instead of O(transactions).
+Buckets hold amounts in their own currency; the reads convert them to the
+user's currency in the query (transactions.rates).
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, DecimalField, F, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, TruncMonth
+from django.utils import timezone
+
+from . import rates
+from .cache import bump_data_version, get_or_compute, user_cache_key
+from .models import MonthlySummary, Transaction
+
+# rows per bulk_create batch when rebuilding
+REBUILD_BATCH_SIZE = 1000
+
+
+def month_start(value):
+    """First day of the month containing `value` (a date or datetime)."""
+    if isinstance(value, datetime):
+        # same conversion DateField applies when saving a datetime
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value)
+        value = value.date()
+    return value.replace(day=1)
+
+
+def apply_delta(user_id, day, category_id, type, currency, amount, count):
+    """
+    Add `amount` and `count` (both may be negative) to one bucket,
+    creating the bucket on first use and dropping it once it is empty.
+    """
+    amount = Decimal(str(amount))
+    lookup = {
+        "user_id": user_id,
+        "month": month_start(day),
+        "category_id": category_id,
+        "type": type,
+        "currency": currency,
+    }
+    buckets = MonthlySummary.objects.filter(**lookup)
+
+    with transaction.atomic():
+        updated = buckets.update(total=F("total") + amount, count=F("count") + count)
+        if not updated:
+            try:
+                with transaction.atomic():
+                    MonthlySummary.objects.create(**lookup, total=amount, count=count)
+            except IntegrityError:
+                # a concurrent request created the bucket first
+                buckets.update(total=F("total") + amount, count=F("count") + count)
+        if count < 0:
+            buckets.filter(count__lte=0).delete()
+
+
+def add_transaction(values, sign=1):
+    """
+    Apply one transaction to the rollup. `values` is a dict (or model
+    instance attributes) with user_id, date, category_id, type, currency
+    and amount; sign=-1 removes it again.
+    """
+    apply_delta(
+        values["user_id"], values["date"], values["category_id"], values["type"], values["currency"],
+        sign * Decimal(str(values["amount"])), sign,
+    )
+
+
+def fold_category(category):
+    """
+    Move the buckets of a category that is being deleted into the
+    uncategorized (NULL) buckets, mirroring Transaction.category's SET_NULL.
+    """
+    rows = list(
+        MonthlySummary.objects.filter(category=category)
+        .values("user_id", "month", "type", "currency", "total", "count")
+    )
+    with transaction.atomic():
+        MonthlySummary.objects.filter(category=category).delete()
+        for row in rows:
+            apply_delta(row["user_id"], row["month"], None, row["type"], row["currency"],
+                        row["total"], row["count"])
+
+
+def _grouped_transactions(user=None):
+    qs = Transaction.objects.all()
+    if user is not None:
+        qs = qs.filter(user=user)
+    return (
+        qs.order_by()
+        .annotate(bucket_month=TruncMonth("date"))
+        .values("user_id", "bucket_month", "category_id", "type", "currency")
+        .annotate(bucket_total=Sum("amount"), bucket_count=Count("id"))
+    )
+
+
+def rebuild(user=None):
+    """
+    Recompute the rollup from the transactions table (for one user, or for
+    everyone). Returns the number of buckets written.
+
+    Bumps the data version, so cached reports built from the old rollup
+    are not served anymore.
+    """
+    written = 0
+    with transaction.atomic():
+        existing = MonthlySummary.objects.all()
+        if user is not None:
+            existing = existing.filter(user=user)
+        existing.delete()
+
+        batch = []
+        for row in _grouped_transactions(user).iterator():
+            batch.append(MonthlySummary(
+                user_id=row["user_id"],
+                month=row["bucket_month"],
+                category_id=row["category_id"],
+                type=row["type"],
+                currency=row["currency"],
+                total=row["bucket_total"],
+                count=row["bucket_count"],
+            ))
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                MonthlySummary.objects.bulk_create(batch)
+                written += len(batch)
+                batch = []
+        if batch:
+            MonthlySummary.objects.bulk_create(batch)
+            written += len(batch)
+        bump_data_version(user.pk if user is not None else None)
+    return written
+
+
+def check(user=None):
+    """
+    Compare the rollup against the transactions table.
+    Returns a list of (bucket key, expected (total, count), stored (total, count))
+    for every bucket that differs; an empty list means the rollup is consistent.
+    """
+    expected = {
+        (row["user_id"], row["bucket_month"], row["category_id"], row["type"], row["currency"]):
+            (row["bucket_total"], row["bucket_count"])
+        for row in _grouped_transactions(user)
+    }
+    stored_qs = MonthlySummary.objects.all()
+    if user is not None:
+        stored_qs = stored_qs.filter(user=user)
+    stored = {
+        (row["user_id"], row["month"], row["category_id"], row["type"], row["currency"]):
+            (row["total"], row["count"])
+        for row in stored_qs.values("user_id", "month", "category_id", "type", "currency", "total", "count")
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored), key=str):
+        want = expected.get(key, (Decimal("0.00"), 0))
+        have = stored.get(key, (Decimal("0.00"), 0))
+        if want[0] != have[0] or want[1] != have[1]:
+            mismatches.append((key, want, have))
+    return mismatches
+
+
+def user_totals(user, currency):
+    """All-time income/expense totals for the dashboard, in `currency`."""
+    amount = rates.converted("total", "month", currency)
+    return MonthlySummary.objects.filter(user=user).aggregate(
+        total_income=Sum(amount, filter=Q(type="IN")),
+        total_expense=Sum(amount, filter=Q(type="EX")),
+    )
+
+
+def signed_amount(amount):
+    """
+    Income counts positive and expense negative, as a decimal expression
+    on `amount` (a field name or an expression).
+    """
+    if isinstance(amount, str):
+        amount = F(amount)
+    return Case(
+        When(type=Transaction.INCOME, then=amount),
+        default=-amount,
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def balance_through(user, day, pk, currency):
+    """
+    Income minus expense of all of the user's transactions up to and
+    including (day, pk) in (date, id) order, in `currency`, in one query. Whole months
+    before `day` are summed from the rollup (a few rows per month), only
+    `day`'s own month from the transactions, so the cost stays bounded by
+    one month of rows however long the history is.
+    """
+    month = month_start(day)
+    zero = Value(Decimal("0.00"), output_field=DecimalField(max_digits=14, decimal_places=2))
+    before = (
+        MonthlySummary.objects.filter(user=user, month__lt=month)
+        .order_by().values("user")
+        .annotate(balance=Sum(signed_amount(rates.converted("total", "month", currency)))).values("balance")
+    )
+    balance = (
+        Transaction.objects.filter(user=user, date__gte=month)
+        .filter(Q(date__lt=day) | Q(date=day, id__lte=pk))
+        .aggregate(balance=Coalesce(Sum(signed_amount(rates.converted("amount", "date", currency))), zero)
+                   + Coalesce(Subquery(before), zero))
+    )["balance"]
+    # SQLite sums decimals as floats
+    return Decimal(balance).quantize(Decimal("0.01"))
+
+
+def add_running_balances(user, transactions):
+    """
+    Set `balance` (the balance after the transaction) on consecutive
+    transactions in (-date, -id) order, e.g. one page of the list: the
+    first is anchored with balance_through(), the rest are walked back,
+    converting with the in-process rates. Balances are in the user's currency.
+    """
+    if not transactions:
+        return
+    currency = rates.user_currency(user)
+    balance = balance_through(user, transactions[0].date, transactions[0].pk, currency)
+    for tx in transactions:
+        tx.balance = balance
+        # like the sums, amounts without a rate are left out
+        amount = rates.convert(tx.amount, tx.currency, currency, tx.date) or 0
+        balance -= amount if tx.type == Transaction.INCOME else -amount
+
+
+def months_with_data(user):
+    """First days of the months in which the user has transactions, newest first."""
+    # served by the (user, month, ...) unique index
+    return list(
+        MonthlySummary.objects.filter(user=user)
+        .order_by("-month").values_list("month", flat=True).distinct()
+    )
+
+
+def month_options(user, selected=""):
+    """
+    (value, label) choices for the month selectors: the months with data,
+    newest first, cached until the user's data changes (with a shared cache
+    only, see transactions.cache). `selected`
+    ("YYYY-MM") is included even when that month has no data.
+    """
+    months = get_or_compute(user_cache_key("data-months", user.pk), lambda: months_with_data(user))
+    options = [(f"{month:%Y-%m}", f"{month:%Y-%m}") for month in months]
+    if selected and selected not in {value for value, _label in options}:
+        options.append((selected, selected))
+        options.sort(reverse=True)
+    return options
+
+
+def trend_rows(user, first_month, last_month, currency):
+    """
+    The rollup buckets of the months [first_month, last_month], oldest
+    first, with the category name and the total converted to `currency`
+    (None without a rate): N months x category x type x currency in one query.
+    """
+    return (
+        MonthlySummary.objects.filter(user=user, month__gte=first_month, month__lte=last_month)
+        .annotate(amount=rates.converted("total", "month", currency))
+        .values("month", "category_id", "category__name", "type", "amount")
+        .order_by("month")
+    )
+
+
+def _merge_deltas(deltas, transactions, sign):
+    for tx in transactions:
+        key = (tx.user_id, month_start(tx.date), tx.category_id, tx.type, tx.currency)
+        amount, count = deltas.get(key, (Decimal("0.00"), 0))
+        deltas[key] = (amount + sign * Decimal(str(tx.amount)), count + sign)
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Apply {bucket key: (amount, count)} deltas; buckets that net out to zero are skipped."""
+    with transaction.atomic():
+        for (user_id, month, category_id, ttype, currency), (amount, count) in deltas.items():
+            if amount or count:
+                apply_delta(user_id, month, category_id, ttype, currency, amount, count)
+
+
+def add_transactions(transactions, sign=1):
+    """
+    Apply many transactions (model instances) at once, e.g. after a
+    bulk_create, which sends no signals. Deltas are merged per bucket first,
+    so the cost is one UPDATE per touched bucket rather than per row.
+    """
+    apply_deltas(_merge_deltas({}, transactions, sign))
+
+
+def move_transactions(previous, current):
+    """
+    Like add_transactions, for a bulk update: take `previous` (the rows as
+    they were stored) out of the rollup and put `current` in. Buckets whose
+    deltas cancel out, e.g. a description-only edit, are not touched.
+    """
+    deltas = _merge_deltas({}, previous, -1)
+    apply_deltas(_merge_deltas(deltas, current, 1))
+
+
+def _add_grouped(deltas, rows, sign, overrides):
+    for row in rows:
+        row = {**row, **overrides}
+        key = (row["user_id"], month_start(row["bucket_month"]), row["category_id"], row["type"], row["currency"])
+        amount, count = deltas.get(key, (Decimal("0.00"), 0))
+        deltas[key] = (amount + sign * row["bucket_total"], count + sign * row["bucket_count"])
+    return deltas
+
+
+def queryset_deltas(queryset, sign=1, deltas=None, **overrides):
+    """
+    Bucket deltas for every row of `queryset`, computed with one GROUP BY
+    query instead of loading the rows (for set-based DELETE/UPDATE), added
+    to `deltas` if given.
+
+    With `overrides` (category_id=..., type=...), the rows are both taken
+    out of their current buckets and filed under the overridden values,
+    i.e. the deltas of `queryset.update(**overrides)`.
+    """
+    rows = list(
+        queryset.order_by()
+        .annotate(bucket_month=TruncMonth("date"))
+        .values("user_id", "bucket_month", "category_id", "type", "currency")
+        .annotate(bucket_total=Sum("amount"), bucket_count=Count("id"))
+    )
+    deltas = {} if deltas is None else deltas
+    if not overrides:
+        return _add_grouped(deltas, rows, sign, {})
+    deltas = _add_grouped(deltas, rows, -1, {})
+    return _add_grouped(deltas, rows, 1, overrides)
@@ -0,0 +1,92 @@
+"""
+Date drill-down for the Transaction changelist.
+
+Django's date_hierarchy lists years and months with SELECT DISTINCT over the
+whole (filtered) table. The years and months that exist are already in
+MonthlySummary, which is tiny in comparison; only the day level reads
+Transaction, and that query is a date range the date index serves.
+"""
+from django import template
+from django.contrib.admin.templatetags.admin_list import date_hierarchy
+from django.db.models import Max, Min
+from django.utils import formats
+from django.utils.text import capfirst
+from django.utils.translation import gettext as _
+
+from transactions.models import MonthlySummary
+
+register = template.Library()
+
+# changelist filters that have a MonthlySummary column to match
+SUMMARY_FILTERS = {
+    "type__exact": "type",
+    "category__id__exact": "category_id",
+    "user__id__exact": "user_id",
+}
+DATE_PARAMS = {"date__year", "date__month", "date__day"}
+
+
+def _summary_queryset(cl):
+    """MonthlySummary rows matching the changelist filters, or None if a filter has no equivalent."""
+    qs = MonthlySummary.objects.all()
+    for param, value in cl.params.items():
+        if param in DATE_PARAMS:
+            continue
+        if param not in SUMMARY_FILTERS:
+            # search, date range filters, ordering...: let Django handle it
+            return None
+        qs = qs.filter(**{SUMMARY_FILTERS[param]: value})
+    return qs
+
+
+@register.inclusion_tag("admin/date_hierarchy.html")
+def summary_date_hierarchy(cl):
+    summary = _summary_queryset(cl)
+    year = cl.params.get("date__year")
+    month = cl.params.get("date__month")
+    day = cl.params.get("date__day")
+    if summary is None or day or (year and month):
+        # day level: Transaction rows of one month, a date range scan
+        return date_hierarchy(cl)
+
+    def link(filters):
+        return cl.get_query_string(filters, ["date__"])
+
+    if not year:
+        # same start-level logic as Django's, from the rollup
+        span = summary.aggregate(first=Min("month"), last=Max("month"))
+        if span["first"] and span["last"] and span["first"].year == span["last"].year:
+            year = span["first"].year
+            if span["first"].month == span["last"].month:
+                return date_hierarchy_for_month(cl, year, span["first"].month)
+
+    if year:
+        months = summary.filter(month__year=year).order_by("month").values_list("month", flat=True).distinct()
+        return {
+            "show": True,
+            "back": {"link": link({}), "title": _("All dates")},
+            "choices": [
+                {
+                    "link": link({"date__year": year, "date__month": m.month}),
+                    "title": capfirst(formats.date_format(m, "YEAR_MONTH_FORMAT")),
+                }
+                for m in months
+            ],
+        }
+
+    years = sorted({m.year for m in summary.order_by().values_list("month", flat=True).distinct()})
+    return {
+        "show": True,
+        "back": None,
+        "choices": [{"link": link({"date__year": str(y)}), "title": str(y)} for y in years],
+    }
+
+
+def date_hierarchy_for_month(cl, year, month):
+    """Day links of a single month (Django's default once year and month are chosen)."""
+    original = cl.params
+    cl.params = {**original, "date__year": str(year), "date__month": str(month)}
+    try:
+        return date_hierarchy(cl)
+    finally:
+        cl.params = original
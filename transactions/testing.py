@@ -0,0 +1,58 @@
+from contextlib import contextmanager
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from .benchmark import seed
+
+# The deployment with a shared cache (settings.SHARED_CACHE): sessions and
+# users come from the cache. The test process's locmem cache is shared by
+# everything it runs, so it stands in for redis & co.
+with_shared_cache = override_settings(
+    SHARED_CACHE=True,
+    SESSION_ENGINE="django.contrib.sessions.backends.cached_db",
+    AUTHENTICATION_BACKENDS=["accounts.backends.CachedModelBackend"],
+)
+
+
+class QueryBudgetMixin:
+    """
+    TestCase helpers for asserting an upper bound on the number of queries
+    a view issues, independent of how much data the user has.
+    """
+
+    def setUp(self):
+        super().setUp()
+        # cached results would hide the queries we want to count
+        cache.clear()
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        with CaptureQueriesContext(connection) as queries:
+            yield queries
+        executed = [q["sql"] for q in queries.captured_queries]
+        self.assertLessEqual(
+            len(executed), budget,
+            f"{len(executed)} queries executed, budget is {budget}:\n" + "\n".join(executed),
+        )
+
+    def seeded_client(self, transactions, categories=5, prefix="budget"):
+        """Log a freshly seeded user into self.client and return the user."""
+        user = seed(users=1, transactions=transactions, categories=categories, prefix=prefix)[0]
+        self.client.force_login(user)
+        return user
+
+    def assertQueryBudget(self, url, budget, sizes=(3, 60)):
+        """
+        Request `url` for users with different amounts of data and check
+        that every size stays within `budget` (catches N+1 queries).
+        """
+        for size in sizes:
+            self.seeded_client(size, prefix=f"budget{size}")
+            cache.clear()
+            with self.assertMaxQueries(budget):
+                response = self.client.get(url)
+                if response.streaming:
+                    b"".join(response.streaming_content)
+            self.assertEqual(response.status_code, 200)
@@ -1,3 +1,1052 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import time
+import unittest
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path, reverse
+from django.utils import timezone
+
+import expense_tracker.urls
+from expense_tracker.db import SQLITE_ENGINE, database_settings
+from categories.models import Category
+from . import async_views, rates, search, summary
+from .benchmark import filter_cases, full_table_scan
+from .cache import aget_or_compute, get_or_compute, user_cache_key
+from .exports import claim_next_job, fail_export_job, parquet_available, run_export_job
+from .filters import TransactionFilterForm
+from .forms import category_choices
+from .importers import TransactionImporter
+from .loadtest import CATEGORY_OPTION_RE, CSRF_INPUT_RE, NEXT_LINK_RE, latency_stats, parse_mix
+from .models import ExchangeRate, ExportJob, MonthlySummary, Transaction
+from .services import bulk_delete_transactions
+from .testing import QueryBudgetMixin, with_shared_cache
+from .views import user_transactions
+
+# URLs of AsyncExportTests: the project's, plus the async export
+urlpatterns = [
+    path("async/export/csv/", async_views.export_transactions_csv, name="async_export_csv"),
+    *expense_tracker.urls.urlpatterns,
+]
+
+
+@with_shared_cache
+class TransactionQueryBudgetTests(QueryBudgetMixin, TestCase):
+    # budgets are measured with a cold cache, so they include the
+    # session + user lookups that warm requests skip
+
+    # list: session, user, page, running balance anchor, category choices
+    # for the bulk-action bar, months with data for the month selector
+    def test_list(self):
+        self.assertQueryBudget(reverse("transactions:list"), 6)
+
+    def test_list_month(self):
+        self.assertQueryBudget(reverse("transactions:list") + "?month=2025-06", 6)
+
+    def test_list_next_page(self):
+        self.seeded_client(60)
+        response = self.client.get(reverse("transactions:list"))
+        cursor = response.context["page_obj"].next_cursor
+        # page and running balance anchor; session, user and choices are cached
+        with self.assertMaxQueries(3):
+            response = self.client.get(reverse("transactions:list") + f"?cursor={cursor}")
+        self.assertEqual(len(response.context["transactions"]), 20)
+
+    def test_export_csv(self):
+        self.assertQueryBudget(reverse("transactions:export_csv"), 3)
+
+    def test_export_jsonl(self):
+        self.assertQueryBudget(reverse("transactions:export_csv") + "?format=jsonl", 3)
+
+
+@with_shared_cache
+class TransactionFormCategoryTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("owner")
+        self.other = User.objects.create_user("other")
+        self.own = Category.objects.create(user=self.user, name="Food")
+        self.shared = Category.objects.create(user=None, name="Rent")
+        self.foreign = Category.objects.create(user=self.other, name="Secret")
+        self.client.force_login(self.user)
+
+    def test_choices_limited_to_own_and_global(self):
+        response = self.client.get(reverse("transactions:add"))
+        choices = [value for value, _label in response.context["form"].fields["category"].choices]
+        self.assertCountEqual(choices, ["", self.own.pk, self.shared.pk])
+        self.assertNotContains(response, "Secret")
+
+    def test_choices_cached_until_categories_change(self):
+        self.client.get(reverse("transactions:add"))
+        # session, user and category list all come from the cache
+        with self.assertMaxQueries(0):
+            self.client.get(reverse("transactions:add"))
+
+        Category.objects.create(user=self.user, name="Travel")
+        response = self.client.get(reverse("transactions:add"))
+        self.assertContains(response, "Travel")
+
+    @override_settings(SHARED_CACHE=False)
+    def test_choices_not_cached_without_shared_cache(self):
+        self.client.get(reverse("transactions:add"))
+        # renamed without signals, as by another worker whose locmem bump we don't see
+        Category.objects.filter(pk=self.own.pk).update(name="Groceries")
+        self.assertContains(self.client.get(reverse("transactions:add")), "Groceries")
+
+    def test_rejects_other_users_category(self):
+        response = self.client.post(reverse("transactions:add"), {
+            "amount": "10.00", "type": "EX", "category": self.foreign.pk,
+            "description": "", "date": "2025-06-01",
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("category", response.context["form"].errors)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_accepts_global_category(self):
+        response = self.client.post(reverse("transactions:add"), {
+            "amount": "10.00", "type": "EX", "category": self.shared.pk,
+            "description": "", "date": "2025-06-01",
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Transaction.objects.get().category, self.shared)
+
+
+class TransactionApiTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("owner")
+        self.other = User.objects.create_user("other")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.client.force_login(self.user)
+
+    def batch(self, *operations):
+        return self.client.post(reverse("transactions:api_batch"), {"operations": list(operations)},
+                                content_type="application/json")
+
+    def create(self, user=None, **kwargs):
+        values = {"amount": Decimal("10.00"), "type": "EX", "date": date(2025, 6, 1), **kwargs}
+        return Transaction.objects.create(user=user or self.user, **values)
+
+    def test_list_is_scoped_and_paginated(self):
+        for day in range(1, 6):
+            self.create(date=date(2025, 6, day))
+        self.create(user=self.other)
+
+        url = reverse("transactions:api_list")
+        first = self.client.get(url, {"page_size": 3}).json()
+        self.assertEqual([row["date"] for row in first["results"]],
+                         ["2025-06-05", "2025-06-04", "2025-06-03"])
+        second = self.client.get(url, {"page_size": 3, "cursor": first["next"]}).json()
+        self.assertEqual(len(second["results"]), 2)
+        self.assertIsNone(second["next"])
+
+    def test_malformed_cursors_start_over(self):
+        self.create()
+        for payload in ['["n","2025-06-01",1e999]', '["n","2025-06-01",true]', f'["n","2025-06-01",{2**70}]',
+                        '["x","2025-06-01",1]', '["n",20250601,1]']:
+            with self.subTest(payload=payload):
+                cursor = base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+                response = self.client.get(reverse("transactions:api_list"), {"cursor": cursor})
+                self.assertEqual(len(response.json()["results"]), 1)
+
+    def test_batch_applies_everything_in_bulk(self):
+        edited, removed = self.create(), self.create()
+        operations = [
+            {"op": "create", "data": {"amount": f"{i}.50", "type": "IN", "date": "2025-07-01",
+                                      "category": self.food.pk}}
+            for i in range(200)
+        ]
+        operations += [
+            {"op": "update", "id": edited.pk, "data": {"amount": "99.00", "date": "2025-08-02"}},
+            {"op": "delete", "id": removed.pk},
+        ]
+        # a fixed number of statements per operation kind and touched rollup
+        # bucket (savepoints included), however many operations there are
+        with self.assertMaxQueries(45):
+            response = self.batch(*operations)
+
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual({r["status"] for r in results[:200]}, {"created"})
+        self.assertEqual(results[200]["status"], "updated")
+        self.assertEqual(results[201]["status"], "deleted")
+        self.assertEqual(Transaction.objects.filter(user=self.user, type="IN").count(), 200)
+        edited.refresh_from_db()
+        self.assertEqual(str(edited.amount), "99.00")
+        self.assertFalse(Transaction.objects.filter(pk=removed.pk).exists())
+        self.assertEqual(summary.check(), [])
+
+    def test_invalid_batch_writes_nothing(self):
+        foreign = self.create(user=self.other)
+        response = self.batch(
+            {"op": "create", "data": {"amount": "5.00", "type": "EX", "date": "2025-06-01"}},
+            {"op": "create", "data": {"amount": "x", "type": "ZZ"}},
+            {"op": "delete", "id": foreign.pk},
+        )
+        self.assertEqual(response.status_code, 400)
+        results = response.json()["results"]
+        self.assertEqual(results[0]["status"], "skipped")
+        self.assertEqual(set(results[1]["errors"]), {"amount", "type", "date"})
+        self.assertEqual(results[2]["errors"], {"id": ["No such transaction."]})
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 0)
+        self.assertTrue(Transaction.objects.filter(pk=foreign.pk).exists())
+
+    def test_wrong_json_types_are_field_errors(self):
+        response = self.batch(
+            {"op": "create", "data": {"amount": "1", "type": "EX", "date": 20250601, "description": ["x"]}},
+            {"op": "create", "data": {"amount": True, "type": "EX", "date": "2025-06-01", "category": True}},
+            {"op": "delete", "id": True},
+            {"op": "delete", "id": 2**70},
+        )
+        self.assertEqual(response.status_code, 400)
+        results = response.json()["results"]
+        self.assertEqual(set(results[0]["errors"]), {"date", "description"})
+        self.assertEqual(set(results[1]["errors"]), {"amount", "category"})
+        self.assertEqual(results[2]["errors"], {"id": ["No such transaction."]})
+        self.assertEqual(results[3]["errors"], {"id": ["No such transaction."]})
+
+    @override_settings(SHARED_CACHE=True)
+    def test_categories_are_checked_against_the_database(self):
+        category_choices(self.user)
+        # moved away without signals, as if by a worker whose bump we missed:
+        # the cached choices still list it
+        Category.objects.filter(pk=self.food.pk).update(user=self.other)
+        self.assertIn(self.food.pk, dict(category_choices(self.user)))
+
+        response = self.batch({"op": "create", "data": {"amount": "5.00", "type": "EX", "date": "2025-06-01",
+                                                        "category": self.food.pk}})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["results"][0]["errors"], {"category": ["Select a valid category."]})
+
+    def test_batch_size_limit(self):
+        with self.settings(TRANSACTIONS_API_MAX_BATCH=2):
+            response = self.batch(*[{"op": "delete", "id": 1}] * 3)
+        self.assertEqual(response.status_code, 400)
+
+    def test_requires_login(self):
+        self.client.logout()
+        self.assertEqual(self.client.get(reverse("transactions:api_list")).status_code, 401)
+
+
+class TransactionBulkActionTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("owner")
+        self.other = User.objects.create_user("other")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.june = [self.create(date(2025, 6, day)) for day in (1, 2, 3)]
+        self.july = [self.create(date(2025, 7, day)) for day in (1, 2)]
+        self.foreign = self.create(date(2025, 6, 1), user=self.other)
+        self.client.force_login(self.user)
+
+    def create(self, day, user=None):
+        return Transaction.objects.create(user=user or self.user, amount=Decimal("5.00"), type="EX", date=day)
+
+    def post(self, **data):
+        return self.client.post(reverse("transactions:bulk"), data)
+
+    def test_delete_ticked_rows_in_one_statement(self):
+        with self.assertMaxQueries(20) as queries:
+            self.post(action="delete", ids=[self.june[0].pk, self.july[0].pk, self.foreign.pk])
+        deletes = [q["sql"] for q in queries.captured_queries
+                   if q["sql"].startswith('DELETE FROM "transactions_transaction"')]
+        self.assertEqual(len(deletes), 1)
+        self.assertEqual(Transaction.objects.filter(user=self.user).count(), 3)
+        # another user's row is out of scope even when its id is posted
+        self.assertTrue(Transaction.objects.filter(pk=self.foreign.pk).exists())
+        self.assertEqual(summary.check(), [])
+
+    def test_select_all_matching_filter(self):
+        self.post(action="delete", select_all="1", filters="month=2025-06")
+        self.assertCountEqual(Transaction.objects.filter(user=self.user), self.july)
+        self.assertEqual(summary.check(), [])
+
+    def test_recategorize_and_retype(self):
+        self.post(action="set_category", select_all="1", category=self.food.pk)
+        self.assertEqual(Transaction.objects.filter(category=self.food).count(), 5)
+        self.post(action="set_type", ids=[self.july[1].pk], type="IN")
+        self.assertEqual(Transaction.objects.get(pk=self.july[1].pk).type, "IN")
+        self.assertEqual(Transaction.objects.get(pk=self.foreign.pk).category, None)
+        self.assertEqual(summary.check(), [])
+
+    def test_rejects_other_users_category(self):
+        secret = Category.objects.create(user=self.other, name="Secret")
+        self.post(action="set_category", select_all="1", category=secret.pk)
+        self.assertFalse(Transaction.objects.filter(category=secret).exists())
+
+    @mock.patch("transactions.services.LOCKED_BATCH_SIZE", 2)
+    def test_writes_the_locked_rows_in_batches(self):
+        with self.assertMaxQueries(40) as queries:
+            self.post(action="set_type", select_all="1", type="IN")
+        sql = [q["sql"] for q in queries.captured_queries]
+        updates = [q for q in sql if q.startswith('UPDATE "transactions_transaction"')]
+        self.assertEqual(len(updates), 3)
+        if connection.features.has_select_for_update:
+            self.assertTrue(any("FOR UPDATE" in q for q in sql))
+        self.assertEqual(Transaction.objects.filter(user=self.user, type="IN").count(), 5)
+        self.post(action="delete", select_all="1")
+        self.assertFalse(Transaction.objects.filter(user=self.user).exists())
+        self.assertEqual(summary.check(), [])
+
+    def test_nothing_selected(self):
+        response = self.post(action="delete")
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(Transaction.objects.count(), 6)
+
+
+@with_shared_cache
+class TransactionSearchTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("owner")
+        self.other = User.objects.create_user("other")
+        self.groceries = Category.objects.create(user=self.user, name="Groceries")
+        self.latte = self.create("Coffee shop latte", date(2025, 6, 3))
+        self.beans = self.create("Coffee beans", date(2025, 7, 1), category=self.groceries)
+        self.rent = self.create("Rent", date(2025, 6, 1))
+        self.create("Coffee", date(2025, 6, 2), user=self.other)
+        self.client.force_login(self.user)
+
+    def create(self, description, day, user=None, category=None):
+        return Transaction.objects.create(user=user or self.user, amount=Decimal("3.00"), type="EX",
+                                          date=day, description=description, category=category)
+
+    def search(self, q, **params):
+        response = self.client.get(reverse("transactions:list"), {"q": q, **params})
+        return list(response.context["transactions"])
+
+    def test_matches_description_prefix_and_category_name(self):
+        self.assertCountEqual(self.search("coff"), [self.latte, self.beans])
+        self.assertEqual(self.search("grocer"), [self.beans])
+        self.assertEqual(self.search("coffee LATTE"), [self.latte])
+
+    def test_combines_with_month_filter(self):
+        self.assertEqual(self.search("coffee", month="2025-06"), [self.latte])
+
+    def test_most_relevant_first(self):
+        # mentions the term twice, so BM25 / ts_rank score it higher
+        self.beans.description = "Coffee coffee beans"
+        self.beans.save()
+        self.assertEqual(self.search("coffee"), [self.beans, self.latte])
+
+    @unittest.skipUnless(connection.vendor == "sqlite", "only SQLite bounds the ranked matches")
+    def test_only_the_newest_matches_are_ranked(self):
+        self.latte.description = "Coffee coffee shop latte"
+        self.latte.save()
+        self.assertEqual(self.search("coffee"), [self.latte, self.beans])
+        # the latte was added first, so it is not scored and follows the beans
+        with mock.patch("transactions.search.MAX_RANKED_MATCHES", 1):
+            self.assertEqual(self.search("coffee"), [self.beans, self.latte])
+
+    def test_index_follows_writes(self):
+        self.rent.description = "Flat rent June"
+        self.rent.save()
+        self.assertEqual(self.search("june"), [self.rent])
+
+        self.groceries.name = "Food"
+        self.groceries.save()
+        self.assertEqual(self.search("food"), [self.beans])
+        self.assertEqual(self.search("grocer"), [])
+
+        self.groceries.delete()
+        self.assertEqual(self.search("food"), [])
+
+        bulk_delete_transactions(Transaction.objects.filter(pk=self.latte.pk))
+        self.assertEqual(self.search("latte"), [])
+
+    def test_search_query_budget(self):
+        # user, COUNT, page, category choices, months with data (force_login
+        # put the session in the cache)
+        with self.assertMaxQueries(5):
+            self.search("coffee")
+
+    def test_admin_search_uses_index(self):
+        admin = User.objects.create_superuser("admin", password="x")
+        self.client.force_login(admin)
+        response = self.client.get(reverse("admin:transactions_transaction_changelist"), {"q": "coffee"})
+        self.assertEqual(response.context["cl"].result_count, 3)
+
+
+class TransactionAdminDateHierarchyTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("owner")
+        for day, description in [(date(2024, 3, 5), "Rent"), (date(2025, 6, 1), "Coffee"),
+                                 (date(2025, 7, 2), "Rent"), (date(2025, 7, 9), "Rent")]:
+            Transaction.objects.create(user=self.user, amount=Decimal("3.00"), type="EX", date=day,
+                                       description=description)
+        self.client.force_login(User.objects.create_superuser("admin", password="x"))
+
+    def drill_down(self, **params):
+        """Titles of the date links on the changelist, and the queries it ran."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("admin:transactions_transaction_changelist"), params)
+        toplinks = re.search(r'<nav class="toplinks">(.*?)</nav>', response.content.decode(), re.S).group(1)
+        # the choices; the "back" link has a class
+        return re.findall(r'<a href="[^"]*">([^<]*)</a>', toplinks), queries
+
+    def test_years_and_months_come_from_the_rollup(self):
+        titles, queries = self.drill_down()
+        self.assertEqual(titles, ["2024", "2025"])
+        # Django's own drill-down runs SELECT DISTINCT over the transactions
+        self.assertFalse([q["sql"] for q in queries.captured_queries
+                          if "DISTINCT" in q["sql"] and 'FROM "transactions_transaction"' in q["sql"]])
+
+        titles, _queries = self.drill_down(date__year="2025")
+        self.assertEqual(titles, ["June 2025", "July 2025"])
+        titles, _queries = self.drill_down(date__year="2025", date__month="7")
+        self.assertEqual(titles, ["July 2", "July 9"])
+
+    def test_follows_the_changelist_filters(self):
+        Transaction.objects.filter(date__year=2024).update(type="IN")
+        summary.rebuild()
+        titles, _queries = self.drill_down(type__exact="EX")
+        self.assertEqual(titles, ["June 2025", "July 2025"])
+        # no rollup column for a search: Django's drill-down over the matches
+        titles, _queries = self.drill_down(q="coffee")
+        self.assertEqual(titles, ["June 1"])
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "SQLite rebuilds tables on schema changes")
+class SearchTriggerRebuildTests(TransactionTestCase):
+
+    def alter_category_name(self, max_length):
+        old = Category._meta.get_field("name")
+        new = old.clone()
+        new.set_attributes_from_name("name")
+        new.max_length = max_length
+        new.model = Category
+        with connection.schema_editor() as editor:
+            search.drop_search_triggers(None, editor)
+            editor.alter_field(Category, old, new)
+            search.create_search_triggers(None, editor)
+
+    def test_category_table_rebuild_keeps_the_index(self):
+        user = User.objects.create_user("owner")
+        groceries = Category.objects.create(user=user, name="Groceries")
+        beans = Transaction.objects.create(user=user, amount=Decimal("3.00"), type="EX", date=date(2025, 6, 1),
+                                           description="Coffee beans", category=groceries)
+        length = Category._meta.get_field("name").max_length
+        self.alter_category_name(length + 100)
+        self.addCleanup(self.alter_category_name, length)
+
+        latte = Transaction.objects.create(user=user, amount=Decimal("3.00"), type="EX", date=date(2025, 6, 2),
+                                           description="Coffee shop latte", category=groceries)
+        self.assertCountEqual(Transaction.objects.search("coffee", user=user), [beans, latte])
+        groceries.name = "Food"
+        groceries.save()
+        self.assertCountEqual(Transaction.objects.search("food", user=user), [beans, latte])
+
+
+class TransactionFilterTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user("owner")
+        self.groceries = Category.objects.create(user=self.user, name="Groceries")
+        self.rent = Category.objects.create(user=self.user, name="Rent")
+        self.big_july = self.create("650.00", date(2025, 7, 4), self.groceries)
+        self.small_aug = self.create("40.00", date(2025, 8, 9), self.groceries)
+        self.big_sep_rent = self.create("900.00", date(2025, 9, 1), self.rent)
+        self.big_oct = self.create("700.00", date(2025, 10, 2), self.groceries)
+        self.uncategorized = self.create("800.00", date(2025, 9, 30), None)
+        self.client.force_login(self.user)
+
+    def create(self, amount, day, category, type="EX"):
+        return Transaction.objects.create(user=self.user, amount=Decimal(amount), type=type,
+                                          date=day, category=category)
+
+    def listed(self, params):
+        return list(self.client.get(reverse("transactions:list"), params).context["transactions"])
+
+    def test_groceries_over_500_in_q3(self):
+        params = {"category": self.groceries.pk, "type": "EX", "min_amount": "500",
+                  "start": "2025-07-01", "end": "2025-09-30"}
+        self.assertEqual(self.listed(params), [self.big_july])
+
+    def test_categories_include_uncategorized(self):
+        params = {"category": [self.rent.pk, "none"]}
+        self.assertEqual(self.listed(params), [self.uncategorized, self.big_sep_rent])
+
+    def test_date_range_intersects_month(self):
+        params = {"month": "2025-09", "start": "2025-09-15", "max_amount": "850"}
+        self.assertEqual(self.listed(params), [self.uncategorized])
+
+    def test_invalid_values_are_ignored(self):
+        params = {"month": "june", "min_amount": "lots", "category": "999999", "type": "XX"}
+        self.assertEqual(len(self.listed(params)), 5)
+
+    def test_last_representable_month_is_invalid(self):
+        for url in [reverse("transactions:list"), reverse("transactions:export_csv"),
+                    reverse("accounts:monthly_report"), reverse("transactions:api_list")]:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url, {"month": "9999-12"}).status_code, 200)
+
+    def test_last_representable_date_is_an_open_end(self):
+        params = {"start": "2025-09-01", "end": "9999-12-31"}
+        self.assertEqual(len(self.listed(params)), 3)
+        response = self.client.get(reverse("transactions:export_csv"), params)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="transactions-20250901-.csv"')
+        self.assertEqual(self.client.get(reverse("accounts:monthly_report"), params).status_code, 200)
+
+    def test_export_and_report_apply_the_same_filters(self):
+        params = {"category": self.groceries.pk, "min_amount": "500"}
+        response = self.client.get(reverse("transactions:export_csv"), params)
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="transactions-all-filtered.csv"')
+        rows = b"".join(response.streaming_content).decode("utf-8-sig").splitlines()
+        self.assertEqual([row.split(",")[0] for row in rows[1:]], ["2025-10-02", "2025-07-04"])
+
+        # an amount filter needs the transactions themselves, not the rollup
+        report = self.client.get(reverse("accounts:monthly_report"),
+                                 {"start": "2025-07-01", "end": "2025-09-30", "min_amount": "500"})
+        self.assertEqual(report.context["total_expense"], Decimal("2350.00"))
+        # month + category come from the rollup
+        report = self.client.get(reverse("accounts:monthly_report"),
+                                 {"month": "2025-09", "category": self.rent.pk})
+        self.assertEqual(report.context["total_expense"], Decimal("900.00"))
+        self.assertEqual([row["category_name"] for row in report.context["breakdown"]], ["Rent"])
+
+    def test_common_filters_are_index_backed(self):
+        user = self.seeded_client(200, prefix="plans")
+        for name, params in filter_cases(user):
+            plan = user_transactions(user, TransactionFilterForm(params, user=user))[:20].explain()
+            self.assertFalse(full_table_scan(plan, connection.vendor), f"{name}:\n{plan}")
+
+
+class MonthlySummaryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("owner")
+        self.food = Category.objects.create(user=self.user, name="Food")
+        self.rent = Category.objects.create(user=self.user, name="Rent")
+
+    def create(self, amount="10.00", day=date(2025, 6, 1), category=None, type="EX", currency="INR"):
+        return Transaction.objects.create(user=self.user, amount=Decimal(amount), type=type, date=day,
+                                          category=category, currency=currency)
+
+    def assertBuckets(self, expected):
+        self.assertCountEqual(
+            [(f"{row.month:%Y-%m}", row.category_id, row.type, row.currency, row.total, row.count)
+             for row in MonthlySummary.objects.all()],
+            expected,
+        )
+
+    def test_signals_keep_the_rollup_in_step(self):
+        tx = self.create(category=self.food)
+        self.create("5.00", date(2025, 6, 20), category=self.food)
+        self.assertBuckets([("2025-06", self.food.pk, "EX", "INR", Decimal("15.00"), 2)])
+        self.assertEqual(summary.check(), [])
+
+        for field, value in [("date", date(2025, 7, 3)), ("category", self.rent), ("type", "IN"),
+                             ("currency", "USD"), ("amount", Decimal("12.50"))]:
+            with self.subTest(field=field):
+                setattr(tx, field, value)
+                tx.save()
+                self.assertEqual(summary.check(), [])
+        self.assertBuckets([
+            ("2025-06", self.food.pk, "EX", "INR", Decimal("5.00"), 1),
+            ("2025-07", self.rent.pk, "IN", "USD", Decimal("12.50"), 1),
+        ])
+
+        tx.delete()
+        self.assertBuckets([("2025-06", self.food.pk, "EX", "INR", Decimal("5.00"), 1)])
+        self.assertEqual(summary.check(), [])
+
+    def test_deleted_category_folds_into_uncategorized(self):
+        self.create(category=self.food)
+        self.create("5.00")
+        self.create("1.00", category=self.rent)
+        self.food.delete()
+        self.assertBuckets([
+            ("2025-06", None, "EX", "INR", Decimal("15.00"), 2),
+            ("2025-06", self.rent.pk, "EX", "INR", Decimal("1.00"), 1),
+        ])
+        self.assertEqual(summary.check(), [])
+
+    def test_commands_find_and_repair_drift(self):
+        self.create(category=self.food)
+        self.create("5.00", date(2025, 5, 2))
+        call_command("check_monthly_summary", stdout=io.StringIO())
+
+        MonthlySummary.objects.filter(category=self.food).update(total=Decimal("1.00"))
+        MonthlySummary.objects.filter(category=None).delete()
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, "2 inconsistent bucket(s)"):
+            call_command("check_monthly_summary", user="owner", stdout=out)
+        self.assertIn(f"month=2025-06 category={self.food.pk}", out.getvalue())
+
+        out = io.StringIO()
+        call_command("rebuild_monthly_summary", user="owner", stdout=out)
+        self.assertIn("2 buckets", out.getvalue())
+        self.assertEqual(summary.check(), [])
+        call_command("check_monthly_summary", stdout=io.StringIO())
+
+    def test_commands_reject_unknown_users(self):
+        for command in ["check_monthly_summary", "rebuild_monthly_summary"]:
+            with self.subTest(command=command), self.assertRaisesMessage(CommandError, "Unknown user: nobody"):
+                call_command(command, user="nobody")
+
+
+class RunningBalanceTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.seeded_client(120, prefix="balance")
+
+    def expected(self):
+        balance, balances = Decimal("0.00"), {}
+        for tx in Transaction.objects.filter(user=self.user).order_by("date", "id"):
+            balance += tx.amount if tx.type == "IN" else -tx.amount
+            balances[tx.pk] = balance
+        return balances
+
+    def listed(self, params=None):
+        response = self.client.get(reverse("transactions:list"), params or {})
+        return response, {tx.pk: tx.balance for tx in response.context["transactions"]}
+
+    def test_balances_across_pages(self):
+        expected = self.expected()
+        response, balances = self.listed()
+        seen = dict(balances)
+        while response.context["page_obj"].next_cursor:
+            response, balances = self.listed({"cursor": response.context["page_obj"].next_cursor})
+            seen.update(balances)
+        self.assertEqual(seen, expected)
+
+    def test_month_filter_shows_overall_balance(self):
+        expected = self.expected()
+        _response, balances = self.listed({"month": "2025-06"})
+        self.assertTrue(balances)
+        self.assertEqual(balances, {pk: expected[pk] for pk in balances})
+
+    def test_back_dated_entry(self):
+        Transaction.objects.create(user=self.user, amount=Decimal("1000.00"), type="IN", date=date(2024, 1, 2))
+        expected = self.expected()
+        _response, balances = self.listed({"month": "2025-06"})
+        self.assertEqual(balances, {pk: expected[pk] for pk in balances})
+
+    def test_hidden_when_rows_are_not_consecutive(self):
+        response = self.client.get(reverse("transactions:list"), {"type": "EX"})
+        self.assertFalse(response.context["show_balance"])
+        self.assertNotContains(response, "Balance</th>")
+
+
+@with_shared_cache
+class ExportFormatTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.seeded_client(60, prefix="formats")
+        self.url = reverse("transactions:export_csv")
+
+    def download(self, params=None, **headers):
+        response = self.client.get(self.url, params or {}, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content)
+
+    def csv_rows(self, params=None):
+        return self.download(params)[1].decode("utf-8-sig").splitlines()
+
+    def test_gzip_is_the_csv_compressed(self):
+        for params in [{}, {"month": "2025-06"}]:
+            with self.subTest(params=params):
+                response, content = self.download({"format": "csv.gz", **params})
+                self.assertEqual(response["Content-Type"], "application/gzip")
+                self.assertTrue(response["Content-Disposition"].endswith('.csv.gz"'))
+                self.assertEqual(gzip.decompress(content).decode("utf-8-sig").splitlines(), self.csv_rows(params))
+
+    def test_jsonl_has_the_csv_rows(self):
+        response, content = self.download({"format": "jsonl", "month": "2025-06"})
+        self.assertEqual(response["Content-Disposition"], 'attachment; filename="transactions-202506.jsonl"')
+        records = [json.loads(line) for line in content.decode().splitlines()]
+        rows = self.csv_rows({"month": "2025-06"})
+        self.assertEqual(len(records), len(rows) - 1)
+        self.assertEqual(",".join(str(value) for value in records[0].values()), rows[1])
+
+    def test_accept_header_picks_the_format(self):
+        response, _content = self.download(Accept="application/x-ndjson")
+        self.assertTrue(response["Content-Type"].startswith("application/x-ndjson"))
+        self.assertIn("Accept", response["Vary"])
+        # browsers accept anything; an explicit ?format= wins over Accept
+        response, _content = self.download(Accept="text/html,*/*;q=0.8")
+        self.assertTrue(response["Content-Type"].startswith("text/csv"))
+        response, _content = self.download({"format": "csv.gz"}, Accept="application/x-ndjson")
+        self.assertEqual(response["Content-Type"], "application/gzip")
+
+    def test_formats_have_their_own_etag(self):
+        csv_response, _content = self.download()
+        response = self.client.get(self.url, headers={"Accept": "application/x-ndjson",
+                                                      "If-None-Match": csv_response["ETag"]})
+        self.assertEqual(response.status_code, 200)
+
+    def test_unknown_format(self):
+        response = self.client.get(self.url, {"format": "xlsx"})
+        self.assertEqual(response.status_code, 400)
+        self.assertContains(response, "csv.gz", status_code=400)
+
+    @unittest.skipUnless(parquet_available(), "pyarrow is not installed")
+    def test_parquet_row_groups(self):
+        import pyarrow.parquet as pq
+
+        with mock.patch("transactions.exports.PARQUET_ROW_GROUP_SIZE", 25):
+            response, content = self.download({"format": "parquet"})
+        self.assertEqual(response["Content-Type"], "application/vnd.apache.parquet")
+        table = pq.ParquetFile(io.BytesIO(content))
+        self.assertEqual((table.metadata.num_rows, table.metadata.num_row_groups), (60, 3))
+        rows = self.csv_rows()
+        first = table.read().to_pylist()[0]
+        self.assertEqual(f"{first['date']},{first['category']},{first['amount']}", ",".join(rows[1].split(",")[:3]))
+
+
+class CurrencyTests(QueryBudgetMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        rates.load_rates(rates.read_rates(io.StringIO(
+            "date,currency,rate\n"
+            "2025-05-02,USD,1.30\n"
+            "2025-05-30,USD,1.25\n"  # last rate of the month wins
+            "2025-05,INR,100\n"
+            "2025-06,USD,1.20\n"
+            "2025-06,INR,90\n"
+        ), base="EUR"))
+        self.user = User.objects.create_user("owner")
+        self.client.force_login(self.user)
+
+    def add(self, day, amount, currency="INR", type="EX"):
+        return Transaction.objects.create(user=self.user, date=day, amount=Decimal(amount),
+                                          currency=currency, type=type)
+
+    def test_read_rates(self):
+        self.assertEqual(
+            sorted(ExchangeRate.objects.values_list("currency", "month", "rate")),
+            [("EUR", date(2025, 5, 1), Decimal("1")), ("EUR", date(2025, 6, 1), Decimal("1")),
+             ("INR", date(2025, 5, 1), Decimal("100")), ("INR", date(2025, 6, 1), Decimal("90")),
+             ("USD", date(2025, 5, 1), Decimal("1.25")), ("USD", date(2025, 6, 1), Decimal("1.2"))])
+        with self.assertRaisesMessage(ValueError, "line 3"):
+            rates.read_rates(io.StringIO("date,currency,rate\n2025-05,USD,1.1\n2025-05,USD,-1\n"), base="EUR")
+
+    def test_rollup_keeps_currencies_apart(self):
+        self.add(date(2025, 6, 2), "10.00", "USD")
+        self.add(date(2025, 6, 3), "10.00", "INR")
+        edited = self.add(date(2025, 6, 4), "5.00", "USD")
+        edited.currency = "EUR"
+        edited.save()
+        self.assertEqual(sorted(MonthlySummary.objects.values_list("currency", "total")),
+                         [("EUR", Decimal("5.00")), ("INR", Decimal("10.00")), ("USD", Decimal("10.00"))])
+        self.assertEqual(summary.check(), [])
+
+    def test_check_command_reports_the_bucket_currency(self):
+        self.add(date(2025, 6, 2), "10.00", "USD")
+        MonthlySummary.objects.filter(currency="USD").update(total=Decimal("99.00"))
+        out = io.StringIO()
+        with self.assertRaisesMessage(CommandError, "1 inconsistent bucket(s)"):
+            call_command("check_monthly_summary", stdout=out)
+        self.assertRegex(out.getvalue(), r"type=EX currency=USD: expected 10(\.00)? \(1\), stored 99\.00 \(1\)")
+
+    def test_rates_are_cached_in_process(self):
+        self.assertEqual(rates.rate_on("USD", date(2025, 6, 15)), Decimal("1.2"))
+        with self.assertNumQueries(0):
+            self.assertEqual(rates.rate_on("USD", date(2025, 4, 1)), Decimal("1.25"))
+            self.assertEqual(rates.convert(Decimal("12.00"), "USD", "INR", date(2025, 6, 1)), Decimal("900.00"))
+            self.assertIsNone(rates.convert(Decimal("1.00"), "JPY", "INR", date(2025, 6, 1)))
+        rates.load_rates({("EUR", date(2025, 6, 1)): Decimal("1"), ("USD", date(2025, 6, 1)): Decimal("2")})
+        self.assertEqual(rates.rate_on("USD", date(2025, 6, 15)), Decimal("2"))
+        self.assertEqual(rates.currencies(self.user), ["EUR", "INR", "USD"])
+
+    def test_rates_loaded_elsewhere_expire(self):
+        rates.rate_on("USD", date(2025, 6, 15))
+        # rows written by another process, whose version bump this process's cache never saw
+        ExchangeRate.objects.bulk_create([ExchangeRate(currency="GBP", month=date(2025, 6, 1), rate=Decimal("0.85"))])
+        self.assertIsNone(rates.rate_on("GBP", date(2025, 6, 15)))
+        with override_settings(EXCHANGE_RATES_MAX_AGE=0):
+            time.sleep(0.01)
+            self.assertEqual(rates.rate_on("GBP", date(2025, 6, 15)), Decimal("0.85"))
+
+    def test_load_exchange_rates_command(self):
+        path = self.enterContext(tempfile.TemporaryDirectory()) + "/rates.csv"
+        with open(path, "w") as f:
+            f.write("date,currency,rate\n2025-06-30,USD,1.1\n2025-06-30,GBP,0.85\n")
+        out = io.StringIO()
+        call_command("load_exchange_rates", path, "--base", "eur", stdout=out)
+        self.assertIn("3 monthly rates for 3 currencies (EUR, GBP, USD)", out.getvalue())
+        self.assertEqual(rates.currencies(), ["EUR", "GBP", "USD"])
+
+    def test_running_balance_in_profile_currency(self):
+        self.add(date(2025, 6, 1), "1000.00", type="IN")
+        self.add(date(2025, 6, 2), "12.00", "USD")
+        self.add(date(2025, 6, 3), "100.00")
+        response = self.client.get(reverse("transactions:list"), {"month": "2025-06"})
+        self.assertEqual([tx.balance for tx in response.context["transactions"]],
+                         [Decimal("0.00"), Decimal("100.00"), Decimal("1000.00")])
+        # amounts in another currency than the profile's are labelled with it
+        self.assertRegex(response.content.decode(), r"-12\.00\s+USD")
+
+    def test_form_api_and_import_check_currencies(self):
+        response = self.client.get(reverse("transactions:add"))
+        self.assertEqual(response.context["form"]["currency"].value(), "INR")
+        self.assertEqual([code for code, _label in response.context["form"].fields["currency"].choices],
+                         ["EUR", "INR", "USD"])
+
+        response = self.client.post(reverse("transactions:api_batch"), {"operations": [
+            {"op": "create", "data": {"amount": "1.00", "type": "EX", "date": "2025-06-01", "currency": "JPY"}},
+        ]}, content_type="application/json")
+        self.assertEqual(response.json()["results"][0]["errors"], {"currency": ["Unknown currency."]})
+
+        result = TransactionImporter(self.user).run(io.StringIO(
+            "date,category,amount,description,type,currency\n"
+            "2025-06-01,,1.00,,EX,usd\n"
+            "2025-06-01,,2.00,,EX,\n"
+            "2025-06-01,,3.00,,EX,JPY\n"
+        ))
+        self.assertEqual(result.created, 2)
+        self.assertEqual(result.errors, [(4, "currency: no exchange rate for 'JPY'")])
+        self.assertEqual(sorted(Transaction.objects.values_list("currency", flat=True)), ["INR", "USD"])
+
+
+class TransactionImportTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("importer")
+        self.client.force_login(self.user)
+
+    def test_malformed_csv_is_a_file_error(self):
+        field = "x" * (csv.field_size_limit() + 1)
+        upload = SimpleUploadedFile(
+            "big.csv", f"date,category,amount,description,type\n2025-06-01,,1,{field},EX\n".encode())
+        response = self.client.post(reverse("transactions:import_csv"), {"file": upload})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("not valid CSV", response.context["form"].errors["file"][0])
+
+    def test_counts_only_the_categories_it_created(self):
+        importer = TransactionImporter(self.user)
+        # created by another request after the importer loaded the categories
+        Category.objects.create(user=self.user, name="Food")
+        result = importer.run(io.StringIO(
+            "date,category,amount,description,type\n"
+            "2025-06-01,Food,1.00,,EX\n"
+            "2025-06-02,Rent,2.00,,EX\n"
+        ))
+        self.assertEqual((result.created, result.categories_created), (2, 1))
+        self.assertEqual(Category.objects.filter(user=self.user).count(), 2)
+
+
+@unittest.skipUnless(connection.vendor == "sqlite", "SQLite tuning")
+class SQLiteTuningTests(TestCase):
+
+    def connect(self, **tuning):
+        """A connection to a fresh database file, set up as DATABASES is."""
+        name = self.enterContext(tempfile.TemporaryDirectory()) + "/tuning.sqlite3"
+        db = database_settings({"ENGINE": SQLITE_ENGINE, "NAME": name}, **tuning)
+        wrapper = SQLiteDatabaseWrapper(connections.configure_settings({"default": db})["default"], "tuning")
+        connections["tuning"] = wrapper
+        self.addCleanup(delattr, connections._connections, "tuning")
+        self.addCleanup(wrapper.close)
+        return wrapper, name
+
+    def test_pragmas_are_applied_to_new_connections(self):
+        wrapper, _name = self.connect()
+        with wrapper.cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+
+    def test_immediate_transactions_take_the_write_lock_up_front(self):
+        wrapper, name = self.connect(sqlite_timeout=0, sqlite_transaction_mode="IMMEDIATE")
+        other = sqlite3.connect(name, timeout=0)
+        self.addCleanup(other.close)
+        with transaction.atomic(using="tuning"):
+            wrapper.cursor().execute("SELECT 1")
+            # another writer is turned away before this one has written anything
+            with self.assertRaisesMessage(sqlite3.OperationalError, "database is locked"):
+                other.execute("BEGIN IMMEDIATE")
+
+    def test_pool_settings_only_apply_to_postgresql(self):
+        pool = {"min_size": 2, "max_size": 10, "timeout": 10}
+        options = {"sslmode": "require"}
+        db = database_settings({"ENGINE": "django.db.backends.postgresql", "OPTIONS": options},
+                               conn_max_age=60, health_checks=True, pool=pool)
+        # pooled connections go back to the pool after each request
+        self.assertEqual((db["CONN_MAX_AGE"], db["OPTIONS"]), (0, {"sslmode": "require", "pool": pool}))
+        self.assertEqual(options, {"sslmode": "require"})
+
+        db = database_settings({"ENGINE": SQLITE_ENGINE, "NAME": "x"}, conn_max_age=60, pool=pool,
+                               sqlite_timeout=20)
+        self.assertEqual((db["CONN_MAX_AGE"], db["OPTIONS"]), (60, {"timeout": 20}))
+
+
+class LoadTestTests(QueryBudgetMixin, TestCase):
+    """The load generator (manage.py loadtest) finds what it needs in the real pages."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.seeded_client(60, prefix="load")
+
+    def test_pages_parse(self):
+        page = self.client.get(reverse("transactions:list")).content.decode()
+        link = NEXT_LINK_RE.search(page)
+        self.assertIsNotNone(link)
+        self.assertTrue(link.group(1).startswith("?cursor="))
+
+        page = self.client.get(reverse("transactions:add")).content.decode()
+        self.assertIsNotNone(CSRF_INPUT_RE.search(page))
+        self.assertEqual(len(CATEGORY_OPTION_RE.findall(page)), 5)
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix("dashboard=3, export=1"), {"dashboard": 3.0, "export": 1.0})
+        for bad in ["dashboard=x", "checkout=1", "dashboard=0", "list=-1"]:
+            with self.subTest(mix=bad), self.assertRaises(ValueError):
+                parse_mix(bad)
+
+    def test_latency_stats(self):
+        stats = latency_stats([10.0, 20.0, 30.0, 40.0], 1, 2.0)
+        self.assertEqual((stats["requests"], stats["error_rate"], stats["requests_per_second"]), (5, 0.2, 2.0))
+        self.assertEqual((stats["p50_ms"], stats["max_ms"]), (20.0, 40.0))
+        self.assertIsNone(latency_stats([], 3, 1.0)["p95_ms"])
+
+
+@override_settings(SHARED_CACHE=True, REPORT_CACHE_LOCK_TIMEOUT=5)
+class ResultCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user("owner")
+        self.key = user_cache_key("report", self.user.pk)
+        self.computed = 0
+
+    def compute(self):
+        self.computed += 1
+        return "fresh"
+
+    def test_caches_until_the_data_changes(self):
+        self.assertEqual(get_or_compute(self.key, self.compute), "fresh")
+        self.assertEqual(get_or_compute(self.key, self.compute), "fresh")
+        self.assertEqual(self.computed, 1)
+
+        summary.rebuild(self.user)
+        self.assertNotEqual(user_cache_key("report", self.user.pk), self.key)
+
+    def test_waits_for_the_request_holding_the_lock(self):
+        cache.add(f"{self.key}:lock", 1)
+        # the other request stores its result while this one sleeps
+        with mock.patch("transactions.cache.time.sleep", side_effect=lambda _: cache.set(self.key, "theirs")):
+            self.assertEqual(get_or_compute(self.key, self.compute), "theirs")
+        self.assertEqual(self.computed, 0)
+
+    def test_computes_when_the_lock_holder_stores_nothing(self):
+        cache.add(f"{self.key}:lock", 1)
+        with mock.patch("transactions.cache.time.sleep", side_effect=lambda _: cache.delete(f"{self.key}:lock")):
+            self.assertEqual(get_or_compute(self.key, self.compute), "fresh")
+        self.assertEqual(self.computed, 1)
+        # a value computed while another request held the lock is not stored
+        self.assertIsNone(cache.get(self.key))
+
+    def test_async_waits_for_the_request_holding_the_lock(self):
+        async def compute():
+            return self.compute()
+
+        async def other_request_finishes(_):
+            await cache.aset(self.key, "theirs")
+
+        cache.add(f"{self.key}:lock", 1)
+        with mock.patch("transactions.cache.asyncio.sleep", side_effect=other_request_finishes):
+            self.assertEqual(async_to_sync(aget_or_compute)(self.key, compute), "theirs")
+        self.assertEqual(self.computed, 0)
+
+    @override_settings(SHARED_CACHE=False)
+    def test_not_cached_without_shared_cache(self):
+        # another worker's locmem cache would not see a version bump
+        get_or_compute(self.key, self.compute)
+        get_or_compute(self.key, self.compute)
+        self.assertEqual(self.computed, 2)
+        self.assertIsNone(cache.get(self.key))
+
+
+class ExportJobQueueTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("exporter")
+
+    def running(self, minutes_ago, attempts):
+        return ExportJob.objects.create(user=self.user, status=ExportJob.RUNNING, attempts=attempts,
+                                        started_at=timezone.now() - timedelta(minutes=minutes_ago))
+
+    @override_settings(EXPORT_JOB_TIMEOUT_MINUTES=60, EXPORT_MAX_ATTEMPTS=3)
+    def test_jobs_of_dead_workers_are_retried_then_failed(self):
+        busy = self.running(5, attempts=1)
+        lost = self.running(90, attempts=1)
+        hopeless = self.running(90, attempts=3)
+
+        self.assertEqual(claim_next_job(), lost)
+        lost.refresh_from_db()
+        self.assertEqual((lost.status, lost.attempts), (ExportJob.RUNNING, 2))
+        hopeless.refresh_from_db()
+        self.assertEqual(hopeless.status, ExportJob.FAILED)
+        self.assertIsNone(claim_next_job())
+        busy.refresh_from_db()
+        self.assertEqual((busy.status, busy.attempts), (ExportJob.RUNNING, 1))
+
+    @override_settings(EXPORT_JOB_TIMEOUT_MINUTES=60, EXPORT_MAX_ATTEMPTS=3)
+    def test_only_the_current_claimant_records_its_result(self):
+        export_root = self.enterContext(tempfile.TemporaryDirectory())
+        self.enterContext(override_settings(EXPORT_ROOT=export_root))
+        Transaction.objects.create(user=self.user, amount=Decimal("5.00"), type="EX", date=date(2025, 6, 1))
+        ExportJob.objects.create(user=self.user)
+
+        slow = claim_next_job()
+        # the slow worker's job looks abandoned, so another worker takes it over
+        ExportJob.objects.filter(pk=slow.pk).update(started_at=timezone.now() - timedelta(minutes=90))
+        current = claim_next_job()
+        self.assertEqual((current.pk, current.attempts), (slow.pk, 2))
+
+        self.assertTrue(run_export_job(current))
+        self.assertFalse(run_export_job(slow))
+        self.assertFalse(fail_export_job(slow, RuntimeError("late")))
+
+        job = ExportJob.objects.get()
+        self.assertEqual((job.status, job.row_count, job.error), (ExportJob.DONE, 1, ""))
+        # the late result neither replaced the file nor was left behind
+        self.assertEqual(os.listdir(export_root), [job.file_name])
+
+
+@override_settings(ROOT_URLCONF=__name__)
+class AsyncExportTests(QueryBudgetMixin, TransactionTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.user = self.seeded_client(60, prefix="async-export")
+
+    async def test_streams_the_same_csv(self):
+        await self.async_client.aforce_login(self.user)
+        for params in [{}, {"month": "2025-06", "type": "EX"}, {"format": "csv.gz"}]:
+            with self.subTest(params=params):
+                expected = await sync_to_async(self.client.get)(reverse("transactions:export_csv"), params)
+                expected_content = await sync_to_async(b"".join)(expected.streaming_content)
+                response = await self.async_client.get(reverse("async_export_csv"), params)
+                self.assertTrue(response.streaming)
+                self.assertEqual(response["Content-Disposition"], expected["Content-Disposition"])
+                content = b"".join([chunk async for chunk in response.streaming_content])
+                self.assertEqual(content, expected_content)
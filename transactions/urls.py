@@ -1,5 +1,11 @@
+from django.conf import settings
 from django.urls import path
-from .views import TransactionCreateView, TransactionListView, TransactionDeleteView, export_transactions_csv
+from . import api, async_views, views
+from .views import (
+    TransactionCreateView, TransactionListView, TransactionDeleteView, bulk_action,
+    import_transactions_csv,
+    export_jobs, export_job_detail, export_job_download,
+)
 
 app_name = "transactions"
 
@@ -7,5 +13,14 @@ urlpatterns = [
     path("add/",  TransactionCreateView.as_view(), name="add"),
     path("",  TransactionListView.as_view(), name="list"),
     path("<int:pk>/delete/", TransactionDeleteView.as_view(), name="delete"),
-    path("export/csv/", export_transactions_csv, name="export_csv"),
+    path("bulk/", bulk_action, name="bulk"),
+    path("export/csv/",
+         async_views.export_transactions_csv if settings.ASYNC_VIEWS else views.export_transactions_csv,
+         name="export_csv"),
+    path("import/csv/", import_transactions_csv, name="import_csv"),
+    path("exports/", export_jobs, name="export_jobs"),
+    path("exports/<int:pk>/", export_job_detail, name="export_job_detail"),
+    path("exports/<int:pk>/download/", export_job_download, name="export_job_download"),
+    path("api/transactions/", api.transaction_list, name="api_list"),
+    path("api/transactions/batch/", api.transaction_batch, name="api_batch"),
 ]
\ No newline at end of file
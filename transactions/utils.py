@@ -0,0 +1,39 @@
+from datetime import date, datetime
+
+
+def parse_month(value):
+    """
+    Parse a `YYYY-MM` string (as used by the ?month= GET param).
+    Returns (year, month) or None when the value is empty or invalid.
+    December 9999 is invalid: month_bounds() could not end it.
+    """
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        parsed = datetime.strptime(value, "%Y-%m")
+    except ValueError:
+        return None
+    if (parsed.year, parsed.month) == (date.max.year, date.max.month):
+        return None
+    return parsed.year, parsed.month
+
+
+def month_bounds(year, month):
+    """
+    Return the half-open date range [first_of_month, first_of_next_month).
+    Filtering on this range (instead of date__year/date__month, which compile
+    to EXTRACT()) lets the database use an index on the date column.
+    """
+    start = date(year, month, 1)
+    if month == 12:
+        end = date(year + 1, 1, 1)
+    else:
+        end = date(year, month + 1, 1)
+    return start, end
+
+
+def shift_month(day, months):
+    """First day of the month `months` months after (or before, if negative) the month of `day`."""
+    index = day.year * 12 + day.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
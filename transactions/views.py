@@ -1,86 +1,109 @@
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.shortcuts import get_object_or_404
 from django.views.generic import CreateView, ListView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
-from django.utils import timezone
-from django.http import HttpResponse
+from django.contrib import messages
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_POST
+from django.http import FileResponse, Http404, HttpResponseBadRequest, QueryDict, StreamingHttpResponse
+from django.shortcuts import redirect, render
 import csv
-from decimal import Decimal
-from datetime import datetime
+import io
 
-from .models import Transaction
-from .forms import TransactionForm
+from . import summary
+from .conditional import user_data_condition
+from .models import ExportJob, Transaction
+from .exports import EXPORT_FORMATS, available_formats, export_format, export_queryset
+from .filters import TransactionFilterForm
+from .forms import ExportJobForm, TransactionBulkActionForm, TransactionForm, TransactionImportForm
+from .importers import TransactionImporter
+from .pagination import CursorPaginator
+from .services import bulk_delete_transactions, update_transactions
 
 # Create your views here.
 
 
+def user_transactions(user, filters=None):
+    """
+    The user's transactions, newest first, narrowed by `filters` (a
+    TransactionFilterForm); search results come most relevant first.
+    Shared by the HTML list, the bulk actions and the JSON API.
+    """
+    # the list shows tx.category.name; join it instead of one query per row
+    qs = Transaction.objects.filter(user=user).select_related("category")
+    if filters is None:
+        return qs.order_by("-date", "-id")
+
+    qs = filters.apply(qs, user=user)
+    if filters.is_search:
+        return qs.order_by("-search_rank", "-date", "-id")
+
+    # Sort newest first, id desc as tie-breaker
+    return qs.order_by("-date", "-id")
+
+
 class TransactionCreateView(LoginRequiredMixin, CreateView):
     model = Transaction
     form_class = TransactionForm
     template_name = "transactions/add_transaction.html"
     success_url = reverse_lazy("transactions:add")
 
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        kwargs["user"] = self.request.user
+        return kwargs
+
     def form_valid(self, form):
         form.instance.user = self.request.user
         return super().form_valid(form)
 
 
+@method_decorator(user_data_condition, name="dispatch")
 class TransactionListView(LoginRequiredMixin, ListView):
     model = Transaction
     template_name = "transactions/transaction_list.html"
     context_object_name = "transactions"
     paginate_by = 20
+    # Keyset pagination via ?cursor= (no COUNT(*), no OFFSET scans).
+    # Set to False to fall back to Django's numbered ?page= pagination.
+    cursor_pagination = True
 
     def get_queryset(self):
         """
-        Return transactions for the logged-in user, sorted by date desc then id desc.
-        If a valid 'month' GET parameter is provided in YYYY-MM format, filter by that month.
+        Return transactions for the logged-in user, sorted by date desc then id desc,
+        narrowed by the filters in the GET parameters (transactions.filters).
         """
-        qs = Transaction.objects.filter(user=self.request.user)
+        self.filters = TransactionFilterForm(self.request.GET, user=self.request.user)
+        return user_transactions(self.request.user, self.filters)
 
-        # Try to parse ?month=YYYY-MM (safe parsing, ignore invalid formats)
-        month_param = self.request.GET.get("month", "").strip()
-        if month_param:
-            try:
-                # Accept formats: "YYYY-MM" or "YYYY-M" just in case
-                parsed = datetime.strptime(month_param, "%Y-%m")
-                year = parsed.year
-                month = parsed.month
-                qs = qs.filter(date__year=year, date__month=month)
-            except ValueError:
-                # If parsing fails, do nothing (return unfiltered qs)
-                # Optionally, you can log this if you have logging configured
-                pass
-
-        # Sort newest first, id desc as tie-breaker
-        qs = qs.order_by("-date", "-id")
-        return qs
+    def paginate_queryset(self, queryset, page_size):
+        # search results are ordered by relevance, which has no keyset to page on
+        if not self.cursor_pagination or self.filters.is_search:
+            return super().paginate_queryset(queryset, page_size)
+        paginator = CursorPaginator(queryset, page_size)
+        page = paginator.page(self.request.GET.get("cursor", "").strip())
+        return (paginator, page, page.object_list, page.has_other_pages())
 
     def get_context_data(self, **kwargs):
         """
-        Provide month_options (last 12 months) and the selected_month for the template.
+        Provide month_options (months that have transactions) and the
+        active filters for the template.
         """
         ctx = super().get_context_data(**kwargs)
-
-        today = timezone.localdate()
-        year = today.year
-        month = today.month
-
-        months = []
-        for i in range(0, 12):
-            m = month - i
-            y = year
-            if m <= 0:
-                m += 12
-                y -= 1
-            key = f"{y:04d}-{m:02d}"  # e.g., "2025-12"
-            # formatted label could be made prettier (e.g., "Dec 2025"), keep simple now
-            label = f"{y}-{m:02d}"
-            months.append((key, label))
-
-        ctx["month_options"] = months
-        ctx["selected_month"] = self.request.GET.get("month", "")
+        # a running balance only makes sense on an unbroken run of transactions
+        ctx["show_balance"] = self.filters.is_date_only
+        if ctx["show_balance"]:
+            ctx["transactions"] = list(ctx["transactions"])
+            summary.add_running_balances(self.request.user, ctx["transactions"])
+        ctx["month_options"] = summary.month_options(self.request.user, self.filters.selected_month)
+        ctx["filters"] = self.filters
+        ctx["filter_query"] = self.filters.query_string()
+        ctx["selected_month"] = self.filters.selected_month
+        ctx["search_query"] = self.filters.spec.get("q", "")
+        ctx["export_formats"] = [name for name in available_formats() if name != "csv"]
+        # category choices come from the per-user cache (forms.category_choices)
+        ctx["bulk_form"] = TransactionBulkActionForm(user=self.request.user)
         return ctx
 
 
@@ -94,52 +117,142 @@ class TransactionDeleteView(LoginRequiredMixin, DeleteView):
         return Transaction.objects.filter(user=self.request.user)
 
 @login_required
+@require_POST
+def bulk_action(request):
+    """
+    Delete, recategorize or retype the ticked transactions, or with
+    select_all every transaction matching the list's filters. Each action
+    locks the matching rows and changes them with set-based statements
+    scoped to the user (transactions.services).
+    """
+    form = TransactionBulkActionForm(request.POST, user=request.user)
+    # the list's filters travel as one query string, as their names
+    # (category, type) clash with the action's own fields
+    filters = TransactionFilterForm(QueryDict(request.POST.get("filters", "")), user=request.user)
+    list_url = reverse("transactions:list")
+    query = filters.query_string()
+    if query:
+        list_url += f"?{query}"
+    if not form.is_valid():
+        for errors in form.errors.values():
+            for error in errors:
+                messages.error(request, error)
+        return redirect(list_url)
+
+    data = form.cleaned_data
+    qs = user_transactions(request.user, filters)
+    if not data["select_all"]:
+        qs = qs.filter(pk__in=data["ids"])
+
+    if data["action"] == form.DELETE:
+        count = bulk_delete_transactions(qs)
+        messages.success(request, f"Deleted {count} transaction(s).")
+    elif data["action"] == form.SET_CATEGORY:
+        category = data["category"]
+        count = update_transactions(qs, category_id=category.pk if category else None)
+        messages.success(request, f"Moved {count} transaction(s) to {category.name if category else 'Uncategorized'}.")
+    else:
+        count = update_transactions(qs, type=data["type"])
+        messages.success(request, f"Changed the type of {count} transaction(s).")
+    return redirect(list_url)
+
+
+def unknown_export_format(request):
+    return HttpResponseBadRequest(
+        f"Unknown export format {request.GET['format']!r}; available: {', '.join(available_formats())}.",
+        content_type="text/plain; charset=utf-8")
+
+
+def export_response(name, qs, filename_suffix, wrap=None):
+    """
+    Streaming download of `qs` in the EXPORT_FORMATS format `name`;
+    `wrap` adapts the chunk iterator (the async view's async_chunks).
+    """
+    _media_type, content_type, extension, stream = EXPORT_FORMATS[name]
+    chunks = stream(qs)
+    response = StreamingHttpResponse(wrap(chunks) if wrap else chunks, content_type=content_type)
+    response["Content-Disposition"] = f'attachment; filename="transactions-{filename_suffix}.{extension}"'
+    return response
+
+
+@login_required
+@user_data_condition(variant=export_format)
 def export_transactions_csv(request):
     """
-    Export transactions for the logged-in user as CSV.
-    Accepts optional GET param `month=YYYY-MM` to filter by month.
+    Export transactions for the logged-in user, narrowed by the same GET
+    filters as the list (transactions.filters). CSV by default; ?format=
+    (csv, csv.gz, jsonl, parquet) or the Accept header picks another format.
+    The file is streamed, so the first bytes go out before the query finishes.
     """
-    qs = Transaction.objects.filter(user=request.user)
-
-    # preserve same month filtering behavior as the list view
-    month_param = request.GET.get("month", "").strip()
-    if month_param:
-        try:
-            parsed = datetime.strptime(month_param, "%Y-%m")
-            year = parsed.year
-            month = parsed.month
-            qs = qs.filter(date__year=year, date__month=month)
-            filename_suffix = f"{year:04d}{month:02d}"
-        except ValueError:
-            # ignore invalid month formats
-            filename_suffix = "all"
+    name = export_format(request)
+    if name is None:
+        return unknown_export_format(request)
+    filters = TransactionFilterForm(request.GET, user=request.user)
+    qs, filename_suffix = export_queryset(request.user, filters)
+    return export_response(name, qs, filename_suffix)
+
+
+@login_required
+def import_transactions_csv(request):
+    """
+    Upload a CSV (same columns as the export) and bulk-import it for the
+    logged-in user. Invalid rows are listed and skipped.
+    """
+    result = None
+    if request.method == "POST":
+        form = TransactionImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            # decode the upload as a stream; utf-8-sig drops the BOM our export writes
+            stream = io.TextIOWrapper(form.cleaned_data["file"].file, encoding="utf-8-sig", newline="")
+            try:
+                result = TransactionImporter(request.user).run(stream)
+            except UnicodeDecodeError:
+                form.add_error("file", "The file is not UTF-8 encoded CSV.")
+            except csv.Error as exc:
+                # e.g. a field over csv.field_size_limit(); earlier batches are imported
+                form.add_error("file", f"The file is not valid CSV: {exc}.")
+    else:
+        form = TransactionImportForm()
+
+    return render(request, "transactions/import_transactions.html", {"form": form, "result": result})
+
+
+@login_required
+def export_jobs(request):
+    """
+    List the user's background exports; POST queues a new one
+    (picked up by manage.py run_export_worker).
+    """
+    if request.method == "POST":
+        form = ExportJobForm(request.POST, user=request.user)
+        if form.is_valid():
+            form.instance.user = request.user
+            job = form.save()
+            return redirect("transactions:export_job_detail", pk=job.pk)
     else:
-        filename_suffix = "all"
-
-    qs = qs.order_by("-date", "-id")
-
-    # Create HTTP response with CSV header, include UTF-8 BOM so Excel recognizes UTF-8
-    response = HttpResponse(content_type="text/csv; charset=utf-8")
-    response["Content-Disposition"] = f'attachment; filename="transactions-{filename_suffix}.csv"'
-
-    # Write BOM for Excel compatibility
-    response.write("\ufeff")
-
-    writer = csv.writer(response)
-    # header row
-    writer.writerow(["date", "category", "amount", "description", "type"])
-
-    for tx in qs:
-        # format date as ISO date (YYYY-MM-DD)
-        try:
-            date_str = tx.date.isoformat()
-        except Exception:
-            date_str = str(tx.date)
-        category = tx.category.name if tx.category else ""
-        # amount should already be Decimal/number
-        amt = tx.amount if tx.amount is not None else ""
-        description = tx.description or ""
-        ttype = tx.type or ""
-        writer.writerow([date_str, category, amt, description, ttype])
-
-    return response
\ No newline at end of file
+        form = ExportJobForm(user=request.user, initial={"month": request.GET.get("month", "")})
+
+    jobs = ExportJob.objects.filter(user=request.user)[:20]
+    return render(request, "transactions/export_jobs.html", {"form": form, "jobs": jobs})
+
+
+@login_required
+def export_job_detail(request, pk):
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user)
+    return render(request, "transactions/export_job_detail.html", {"job": job})
+
+
+@login_required
+def export_job_download(request, pk):
+    """
+    Serve a finished export from disk. FileResponse hands the open file to
+    the server's wsgi.file_wrapper (sendfile under gunicorn), so the worker
+    does not copy the file through Python.
+    """
+    job = get_object_or_404(ExportJob, pk=pk, user=request.user, status=ExportJob.DONE)
+    try:
+        f = open(job.file_path, "rb")
+    except OSError:
+        raise Http404("Export file is no longer available.")
+    content_type = "application/gzip" if job.compress else "text/csv; charset=utf-8"
+    return FileResponse(f, as_attachment=True, filename=job.file_name, content_type=content_type)